@@ -0,0 +1,191 @@
+# Cache respons untuk endpoint laporan. Setiap jalur tulis menaikkan "generation" milik user itu;
+# entry dan ETag terikat ke generation, jadi write apa pun langsung meng-invalidate cache user tsb.
+import hashlib, json, logging, os, secrets, time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pymongo import ReturnDocument
+from app.core.config import settings
+from app.core.metrics import CallbackMetric
+from app.core.db import get_collection
+from app.models.transaction import Transaction
+
+logger = logging.getLogger(__name__)
+
+
+def _scope(user_id: Optional[str]) -> str:
+    return user_id or ""
+
+
+class MemoryBackend:
+    """
+    LRU in-process. Generation juga lokal, jadi HANYA untuk satu worker: write yang ditangani worker lain
+    tidak meng-invalidate cache di sini. Multi-worker wajib pakai 'mongo'.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        # counter generation mulai dari 0 di tiap proses; epoch acak ikut di ETag supaya ETag dari proses
+        # sebelum restart / worker lain tidak pernah cocok dengan data proses ini
+        self.epoch = secrets.token_hex(4) + "."
+        self._items: "OrderedDict[str, Tuple[int, bytes, float]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+
+    async def generation(self, scope: str) -> int:
+        return self._generations.get(scope, 0)
+
+    async def bump(self, scope: str):
+        self._generations[scope] = self._generations.get(scope, 0) + 1
+        prefix = scope + "|"
+        for key in [k for k in self._items if k.startswith(prefix)]:
+            del self._items[key]
+
+    async def bump_all(self):
+        for scope in self._generations:
+            self._generations[scope] += 1
+        self._items.clear()
+
+    async def get(self, key: str) -> Optional[Tuple[int, bytes]]:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        if time.monotonic() - item[2] > settings.RESPONSE_CACHE_TTL:
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return item[0], item[1]
+
+    async def set(self, key: str, generation: int, body: bytes):
+        self._items[key] = (generation, body, time.monotonic())
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+
+class MongoBackend:
+    """Backend bersama antar worker: generation di cache_meta, entry di response_cache (TTL index)."""
+
+    epoch = ""  # generation disimpan di Mongo dan dipakai bersama semua worker
+
+    def __init__(self):
+        self._generations: Dict[str, Tuple[int, float]] = {}  # scope -> (generation, checked_at)
+
+    def _db(self):
+        return get_collection(Transaction).database
+
+    async def generation(self, scope: str) -> int:
+        # dibaca ulang paling sering sekali per RESPONSE_CACHE_GENERATION_TTL
+        now = time.monotonic()
+        cached = self._generations.get(scope)
+        if cached is None or now - cached[1] >= settings.RESPONSE_CACHE_GENERATION_TTL:
+            doc = await self._db()["cache_meta"].find_one({"_id": f"generation:{scope}"})
+            cached = (int(doc["value"]) if doc else 0, now)
+            self._generations[scope] = cached
+        return cached[0]
+
+    async def bump(self, scope: str):
+        doc = await self._db()["cache_meta"].find_one_and_update(
+            {"_id": f"generation:{scope}"}, {"$inc": {"value": 1}},
+            upsert=True, return_document=ReturnDocument.AFTER,
+        )
+        self._generations[scope] = (int(doc["value"]), time.monotonic())
+
+    async def bump_all(self):
+        db = self._db()
+        await db["cache_meta"].update_many({"_id": {"$regex": "^generation:"}}, {"$inc": {"value": 1}})
+        await db["response_cache"].delete_many({})
+        self._generations.clear()
+
+    async def get(self, key: str) -> Optional[Tuple[int, bytes]]:
+        doc = await self._db()["response_cache"].find_one({"_id": key})
+        return (int(doc["generation"]), bytes(doc["body"])) if doc else None
+
+    async def set(self, key: str, generation: int, body: bytes):
+        await self._db()["response_cache"].replace_one(
+            {"_id": key},
+            {"generation": generation, "body": body, "created_at": datetime.utcnow()},
+            upsert=True,
+        )
+
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+    @staticmethod
+    def make_key(scope: str, name: str, request: Request) -> str:
+        params = sorted((k, v) for k, v in request.query_params.multi_items() if v != "")
+        return scope + "|" + name + "?" + "&".join(f"{k}={v}" for k, v in params)
+
+    async def invalidate(self, user_id: Optional[str]):
+        if self.backend is not None:
+            await self.backend.bump(_scope(user_id))
+
+    async def invalidate_all(self):
+        # untuk operasi lintas user (mis. rebuild rollup)
+        if self.backend is not None:
+            await self.backend.bump_all()
+
+    async def respond(self, request: Request, name: str, compute: Callable[[], Awaitable[Any]],
+                      user_id: Optional[str] = None) -> Response:
+        if self.backend is None:
+            return _json_response(await compute())
+
+        scope = _scope(user_id)
+        generation = await self.backend.generation(scope)
+        key = self.make_key(scope, name, request)
+        etag = f'W/"{self.backend.epoch}{generation}-{hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "X-User-Id"}
+
+        # dashboard yang datanya belum berubah: 304 tanpa kerja database
+        if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+            self.stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+
+        hit = await self.backend.get(key)
+        if hit is not None and hit[0] == generation:
+            self.stats["hits"] += 1
+            return Response(content=hit[1], media_type="application/json", headers=headers)
+
+        self.stats["misses"] += 1
+        body = _encode(await compute())
+        await self.backend.set(key, generation, body)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _encode(data: Any) -> bytes:
+    return json.dumps(jsonable_encoder(data), separators=(",", ":")).encode("utf-8")
+
+
+def _json_response(data: Any) -> Response:
+    return Response(content=_encode(data), media_type="application/json")
+
+
+def _make_backend():
+    kind = settings.RESPONSE_CACHE_BACKEND
+    if kind == "memory":
+        if int(os.environ.get("WEB_CONCURRENCY", "1") or 1) > 1:
+            logger.warning("RESPONSE_CACHE_BACKEND=memory hanya aman untuk satu worker; pakai 'mongo'")
+        return MemoryBackend(settings.RESPONSE_CACHE_SIZE)
+    if kind == "mongo":
+        return MongoBackend()
+    return None
+
+
+response_cache = ResponseCache(_make_backend())
+CallbackMetric("response_cache_events_total", "Hit/miss/304 cache respons laporan",
+               lambda: dict(response_cache.stats), "counter", "event")
+
+
+async def invalidate_responses(user_id: Optional[str]):
+    await response_cache.invalidate(user_id)
+
+
+async def response_generation(user_id: Optional[str]) -> Optional[int]:
+    """Generation bersama milik user (None kalau cache respons mati); untuk cache turunan yang harus ikut invalid."""
+    if response_cache.backend is None:
+        return None
+    return await response_cache.backend.generation(_scope(user_id))
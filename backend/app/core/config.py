@@ -1,10 +1,50 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List
+from typing import List, Optional
 
 class Settings(BaseSettings):
     MONGO_URI: str = "mongodb://localhost:27017"
     MONGO_DB: str = "expense_tracker"
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0  # >0 membuka koneksi di background saat boot
+    MONGO_MAX_IDLE_TIME_MS: int = 60000
+    MONGO_CONNECT_TIMEOUT_MS: int = 5000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
     ALLOWED_ORIGINS: str = "http://localhost:5173"
+    MODEL_RELOAD_CHECK_SECONDS: float = 2.0
+    CATEGORY_CACHE_TTL: float = 60.0
+    PREDICT_MAX_BATCH: int = 256
+    PREDICT_MAX_WAIT_MS: float = 5.0
+    RETRAIN_WORKERS: int = 1
+    RETRAIN_FETCH_BATCH: int = 5000
+    JOB_HISTORY: int = 100  # job retrain per user yang sudah selesai dan masih bisa dibaca lewat /model/jobs/{job_id}
+    JOB_STALE_SECONDS: float = 6 * 3600  # job berjalan tanpa update selama ini dianggap mati bersama workernya
+    INCREMENTAL_N_FEATURES: int = 2 ** 18
+    INCREMENTAL_SAVE_EVERY: int = 50
+    MODEL_DIR: Optional[str] = None  # default: app/ml/models di dalam paket (path absolut)
+    MODEL_KEEP_VERSIONS: int = 5  # versi artefak lama per user yang disimpan sebelum dihapus
+    MODEL_MMAP_MIN_BYTES: int = 64 * 1024  # array numpy >= ukuran ini di-mmap, bukan di-pickle
+    MODEL_VERIFY_CHECKSUM: bool = True
+    IMPORT_CHUNK_SIZE: int = 2000
+    IMPORT_MAX_ERRORS: int = 1000
+    REPORT_FALLBACK_BATCH: int = 10000
+    EXPORT_BATCH: int = 5000  # baris per batch cursor / record batch Arrow saat export
+    TX_COUNT_CAP: int = 10000  # count=estimate berhenti menghitung di angka ini
+    RESPONSE_CACHE_BACKEND: str = "mongo"  # mongo (aman multi-worker) | memory (hanya satu worker) | off
+    RESPONSE_CACHE_SIZE: int = 512
+    RESPONSE_CACHE_TTL: float = 300.0
+    RESPONSE_CACHE_GENERATION_TTL: float = 1.0
+    SLOW_QUERY_MS: float = 200.0
+    SLOW_QUERY_EXPLAIN: bool = True
+    AUTO_CATEGORY_THRESHOLD: Optional[float] = None  # isi category_id otomatis kalau proba >= nilai ini
+    REQUIRE_USER: bool = False  # True: request tanpa header X-User-Id ditolak (401)
+    MODEL_CACHE_USERS: int = 32  # jumlah model per-user yang boleh ada di memori sekaligus
+    CATEGORY_CACHE_USERS: int = 1024
+    RULE_CACHE_TTL: float = 30.0  # worker lain melihat perubahan rule paling lambat setelah TTL ini
+    LABEL_QUEUE_SIZE: int = 2000  # jumlah transaksi paling tidak pasti yang disimpan per user
+    RECURRING_HISTORY: int = 24  # tanggal kemunculan terbaru yang disimpan per signature
+    RECURRING_MIN_OCCURRENCES: int = 3  # minimal kemunculan sebelum period disimpulkan
+    DUPLICATE_WINDOW_DAYS: int = 0  # 0 = duplikat hanya kalau tanggalnya sama persis
+    WARM_MODEL_ON_STARTUP: bool = True  # load model tenant bersama di background setelah boot
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
     @property
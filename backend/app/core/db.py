@@ -1,21 +1,179 @@
+import logging
+from datetime import date, datetime, time
+from typing import Any, Dict, List, Optional, Set, Tuple
+from uuid import UUID, uuid4
+from bson import Binary
 from beanie import init_beanie
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure
 from .config import settings
 from app.models.category import Category
 from app.models.transaction import Transaction
+from app.models.rollup import DailyCategoryRollup
+from app.models.labeling_queue import LabelQueueItem
+from app.models.rule import Rule
+from app.models.recurring import DuplicateFlag, RecurringSeries
+from app.models.retrain_job import RetrainJob
+from app.core.monitoring import command_metrics
 
-async def init_db():
-    client = AsyncIOMotorClient(settings.MONGO_URI)
-    db = client[settings.MONGO_DB]
-    await init_beanie(database=db, document_models=[Category, Transaction])
+logger = logging.getLogger(__name__)
+
+def get_collection(model):
+    """
+    Beberapa versi Beanie expose:
+      - get_motor_collection()  (baru, Motor Async)
+      - get_collection()        (lama)
+    Pakai yang tersedia.
+    """
+    m = getattr(model, "get_motor_collection", None)
+    if callable(m):
+        return m()
+    g = getattr(model, "get_collection", None)
+    if callable(g):
+        return g()
+    raise RuntimeError(f"Tidak menemukan accessor koleksi Mongo untuk {model.__name__}")
+
+def as_datetime(d: date) -> datetime:
+    # BSON tidak punya tipe date; Beanie menyimpan `date` sebagai datetime jam 00:00
+    return datetime.combine(d, time.min)
+
+def new_revision() -> Binary:
+    # format sama dengan revision_id Beanie (UUID, binary subtype 4) supaya doc.save() tetap kompatibel
+    return Binary.from_uuid(uuid4())
+
+def parse_revision(value: Optional[str]) -> Optional[Binary]:
+    """revision_id dari client (string UUID) -> nilai BSON untuk filter; ValueError kalau tidak valid."""
+    return None if value is None else Binary.from_uuid(UUID(value))
+
+def revision_str(value: Any) -> Optional[str]:
+    if isinstance(value, Binary):
+        value = value.as_uuid()
+    return None if value is None else str(value)
+
+REVISION_LOG = 8  # revisi terakhir yang disimpan di revision_log per transaksi
+
+def revision_update(changes: Dict[str, Any], rev: Binary) -> Dict[str, Any]:
+    # revision_log append-only (dibatasi): setelah bulk_write bisa dicek tulisan mana yang benar-benar masuk,
+    # termasuk yang sudah ditimpa writer lain sesudahnya
+    return {"$set": {**changes, "revision_id": rev}, "$push": {"revision_log": {"$each": [rev], "$slice": -REVISION_LOG}}}
+
+async def unapplied_revisions(coll, sent: List[Tuple[Any, Binary]]) -> Set[Any]:
+    """BulkWriteResult tidak per-op: -> _id yang revisinya tidak pernah tersimpan (kalah race dengan writer lain)."""
+    applied = {d["_id"]: d.get("revision_log") or [] for d in await coll.find(
+        {"_id": {"$in": [oid for oid, _ in sent]}}, {"revision_log": 1}
+    ).to_list(length=len(sent))}
+    return {oid for oid, rev in sent if rev not in applied.get(oid, ())}
+
+_ILLEGAL_OPERATION = 20  # mongod standalone: "Transaction numbers are only allowed on a replica set member or mongos"
 
+async def run_in_transaction(work):
+    """
+    Jalankan `work(session)` di dalam transaksi Mongo.
+    Di mongod standalone (tanpa replica set) transaksi tidak tersedia, jadi jalankan tanpa session.
+    """
+    client = get_collection(Transaction).database.client
     try:
-        await db["transactions"].create_index([("date", 1)])
-        await db["transactions"].create_index([("created_at", -1)])
-        await db["transactions"].create_index([("category_id", 1)])
-        await db["transactions"].create_index(
-            [("description", "text"), ("merchant", "text")],
-            name="text_desc_merchant"
-        )
-    except Exception:
-        pass
+        async with await client.start_session() as session:
+            async with session.start_transaction():
+                return await work(session)
+    except OperationFailure as e:
+        if e.code != _ILLEGAL_OPERATION:
+            raise
+    return await work(None)
+
+DOCUMENT_MODELS = [Category, Transaction, DailyCategoryRollup, LabelQueueItem, Rule, RecurringSeries, DuplicateFlag,
+                   RetrainJob]
+
+_client: Optional[AsyncIOMotorClient] = None
+
+async def init_db():
+    """Buat client + init Beanie. Index tidak dibuat di sini (lihat ensure_indexes) supaya boot tetap cepat."""
+    global _client
+    _client = AsyncIOMotorClient(
+        settings.MONGO_URI,
+        event_listeners=[command_metrics],
+        maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+        connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    )
+    db = _client[settings.MONGO_DB]
+    command_metrics.bind(db)
+    await init_beanie(database=db, document_models=DOCUMENT_MODELS)
+    return db
+
+def close_db():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+async def ensure_indexes(db):
+    # dijalankan di background setelah boot; build index di Mongo >= 4.2 tidak mengunci koleksi
+    await _drop_legacy_indexes(db)
+    # semua query di-scope per user, jadi user_id selalu jadi prefix index.
+    # compound (user_id, sort key, _id) untuk keyset pagination; prefix-nya juga melayani filter tunggal
+    await db["transactions"].create_index([("user_id", 1), ("date", 1), ("_id", 1)])
+    await db["transactions"].create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+    await db["transactions"].create_index([("user_id", 1), ("amount", 1), ("_id", 1)])
+    await db["transactions"].create_index([("user_id", 1), ("category_id", 1), ("created_at", -1), ("_id", -1)])
+    await db["transactions"].create_index([("user_id", 1), ("category_id", 1), ("date", 1), ("_id", 1)])
+    await db["transactions"].create_index(
+        [("user_id", 1), ("description", "text"), ("merchant", "text")],
+        name="text_user_desc_merchant"
+    )
+    await db["transactions"].create_index([("user_id", 1), ("merchant_lc", 1)])
+    await db["transactions"].create_index(
+        [("user_id", 1), ("dedupe_key", 1)],
+        unique=True,
+        name="uniq_user_dedupe_key",
+        partialFilterExpression={"dedupe_key": {"$type": "string"}},
+    )
+    await db["categories"].create_index([("user_id", 1), ("name", 1)])
+    await db["response_cache"].create_index(
+        [("created_at", 1)], expireAfterSeconds=int(settings.RESPONSE_CACHE_TTL)
+    )
+    await db["rollup_daily_category"].create_index(
+        [("user_id", 1), ("date", 1), ("category_id", 1)], unique=True, name="uniq_user_date_category"
+    )
+    await db["labeling_queue"].create_index([("user_id", 1), ("score", 1), ("_id", 1)])
+    await db["labeling_queue"].create_index([("user_id", 1), ("tx_id", 1)])
+    await db["labeling_queue"].create_index([("user_id", 1), ("refresh_id", 1)])
+    await db["rules"].create_index([("user_id", 1), ("enabled", 1), ("priority", -1), ("_id", 1)])
+    await db["recurring_series"].create_index([("user_id", 1), ("key", 1)], unique=True, name="uniq_user_key")
+    await db["recurring_series"].create_index([("user_id", 1), ("period", 1), ("next_expected", 1)])
+    await db["recurring_series"].create_index([("user_id", 1), ("occurrences.tx_id", 1)])
+    await db["duplicate_flags"].create_index([("user_id", 1), ("tx_id", 1)], unique=True)
+    await db["duplicate_flags"].create_index([("user_id", 1), ("dismissed", 1), ("date", -1)])
+    await db["duplicate_flags"].create_index([("user_id", 1), ("duplicate_of", 1)])
+    # satu retrain berjalan per user, lintas worker
+    await db["retrain_jobs"].create_index(
+        [("user_id", 1), ("active", 1)], unique=True, name="uniq_user_active",
+        partialFilterExpression={"active": True},
+    )
+    await db["retrain_jobs"].create_index([("user_id", 1), ("finished_at", -1)])
+
+# index single-field dari versi sebelum scoping per user; diganti versi berawalan user_id di atas
+_LEGACY_INDEXES = {
+    "transactions": ["date_1", "created_at_-1", "category_id_1", "text_desc_merchant"],
+}
+
+async def _drop_legacy_indexes(db):
+    for coll, names in _LEGACY_INDEXES.items():
+        existing = await db[coll].index_information()
+        for name in names:
+            if name not in existing:
+                continue
+            try:
+                await db[coll].drop_index(name)
+            except OperationFailure:
+                logger.exception("ensure_indexes: gagal drop index lama %s.%s", coll, name)
+
+async def backfill_merchant_lc() -> int:
+    # sekali jalan untuk dokumen lama yang belum punya merchant_lc (update pipeline, tanpa round-trip per dokumen)
+    res = await get_collection(Transaction).update_many(
+        {"merchant_lc": {"$exists": False}, "merchant": {"$type": "string"}},
+        [{"$set": {"merchant_lc": {"$toLower": {"$trim": {"input": "$merchant"}}}}}],
+    )
+    return res.modified_count
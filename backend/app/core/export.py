@@ -0,0 +1,189 @@
+# Encoder export yang bekerja per batch: CSV, NDJSON, Arrow IPC stream, dan Parquet.
+# Setiap batch langsung di-encode lalu dilepas, jadi memori tetap datar berapa pun jumlah barisnya.
+# Arrow/Parquet butuh pyarrow (opsional, tidak ada di requirements); di-import hanya saat dipakai.
+import asyncio, csv, io, time
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Sequence, Tuple
+from app.core.config import settings
+from app.core.metrics import Counter, Histogram, LATENCY_BUCKETS
+from app.core.responses import dumps
+
+FORMATS = ("csv", "ndjson", "arrow", "parquet")
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXTENSIONS = {"csv": "csv", "ndjson": "ndjson", "arrow": "arrows", "parquet": "parquet"}
+
+# kolom -> tipe logis: string | float | int | date | timestamp
+Columns = Sequence[Tuple[str, str]]
+
+export_rows = Counter("export_rows_total", "Baris yang diekspor", ("format",))
+export_bytes = Counter("export_bytes_total", "Byte yang dikirim endpoint export", ("format",))
+export_seconds = Histogram(LATENCY_BUCKETS + (30.0, 60.0, 300.0), "export_duration_seconds",
+                           "Durasi satu export dari query sampai byte terakhir", ("format",))
+export_throughput = Histogram([1e5, 1e6, 5e6, 1e7, 2.5e7, 5e7, 1e8, 2.5e8], "export_throughput_bytes_per_second",
+                              "Throughput download per export", ("format",))
+
+
+def require_pyarrow(fmt: str):
+    """ImportError kalau format kolumnar diminta tapi pyarrow tidak terpasang."""
+    if fmt in ("arrow", "parquet"):
+        import pyarrow  # noqa: F401
+
+
+def _cell(v: Any) -> Any:
+    if v is None:
+        return ""
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    return v
+
+
+class _CsvEncoder:
+    def __init__(self, columns: Columns):
+        self.names = [c for c, _ in columns]
+
+    def header(self) -> bytes:
+        return self._write([self.names])
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        return self._write([[_cell(r.get(c)) for c in self.names] for r in rows])
+
+    def close(self) -> bytes:
+        return b""
+
+    @staticmethod
+    def _write(lines) -> bytes:
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerows(lines)
+        return buf.getvalue().encode("utf-8")
+
+
+class _NdjsonEncoder:
+    def __init__(self, columns: Columns):
+        self.names = [c for c, _ in columns]
+
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        return b"".join(dumps({c: r.get(c) for c in self.names}) + b"\n" for r in rows)
+
+    def close(self) -> bytes:
+        return b""
+
+
+class _Sink:
+    """File-like write-only untuk writer pyarrow; byte yang tertulis diambil per batch lewat take()."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.pos = 0
+        self.closed = False
+
+    def write(self, b) -> int:
+        b = bytes(b)
+        self.chunks.append(b)
+        self.pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self.pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        out = b"".join(self.chunks)
+        self.chunks.clear()
+        return out
+
+
+class _ArrowEncoder:
+    """Satu RecordBatch per batch cursor; Parquet menulis satu row group per batch."""
+
+    def __init__(self, columns: Columns, parquet: bool):
+        import pyarrow as pa
+        types = {"string": pa.string(), "float": pa.float64(), "int": pa.int64(),
+                 "date": pa.date32(), "timestamp": pa.timestamp("ms")}
+        self.pa = pa
+        self.schema = pa.schema([(c, types[t]) for c, t in columns])
+        self.sink = _Sink()
+        if parquet:
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(pa.PythonFile(self.sink, mode="w"), self.schema)
+        else:
+            self.writer = pa.ipc.new_stream(pa.PythonFile(self.sink, mode="w"), self.schema)
+
+    def header(self) -> bytes:
+        return self.sink.take()
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        data = {name: [r.get(name) for r in rows] for name in self.schema.names}
+        batch = self.pa.RecordBatch.from_pydict(data, schema=self.schema)
+        if hasattr(self.writer, "write_batch"):
+            self.writer.write_batch(batch)
+        else:
+            self.writer.write_table(self.pa.Table.from_batches([batch]))
+        return self.sink.take()
+
+    def close(self) -> bytes:
+        self.writer.close()
+        return self.sink.take()
+
+
+def make_encoder(fmt: str, columns: Columns):
+    if fmt == "csv":
+        return _CsvEncoder(columns)
+    if fmt == "ndjson":
+        return _NdjsonEncoder(columns)
+    return _ArrowEncoder(columns, parquet=(fmt == "parquet"))
+
+
+async def stream(cursor, fmt: str, columns: Columns, to_row: Callable[[Dict[str, Any]], Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """Baca cursor Motor per batch, encode, dan yield byte-nya; metrik dicatat juga saat client putus."""
+    t0 = time.perf_counter()
+    rows_out = bytes_out = 0
+    encoder = make_encoder(fmt, columns)
+    date_cols = [c for c, t in columns if t == "date"]
+    try:
+        chunk = encoder.header()
+        if chunk:
+            bytes_out += len(chunk)
+            yield chunk
+        batch: List[Dict[str, Any]] = []
+        async for doc in cursor:
+            row = to_row(doc)
+            for c in date_cols:  # tanggal dari Mongo berupa datetime 00:00
+                v = row.get(c)
+                if isinstance(v, datetime):
+                    row[c] = v.date()
+            batch.append(row)
+            if len(batch) >= settings.EXPORT_BATCH:
+                chunk = await asyncio.to_thread(encoder.encode, batch)
+                rows_out += len(batch)
+                batch = []
+                bytes_out += len(chunk)
+                yield chunk
+        if batch:
+            chunk = await asyncio.to_thread(encoder.encode, batch)
+            rows_out += len(batch)
+            bytes_out += len(chunk)
+            yield chunk
+        chunk = encoder.close()
+        if chunk:
+            bytes_out += len(chunk)
+            yield chunk
+    finally:
+        elapsed = time.perf_counter() - t0
+        export_rows.inc(fmt, amount=rows_out)
+        export_bytes.inc(fmt, amount=bytes_out)
+        export_seconds.observe(elapsed, fmt)
+        if elapsed > 0:
+            export_throughput.observe(bytes_out / elapsed, fmt)
@@ -0,0 +1,181 @@
+# Metrik in-process ringan dengan output format teks Prometheus (GET /metrics).
+import bisect, logging, time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from fastapi import Request
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Any] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self.metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[Any], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [(n, str(v)) for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{n}="{esc(v)}"' for n, v in pairs) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: Optional[str], help: str, labelnames: Sequence[str]):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        if name:
+            REGISTRY.register(self)
+
+
+class Histogram(_Metric):
+    """Histogram kumulatif (gaya Prometheus); label opsional."""
+    kind = "histogram"
+
+    def __init__(self, buckets: Sequence[float], name: Optional[str] = None, help: str = "",
+                 labelnames: Sequence[str] = ()):
+        self.buckets = sorted(buckets)
+        self._series: Dict[Tuple, List] = {}
+        super().__init__(name, help, labelnames)
+
+    def _get(self, labels: Tuple) -> List:
+        s = self._series.get(labels)
+        if s is None:
+            s = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]  # counts (+Inf terakhir), sum, count
+        return s
+
+    def observe(self, value: float, *labels):
+        s = self._get(labels)
+        s[0][bisect.bisect_left(self.buckets, value)] += 1
+        s[1] += value
+        s[2] += 1
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def snapshot(self, *labels) -> Dict[str, object]:
+        counts, total, count = self._get(labels)
+        cumulative, acc = {}, 0
+        for le, c in zip(self.buckets, counts):
+            acc += c
+            cumulative[str(le)] = acc
+        cumulative["+Inf"] = count
+        return {"buckets": cumulative, "sum": total, "count": count}
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in list(self._series.items()):
+            acc = 0
+            for le, c in zip(self.buckets, counts):
+                acc += c
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, ('le', str(le)))} {acc}")
+            lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, hist: Histogram, labels: Tuple):
+        self.hist, self.labels = hist, labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.t0, *self.labels)
+
+
+class Counter(_Metric):
+    """Counter dengan label opsional (default satu label generik)."""
+    kind = "counter"
+
+    def __init__(self, name: Optional[str] = None, help: str = "", labelnames: Sequence[str] = ("label",)):
+        self.values: Dict[Tuple, float] = defaultdict(float)
+        super().__init__(name, help, labelnames)
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] += amount
+
+    def get(self, *labels) -> float:
+        return self.values.get(labels, 0)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {",".join(map(str, k)): v for k, v in self.values.items()}
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {v}" for k, v in list(self.values.items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.values[labels] -= amount
+
+    def set(self, value: float, *labels):
+        self.values[labels] = value
+
+
+class CallbackMetric(_Metric):
+    """Nilai dibaca saat scrape dari fn() -> angka atau {nilai_label: angka}."""
+
+    def __init__(self, name: str, help: str, fn: Callable[[], Any], kind: str = "gauge", labelname: str = "label"):
+        self.fn = fn
+        self.kind = kind
+        super().__init__(name, help, (labelname,))
+
+    def render(self) -> List[str]:
+        try:
+            value = self.fn()
+        except Exception:
+            logger.exception("metrics: callback %s gagal", self.name)
+            return []
+        if isinstance(value, dict):
+            return [f"{self.name}{_fmt_labels(self.labelnames, (k,))} {v}" for k, v in value.items()]
+        return [f"{self.name} {value}"]
+
+
+http_request_seconds = Histogram(LATENCY_BUCKETS, "http_request_duration_seconds",
+                                 "Latency request HTTP per route", ("method", "route", "status"))
+http_in_flight = Gauge("http_requests_in_flight", "Request HTTP yang sedang diproses", ("method",))
+
+
+async def http_metrics_middleware(request: Request, call_next):
+    method = request.method
+    http_in_flight.inc(method)
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        http_in_flight.dec(method)
+        # pakai template path (mis. /transactions/{tx_id}) supaya kardinalitas label tetap kecil
+        route = request.scope.get("route")
+        path = getattr(route, "path", None) or "unmatched"
+        http_request_seconds.observe(time.perf_counter() - t0, method, path, str(status))
@@ -0,0 +1,127 @@
+# Instrumentasi perintah Mongo via pymongo CommandListener (dipasang di AsyncIOMotorClient).
+import asyncio, logging, time
+from typing import Any, Dict, List, Optional, Tuple
+from bson import json_util
+from pymongo import monitoring
+from app.core.config import settings
+from app.core.metrics import Counter, Histogram, LATENCY_BUCKETS
+
+logger = logging.getLogger("app.slow_query")
+
+mongo_command_seconds = Histogram(LATENCY_BUCKETS, "mongo_command_duration_seconds",
+                                  "Durasi perintah Mongo per command dan koleksi", ("command", "collection"))
+mongo_command_failures = Counter("mongo_command_failures_total", "Perintah Mongo yang gagal", ("command", "collection"))
+slow_queries = Counter("mongo_slow_queries_total", "Perintah Mongo di atas SLOW_QUERY_MS", ("command", "collection"))
+
+_EXPLAINABLE = {"find", "aggregate", "count", "distinct"}
+_IGNORED = {"explain", "hello", "ismaster", "isMaster", "ping", "endSessions", "saslStart", "saslContinue",
+            "buildInfo", "getLastError"}
+_STRIP = {"lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern", "cursor"}
+
+
+def _collection(name: str, command: Dict[str, Any]) -> str:
+    if name == "getMore":
+        return str(command.get("collection", ""))
+    value = command.get(name)
+    return value if isinstance(value, str) else ""
+
+
+def _filter_of(name: str, command: Dict[str, Any]):
+    if name == "aggregate":
+        return command.get("pipeline")
+    if name in ("find", "count", "distinct"):
+        return command.get("filter", command.get("query"))
+    if name in ("update", "delete"):
+        return [op.get("q") for op in (command.get("updates") or command.get("deletes") or [])][:5]
+    return None
+
+
+def plan_summary(explain: Dict[str, Any]) -> str:
+    """Ringkas winningPlan jadi rantai stage, mis. 'LIMIT > FETCH > IXSCAN(created_at_-1__id_-1)'."""
+    planner = explain.get("queryPlanner")
+    if planner is None:
+        for stage in explain.get("stages", []):
+            cursor = stage.get("$cursor")
+            if cursor:
+                planner = cursor.get("queryPlanner")
+                break
+    plan = (planner or {}).get("winningPlan") or {}
+    plan = plan.get("queryPlan", plan)  # format SBE (5.x+)
+    parts: List[str] = []
+    while plan:
+        stage = plan.get("stage", "?")
+        if plan.get("indexName"):
+            stage += f"({plan['indexName']})"
+        parts.append(stage)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return " > ".join(parts) or "?"
+
+
+class CommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        self._pending: Dict[Tuple[Any, int], Tuple[str, str, Optional[Dict[str, Any]]]] = {}
+        self._explained: Dict[Tuple[str, str], float] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.db = None
+
+    def bind(self, db):
+        # dipanggil dari init_db: loop dipakai untuk menjadwalkan explain dari thread driver
+        self.db = db
+        self.loop = asyncio.get_running_loop()
+
+    def started(self, event):
+        name = event.command_name
+        if name in _IGNORED:
+            return
+        command = event.command
+        keep = command if name in _EXPLAINABLE else None
+        self._pending[(event.connection_id, event.request_id)] = (name, _collection(name, command), keep)
+
+    def succeeded(self, event):
+        self._finish(event, ok=True)
+
+    def failed(self, event):
+        self._finish(event, ok=False)
+
+    def _finish(self, event, ok: bool):
+        entry = self._pending.pop((event.connection_id, event.request_id), None)
+        if entry is None:
+            return
+        name, coll, command = entry
+        seconds = event.duration_micros / 1e6
+        mongo_command_seconds.observe(seconds, name, coll)
+        if not ok:
+            mongo_command_failures.inc(name, coll)
+        if seconds * 1000.0 >= settings.SLOW_QUERY_MS:
+            self._slow(name, coll, command, seconds)
+
+    def _slow(self, name: str, coll: str, command: Optional[Dict[str, Any]], seconds: float):
+        slow_queries.inc(name, coll)
+        filt = _filter_of(name, command or {})
+        text = json_util.dumps(filt)[:1000] if filt is not None else "-"
+        if not (settings.SLOW_QUERY_EXPLAIN and command and self.loop and self.db is not None):
+            logger.warning("slow mongo %s %s %.1fms filter=%s", name, coll, seconds * 1000.0, text)
+            return
+        # explain paling sering sekali per menit per (command, koleksi), dijalankan di event loop
+        now = time.monotonic()
+        if now - self._explained.get((name, coll), 0.0) < 60.0:
+            logger.warning("slow mongo %s %s %.1fms filter=%s", name, coll, seconds * 1000.0, text)
+            return
+        self._explained[(name, coll)] = now
+        cmd = {k: v for k, v in command.items() if not k.startswith("$") and k not in _STRIP}
+        if name == "aggregate":
+            cmd["cursor"] = {}
+        self.loop.call_soon_threadsafe(
+            lambda: asyncio.ensure_future(self._explain_and_log(name, coll, cmd, seconds, text))
+        )
+
+    async def _explain_and_log(self, name: str, coll: str, cmd: Dict[str, Any], seconds: float, text: str):
+        try:
+            explain = await self.db.command({"explain": cmd, "verbosity": "queryPlanner"})
+            plan = plan_summary(explain)
+        except Exception as e:
+            plan = f"explain gagal: {e}"
+        logger.warning("slow mongo %s %s %.1fms filter=%s plan=%s", name, coll, seconds * 1000.0, text, plan)
+
+
+command_metrics = CommandMetrics()
@@ -0,0 +1,27 @@
+# Status kesiapan worker untuk /ready. /health hanya bilang proses hidup;
+# /ready baru 200 setelah semua langkah startup di background selesai.
+import time
+from typing import Any, Dict, Optional
+
+STEPS = ("db", "indexes", "rollup", "model")
+
+
+class Readiness:
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self._steps: Dict[str, Dict[str, Any]] = {s: {"done": False} for s in STEPS}
+
+    def mark(self, step: str, error: Optional[str] = None, **info):
+        # step yang gagal tetap dianggap selesai (worker tetap melayani), error-nya dilaporkan
+        self._steps[step] = {"done": True, "seconds": round(time.monotonic() - self.started_at, 3),
+                             "error": error, **info}
+
+    @property
+    def ready(self) -> bool:
+        return all(s["done"] for s in self._steps.values())
+
+    def report(self) -> Dict[str, Any]:
+        return {"ready": self.ready, "steps": {k: dict(v) for k, v in self._steps.items()}}
+
+
+readiness = Readiness()
@@ -0,0 +1,253 @@
+# Deteksi pembayaran berulang & transaksi dobel secara inkremental.
+# Tiap user punya satu dokumen recurring_series per signature (merchant + nominal) berisi tanggal
+# kemunculan terbaru yang terurut. Baris baru cukup dicocokkan ke dokumen signature-nya (satu find
+# $in + satu bulk_write per batch), jadi biaya tumbuh dengan jumlah baris baru, bukan riwayat akun.
+import asyncio, calendar, logging, re, statistics, sys, time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import DeleteOne, UpdateOne
+from app.core.config import settings
+from app.core.db import get_collection, as_datetime
+from app.core.metrics import Counter, Histogram, LATENCY_BUCKETS
+from app.models.recurring import DuplicateFlag, RecurringSeries
+from app.models.transaction import Transaction
+
+logger = logging.getLogger(__name__)
+observe_seconds = Histogram(LATENCY_BUCKETS, "recurring_observe_duration_seconds",
+                            "Durasi deteksi recurring/duplikat per batch transaksi baru")
+duplicates_flagged = Counter("duplicates_flagged_total", "Transaksi yang ditandai kemungkinan dobel")
+
+# (nama, panjang hari, toleransi hari); bulanan 28-31 hari masih cocok dengan 30±3
+PERIODS = (("weekly", 7, 1), ("biweekly", 14, 2), ("monthly", 30, 3), ("quarterly", 91, 7), ("yearly", 365, 10))
+_NOT_RECURRING = {"period": None, "period_days": None, "confidence": 0.0, "next_expected": None}
+_NOISE = re.compile(r"[\W\d_]+")  # angka (no. referensi, tanggal) dan tanda baca dibuang
+_FIELDS = {"date": 1, "description": 1, "merchant": 1, "amount": 1}
+
+_running: Dict[Optional[str], asyncio.Task] = {}
+
+
+def _day(d) -> datetime:
+    if isinstance(d, datetime):
+        return datetime(d.year, d.month, d.day)
+    return as_datetime(d)
+
+
+def normalize(text: Optional[str]) -> str:
+    return " ".join(_NOISE.sub(" ", (text or "").lower()).split())
+
+
+def signature(description: Optional[str], merchant: Optional[str], amount: Any) -> Tuple[str, str]:
+    """-> (key series, description ternormalisasi). Tanpa merchant, tiga kata pertama description dipakai."""
+    desc = normalize(description)
+    merchant_key = normalize(merchant) or " ".join(desc.split()[:3])
+    return f"{merchant_key}|{float(amount or 0.0):.2f}", desc
+
+
+def _add_months(d: datetime, months: int) -> datetime:
+    m = d.month - 1 + months
+    year, month = d.year + m // 12, m % 12 + 1
+    return d.replace(year=year, month=month, day=min(d.day, calendar.monthrange(year, month)[1]))
+
+
+def infer_period(days: List[datetime]) -> Dict[str, Any]:
+    """Period dari median jarak antar tanggal unik; cocok kalau >= 60% jarak masuk toleransi period itu."""
+    days = sorted(set(days))
+    if len(days) < settings.RECURRING_MIN_OCCURRENCES:
+        return dict(_NOT_RECURRING)
+    gaps = [(b - a).days for a, b in zip(days, days[1:])]
+    median = statistics.median(gaps)
+    for name, length, tol in PERIODS:
+        if abs(median - length) > tol:
+            continue
+        confidence = sum(1 for g in gaps if abs(g - length) <= tol) / len(gaps)
+        if confidence < 0.6:
+            break
+        last = days[-1]
+        if name == "monthly":
+            nxt = _add_months(last, 1)
+        elif name == "quarterly":
+            nxt = _add_months(last, 3)
+        elif name == "yearly":
+            nxt = _add_months(last, 12)
+        else:
+            nxt = last + timedelta(days=length)
+        return {"period": name, "period_days": length, "confidence": round(confidence, 3), "next_expected": nxt}
+    return dict(_NOT_RECURRING)
+
+
+def _find_duplicate(occ: List[Dict[str, Any]], new: Dict[str, Any]) -> Optional[ObjectId]:
+    # occ dibatasi RECURRING_HISTORY entry, jadi scan ini O(1) terhadap riwayat akun
+    window = timedelta(days=settings.DUPLICATE_WINDOW_DAYS)
+    for o in reversed(occ):
+        if o["date"] < new["date"] - window:
+            break
+        if o["date"] <= new["date"] + window and o["desc"] == new["desc"] and o["tx_id"] != new["tx_id"]:
+            return o["tx_id"]
+    return None
+
+
+async def observe(user_id: Optional[str], rows: Iterable[Dict[str, Any]]) -> Dict[ObjectId, ObjectId]:
+    """
+    Masukkan transaksi baru (dict dengan _id, date, description, merchant, amount) ke index signature.
+    -> {tx_id: duplicate_of} untuk baris yang kemungkinan dobel.
+    """
+    t0 = time.perf_counter()
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    samples: Dict[str, Dict[str, Any]] = {}
+    descriptions: Dict[ObjectId, str] = {}
+    for r in rows:
+        key, desc = signature(r.get("description"), r.get("merchant"), r.get("amount"))
+        groups.setdefault(key, []).append({"date": _day(r["date"]), "tx_id": r["_id"], "desc": desc})
+        samples[key] = r
+        descriptions[r["_id"]] = r.get("description") or ""
+    if not groups:
+        return {}
+
+    coll = get_collection(RecurringSeries)
+    existing = {
+        d["key"]: d.get("occurrences", [])
+        for d in await coll.find({"user_id": user_id, "key": {"$in": list(groups)}},
+                                 {"key": 1, "occurrences": 1}).to_list(length=len(groups))
+    }
+    cap = settings.RECURRING_HISTORY
+    now = datetime.utcnow()
+    ops: List[UpdateOne] = []
+    dupes: Dict[ObjectId, Tuple[ObjectId, str, Dict[str, Any]]] = {}
+    for key, new in groups.items():
+        new.sort(key=lambda o: o["date"])
+        occ = list(existing.get(key, []))
+        for o in new:
+            dup = _find_duplicate(occ, o)
+            if dup is not None:
+                dupes[o["tx_id"]] = (dup, key, o)
+            occ.append(o)
+            if len(occ) > 1 and occ[-2]["date"] > o["date"]:  # baris lama (backdated) masuk di tengah
+                occ.sort(key=lambda x: x["date"])
+            del occ[:-cap]
+        sample = samples[key]
+        ops.append(UpdateOne(
+            {"user_id": user_id, "key": key},
+            {
+                # $push + $sort + $slice: riwayat tetap terurut & terbatas walau ada writer paralel
+                "$push": {"occurrences": {"$each": new, "$sort": {"date": 1}, "$slice": -cap}},
+                "$inc": {"n": len(new)},
+                "$min": {"first_date": new[0]["date"]},
+                "$max": {"last_date": new[-1]["date"]},
+                "$set": {**infer_period([o["date"] for o in occ]), "merchant": sample.get("merchant"),
+                         "description": sample.get("description") or "", "amount": float(sample.get("amount") or 0.0),
+                         "updated_at": now},
+            },
+            upsert=True,
+        ))
+    await coll.bulk_write(ops, ordered=False)
+
+    if dupes:
+        await get_collection(DuplicateFlag).bulk_write([
+            UpdateOne({"user_id": user_id, "tx_id": tx_id}, {"$setOnInsert": {
+                "duplicate_of": dup, "key": key, "date": o["date"], "amount": float(samples[key].get("amount") or 0.0),
+                "description": descriptions[tx_id], "dismissed": False, "created_at": now,
+            }}, upsert=True)
+            for tx_id, (dup, key, o) in dupes.items()
+        ], ordered=False)
+        duplicates_flagged.inc(amount=len(dupes))
+    observe_seconds.observe(time.perf_counter() - t0)
+    return {tx_id: dup for tx_id, (dup, _, _) in dupes.items()}
+
+
+async def forget(user_id: Optional[str], tx_ids: List[ObjectId]):
+    """Keluarkan transaksi yang dihapus / berubah signature dari series dan flag duplikat."""
+    if not tx_ids:
+        return
+    coll = get_collection(RecurringSeries)
+    gone = set(tx_ids)
+    ops: List[Any] = []
+    for d in await coll.find({"user_id": user_id, "occurrences.tx_id": {"$in": tx_ids}},
+                             {"occurrences": 1, "n": 1}).to_list(length=None):
+        occ = [o for o in d["occurrences"] if o["tx_id"] not in gone]
+        removed = len(d["occurrences"]) - len(occ)
+        if d.get("n", 0) <= removed:
+            ops.append(DeleteOne({"_id": d["_id"]}))
+            continue
+        ops.append(UpdateOne({"_id": d["_id"]}, {
+            "$pull": {"occurrences": {"tx_id": {"$in": tx_ids}}},
+            "$inc": {"n": -removed},
+            "$set": {**infer_period([o["date"] for o in occ]), "updated_at": datetime.utcnow()},
+        }))
+    if ops:
+        await coll.bulk_write(ops, ordered=False)
+    await get_collection(DuplicateFlag).delete_many(
+        {"user_id": user_id, "$or": [{"tx_id": {"$in": tx_ids}}, {"duplicate_of": {"$in": tx_ids}}]}
+    )
+
+
+async def resync(user_id: Optional[str], tx_ids: List[ObjectId]):
+    # dipanggil setelah PATCH yang mengubah date/description/merchant/amount
+    if not tx_ids:
+        return
+    await forget(user_id, tx_ids)
+    docs = await get_collection(Transaction).find(
+        {"_id": {"$in": tx_ids}, "user_id": user_id}, _FIELDS
+    ).to_list(length=len(tx_ids))
+    await observe(user_id, docs)
+
+
+async def rebuild(user_id: Optional[str]) -> Dict[str, Any]:
+    """Bangun ulang index signature user dari seluruh riwayat (sekali, untuk data sebelum fitur ini ada)."""
+    t0 = time.perf_counter()
+    await get_collection(RecurringSeries).delete_many({"user_id": user_id})
+    # flag yang sudah di-dismiss user dipertahankan ($setOnInsert tidak menimpanya)
+    await get_collection(DuplicateFlag).delete_many({"user_id": user_id, "dismissed": False})
+    cursor = get_collection(Transaction).find({"user_id": user_id}, _FIELDS) \
+        .sort([("date", 1), ("_id", 1)]).batch_size(settings.RETRAIN_FETCH_BATCH)
+    scanned, duplicates = 0, 0
+    batch: List[Dict[str, Any]] = []
+    async for d in cursor:
+        batch.append(d)
+        if len(batch) >= settings.RETRAIN_FETCH_BATCH:
+            duplicates += len(await observe(user_id, batch))
+            scanned += len(batch)
+            batch = []
+    if batch:
+        duplicates += len(await observe(user_id, batch))
+        scanned += len(batch)
+    return {"scanned": scanned, "duplicates": duplicates, "seconds": round(time.perf_counter() - t0, 3)}
+
+
+async def _run(user_id: Optional[str]):
+    try:
+        return await rebuild(user_id)
+    except Exception:
+        logger.exception("recurring: rebuild gagal (user=%s)", user_id)
+        return None
+    finally:
+        _running.pop(user_id, None)
+
+
+def schedule_rebuild(user_id: Optional[str]) -> asyncio.Task:
+    # satu rebuild per user sekaligus
+    task = _running.get(user_id)
+    if task is None or task.done():
+        task = _running[user_id] = asyncio.create_task(_run(user_id))
+    return task
+
+
+def is_running(user_id: Optional[str]) -> bool:
+    task = _running.get(user_id)
+    return task is not None and not task.done()
+
+
+async def _main(argv: List[str]):
+    from app.core.db import init_db, ensure_indexes
+    await ensure_indexes(await init_db())
+    if argv[:1] != ["rebuild"]:
+        print("usage: python -m app.core.recurring rebuild [user_id ...]")
+        return
+    users = argv[1:] or await get_collection(Transaction).distinct("user_id")
+    for uid in users:
+        print(uid, await rebuild(uid))
+
+
+if __name__ == "__main__":
+    # python -m app.core.recurring rebuild [user_id ...]  (tanpa user_id: semua user)
+    asyncio.run(_main(sys.argv[1:]))
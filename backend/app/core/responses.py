@@ -0,0 +1,34 @@
+import json
+from datetime import date, datetime
+from typing import Any
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson ada di requirements, ini hanya jaga-jaga
+    orjson = None
+
+
+def _default(obj: Any):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Tidak bisa serialize {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Serialize langsung dict/list mentah (tanpa jsonable_encoder / validasi pydantic per baris).
+    Pakai orjson kalau tersedia.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
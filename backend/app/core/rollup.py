@@ -0,0 +1,230 @@
+# Rollup user x hari x kategori (total, n, min_amount, max_amount) yang di-update inkremental oleh setiap jalur tulis.
+import asyncio, sys
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+from app.core.db import get_collection, as_datetime
+from app.models.rollup import DailyCategoryRollup
+from app.models.transaction import Transaction
+
+Row = Tuple[Any, Optional[str], float]  # (date, category_id, amount)
+
+
+def _coll():
+    return get_collection(DailyCategoryRollup)
+
+
+def _day(d) -> datetime:
+    if isinstance(d, datetime):
+        return datetime(d.year, d.month, d.day)
+    return as_datetime(d)
+
+
+def _group(rows: Iterable[Row]) -> Dict[Tuple[datetime, Optional[str]], List[float]]:
+    # semua rows dalam satu panggilan milik user yang sama
+    buckets: Dict[Tuple[datetime, Optional[str]], List[float]] = {}
+    for d, cid, amount in rows:
+        amt = float(amount or 0.0)
+        key = (_day(d), cid)
+        b = buckets.get(key)
+        if b is None:
+            buckets[key] = [amt, 1, amt, amt]  # total, n, min, max
+        else:
+            b[0] += amt
+            b[1] += 1
+            b[2] = min(b[2], amt)
+            b[3] = max(b[3], amt)
+    return buckets
+
+
+def _key(user_id: Optional[str], d: datetime, cid: Optional[str]) -> Dict[str, Any]:
+    return {"user_id": user_id, "date": d, "category_id": cid}
+
+
+def _add_op(user_id: Optional[str], d: datetime, cid: Optional[str],
+            total: float, count: int, lo: float, hi: float) -> UpdateOne:
+    return UpdateOne(
+        _key(user_id, d, cid),
+        {"$inc": {"total": total, "n": count}, "$min": {"min_amount": lo}, "$max": {"max_amount": hi}},
+        upsert=True,
+    )
+
+
+async def add(user_id: Optional[str], rows: Iterable[Row]):
+    buckets = _group(rows)
+    if not buckets:
+        return
+    ops = [_add_op(user_id, d, cid, *b) for (d, cid), b in buckets.items()]
+    await _coll().bulk_write(ops, ordered=False)
+
+
+async def _recompute(user_id: Optional[str], d: datetime, cid: Optional[str]):
+    # hanya min/max: total & n selalu lewat $inc. Pemanggil sudah menulis transaksinya, jadi data
+    # mentah di sini bisa sudah berisi nilai baru; menimpa total/n dari sini akan menghitungnya dua kali
+    rows = await get_collection(Transaction).aggregate([
+        {"$match": _key(user_id, d, cid)},
+        {"$group": {"_id": None, "min": {"$min": "$amount"}, "max": {"$max": "$amount"}}},
+    ]).to_list(length=1)
+    if rows:
+        await _coll().update_one(_key(user_id, d, cid),
+                                 {"$set": {"min_amount": rows[0]["min"], "max_amount": rows[0]["max"]}})
+
+
+async def remove(user_id: Optional[str], rows: Iterable[Row]):
+    buckets = _group(rows)
+    if not buckets:
+        return
+    coll = _coll()
+    ops = [
+        UpdateOne(_key(user_id, d, cid), {"$inc": {"total": -b[0], "n": -int(b[1])}})
+        for (d, cid), b in buckets.items()
+    ]
+    await coll.bulk_write(ops, ordered=False)
+
+    # min/max tidak bisa di-"kurangi": hitung ulang bucket itu saja kalau nilai batasnya ikut terhapus
+    keys = [_key(user_id, d, cid) for d, cid in buckets]
+    async for doc in coll.find({"$or": keys}):
+        b = buckets.get((doc["date"], doc.get("category_id")))
+        if b is None:
+            continue
+        if doc.get("n", 0) <= 0:
+            await coll.delete_one({"_id": doc["_id"]})
+        elif b[2] <= (doc.get("min_amount") or 0.0) or b[3] >= (doc.get("max_amount") or 0.0):
+            await _recompute(user_id, doc["date"], doc.get("category_id"))
+
+
+async def move(user_id: Optional[str], old: Row, new: Row):
+    if (_day(old[0]), old[1], float(old[2] or 0.0)) == (_day(new[0]), new[1], float(new[2] or 0.0)):
+        return
+    await remove(user_id, [old])
+    await add(user_id, [new])
+
+
+async def move_category(user_id: Optional[str], from_cid: str, to_cid: Optional[str] = None, session=None):
+    # dipakai saat kategori dihapus: gabungkan semua bucket kategori itu ke bucket tujuan
+    coll = _coll()
+    scope = {"user_id": user_id, "category_id": from_cid}
+    docs = await coll.find(scope, session=session).to_list(length=None)
+    if not docs:
+        return
+    ops: List[Any] = [
+        _add_op(user_id, d["date"], to_cid, d.get("total", 0.0), d.get("n", 0), d.get("min_amount"), d.get("max_amount"))
+        for d in docs
+    ]
+    ops.append(DeleteMany(scope))
+    await coll.bulk_write(ops, ordered=True, session=session)
+
+
+def _raw_group_stage() -> Dict[str, Any]:
+    return {"$group": {
+        "_id": {
+            "user_id": {"$ifNull": ["$user_id", None]},
+            "date": "$date",
+            "category_id": {"$ifNull": ["$category_id", None]},
+        },
+        "total": {"$sum": "$amount"},
+        "n": {"$sum": 1},
+        "min_amount": {"$min": "$amount"},
+        "max_amount": {"$max": "$amount"},
+    }}
+
+
+async def category_counts(user_id: Optional[str]) -> Dict[Optional[str], int]:
+    # satu $group di rollup (hari x kategori), bukan count per kategori di transactions
+    rows = await _coll().aggregate([
+        {"$match": {"user_id": user_id}},
+        {"$group": {"_id": "$category_id", "n": {"$sum": "$n"}}},
+    ]).to_list(length=None)
+    return {r["_id"]: int(r["n"]) for r in rows}
+
+
+async def rebuild(user_id: Optional[str], batch_size: int = 1000) -> int:
+    """
+    Bangun ulang rollup satu user dari transaksi mentah. Bucket ditimpa per key (ReplaceOne upsert), bukan
+    lewat $out ke seluruh koleksi, jadi rollup user lain dan bucket baru selama rebuild tidak tersentuh.
+    Write user ini ke bucket yang sama selama rebuild berjalan bisa tertimpa; jalankan `check` sesudahnya.
+    """
+    coll = _coll()
+    # snapshot bucket lama: yang tidak lagi punya transaksi dihapus; bucket yang baru muncul selama rebuild dibiarkan
+    stale = {(d["date"], d.get("category_id")): d["_id"]
+             for d in await coll.find({"user_id": user_id}, {"date": 1, "category_id": 1}).to_list(length=None)}
+    cursor = get_collection(Transaction).aggregate([{"$match": {"user_id": user_id}}, _raw_group_stage()])
+    ops: List[Any] = []
+    rebuilt = 0
+    async for r in cursor:
+        d, cid = r["_id"]["date"], r["_id"]["category_id"]
+        stale.pop((d, cid), None)
+        key = _key(user_id, d, cid)
+        ops.append(ReplaceOne(key, {**key, "total": r["total"], "n": r["n"],
+                                    "min_amount": r["min_amount"], "max_amount": r["max_amount"]}, upsert=True))
+        if len(ops) >= batch_size:
+            await coll.bulk_write(ops, ordered=False)
+            rebuilt += len(ops)
+            ops = []
+    if ops:
+        await coll.bulk_write(ops, ordered=False)
+        rebuilt += len(ops)
+    if stale:
+        await coll.delete_many({"_id": {"$in": list(stale.values())}})
+    return rebuilt
+
+
+async def rebuild_all() -> int:
+    # per user, jadi tidak pernah mengganti seluruh koleksi yang sedang dipakai
+    total = 0
+    for user_id in await get_collection(Transaction).distinct("user_id"):
+        total += await rebuild(user_id)
+    return total
+
+
+async def ensure_built():
+    # bootstrap sekali untuk data lama yang belum punya rollup
+    if await _coll().estimated_document_count() == 0 and await get_collection(Transaction).estimated_document_count() > 0:
+        await rebuild_all()
+
+
+async def check(match: Dict[str, Any], max_report: int = 100) -> Dict[str, Any]:
+    pipeline: List[Dict[str, Any]] = [{"$match": match}] if match else []
+    pipeline.append(_raw_group_stage())
+    raw = {
+        (r["_id"]["user_id"], r["_id"]["date"], r["_id"]["category_id"]): (float(r["total"]), int(r["n"]))
+        for r in await get_collection(Transaction).aggregate(pipeline).to_list(length=None)
+    }
+    rolled = {
+        (r.get("user_id"), r["date"], r.get("category_id")): (float(r.get("total", 0.0)), int(r.get("n", 0)))
+        for r in await _coll().find(match or {}).to_list(length=None)
+    }
+
+    mismatches = []
+    for key in sorted(set(raw) | set(rolled), key=lambda k: (k[0] or "", k[1], k[2] or "")):
+        exp, got = raw.get(key, (0.0, 0)), rolled.get(key, (0.0, 0))
+        if exp[1] != got[1] or abs(exp[0] - got[0]) > 0.005:
+            mismatches.append({
+                "user_id": key[0], "date": key[1].date(), "category_id": key[2],
+                "expected": {"total": exp[0], "count": exp[1]},
+                "rollup": {"total": got[0], "count": got[1]},
+            })
+    return {
+        "ok": not mismatches,
+        "buckets_checked": len(set(raw) | set(rolled)),
+        "mismatch_count": len(mismatches),
+        "mismatches": mismatches[:max_report],
+    }
+
+
+async def _main(argv: List[str]):
+    from app.core.db import init_db, ensure_indexes
+    await ensure_indexes(await init_db())
+    if argv[:1] == ["rebuild"]:
+        users = argv[1:]
+        rebuilt = sum([await rebuild(u) for u in users]) if users else await rebuild_all()
+        from app.core.cache import response_cache
+        await response_cache.invalidate_all()
+        print(f"rollup rebuilt: {rebuilt} buckets")
+    else:
+        print(await check({}))
+
+
+if __name__ == "__main__":
+    # python -m app.core.rollup rebuild [user_id ...] | check
+    asyncio.run(_main(sys.argv[1:]))
@@ -0,0 +1,34 @@
+import re
+from typing import Any, Dict, Optional, Tuple
+
+SEARCH_MODES = ("contains", "text", "prefix")
+
+
+def normalize_merchant(merchant: Optional[str]) -> Optional[str]:
+    # dipakai untuk field merchant_lc (index ascending) -> prefix/typeahead pakai index range
+    if not merchant:
+        return None
+    return merchant.strip().lower() or None
+
+
+def search_criteria(q: str, mode: str) -> Tuple[Dict[str, Any], bool]:
+    """
+    Bangun filter pencarian -> (criteria, pakai_text_score?).
+      - text     : $text di index text_user_desc_merchant, diurutkan berdasarkan score
+      - prefix   : regex ter-anchor "^..." di merchant_lc (index range scan)
+      - contains : substring case-insensitive (tetap scan, tapi input di-escape)
+    Input user selalu di-escape, jadi pola patologis tidak bisa memicu backtracking di server.
+    """
+    q = q.strip()
+    if mode == "text":
+        return {"$text": {"$search": q}}, True
+    if mode == "prefix":
+        return {"merchant_lc": {"$regex": "^" + re.escape(q.lower())}}, False
+    pattern = re.escape(q)
+    return {"$or": [
+        {"description": {"$regex": pattern, "$options": "i"}},
+        {"merchant": {"$regex": pattern, "$options": "i"}},
+    ]}, False
+
+
+TEXT_SCORE_SORT = ("score", {"$meta": "textScore"})
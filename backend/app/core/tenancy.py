@@ -0,0 +1,20 @@
+# Scoping data per user. Identitas datang dari header X-User-Id (diisi gateway/auth di depan API);
+# tanpa header, request jatuh ke tenant bersama (user_id None) yang berisi data lama sebelum multi-user.
+import re
+from typing import Optional
+from fastapi import Header, HTTPException
+from app.core.config import settings
+
+USER_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def current_user(x_user_id: Optional[str] = Header(None)) -> Optional[str]:
+    user_id = (x_user_id or "").strip() or None
+    if user_id is None:
+        if settings.REQUIRE_USER:
+            raise HTTPException(status_code=401, detail="Header X-User-Id wajib diisi.")
+        return None
+    # dipakai juga sebagai nama direktori model, jadi batasi karakternya
+    if not USER_ID_RE.match(user_id):
+        raise HTTPException(status_code=400, detail="X-User-Id tidak valid.")
+    return user_id
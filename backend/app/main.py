@@ -1,15 +1,70 @@
+import asyncio, logging
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.core.db import init_db
+from app.core.db import init_db, close_db, ensure_indexes, backfill_merchant_lc
+from app.core import rollup
+from app.core.metrics import http_metrics_middleware
+from app.core.readiness import readiness
 from app.routers.health import router as health_router
+from app.routers.metrics import router as metrics_router
 from app.routers.seed import router as seed_router
 from app.routers.transactions import router as transactions_router
+from app.routers.imports import router as imports_router
 from app.routers.categories import router as categories_router
 from app.routers.labeling import router as labeling_router
 from app.routers.report import router as report_router
+from app.routers.rules import router as rules_router
+from app.routers.export import router as export_router
+from app.routers.recurring import router as recurring_router
+from app.ml.model_ai import router as model_router
+from app.ml.registry import registry
+from app.ml import jobs
 
-app = FastAPI(title="Smart Expense Tracker API")
+logger = logging.getLogger(__name__)
+
+async def _startup_step(step: str, work):
+    try:
+        info = await work()
+        readiness.mark(step, **(info if isinstance(info, dict) else {}))
+    except Exception as e:
+        logger.exception("startup: langkah %s gagal", step)
+        readiness.mark(step, error=str(e))
+
+async def _warm_model():
+    if not settings.WARM_MODEL_ON_STARTUP:
+        return {"skipped": True}
+    return await asyncio.to_thread(registry.warm_up)
+
+async def _background_startup(db):
+    async def data():
+        # rollup bootstrap dan backfill memakai index, jadi jalan setelah index selesai
+        await _startup_step("indexes", lambda: ensure_indexes(db))
+        await _startup_step("rollup", rollup.ensure_built)
+        try:
+            await backfill_merchant_lc()
+        except Exception:
+            logger.exception("startup: backfill merchant_lc gagal")
+
+    await asyncio.gather(data(), _startup_step("model", _warm_model))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # boot hanya menunggu client + Beanie; index, rollup, dan model disiapkan di background (lihat /ready)
+    db = await init_db()
+    readiness.mark("db")
+    app.state.startup_task = asyncio.create_task(_background_startup(db))
+    try:
+        yield
+    finally:
+        app.state.startup_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await app.state.startup_task
+        jobs.shutdown()
+        close_db()
+
+app = FastAPI(title="Smart Expense Tracker API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,14 +73,17 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-@app.on_event("startup")
-async def on_startup():
-    await init_db()
+app.middleware("http")(http_metrics_middleware)
 
 app.include_router(health_router)
+app.include_router(metrics_router)
 app.include_router(seed_router)
+app.include_router(imports_router)
 app.include_router(transactions_router)
 app.include_router(categories_router)
 app.include_router(labeling_router)
-app.include_router(report_router)
\ No newline at end of file
+app.include_router(report_router)
+app.include_router(rules_router)
+app.include_router(export_router)
+app.include_router(recurring_router)
+app.include_router(model_router)
\ No newline at end of file
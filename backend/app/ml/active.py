@@ -0,0 +1,126 @@
+# Antrean active-learning per user: transaksi belum berlabel diurutkan dari yang paling tidak pasti
+# menurut model (margin top-1 - top-2 terkecil). Dihitung di background setelah retrain dan disimpan
+# di koleksi labeling_queue, jadi /labeling/unlabeled cukup membaca index (user_id, score).
+import asyncio, heapq, logging, time, uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from app.core.config import settings
+from app.core.db import get_collection
+from app.core.metrics import Histogram, LATENCY_BUCKETS
+from app.models.labeling_queue import LabelQueueItem
+from app.models.transaction import Transaction
+from app.ml.registry import registry
+from app.ml.text import build_text
+
+logger = logging.getLogger(__name__)
+refresh_seconds = Histogram(LATENCY_BUCKETS + (30.0, 60.0, 120.0), "label_queue_refresh_duration_seconds",
+                            "Durasi refresh antrean labeling per user")
+
+_running: Dict[Optional[str], asyncio.Task] = {}
+
+
+def _score(vec, clf, labels, texts: List[str]) -> List[Tuple[float, str, float]]:
+    # dijalankan di worker thread: satu transform + predict_proba per batch
+    import numpy as np
+    proba = clf.predict_proba(vec.transform(texts))
+    if proba.shape[1] < 2:
+        return [(1.0, labels[0], 1.0)] * len(texts)
+    top2 = np.partition(proba, -2, axis=1)[:, -2:]
+    margin = top2[:, 1] - top2[:, 0]
+    best = np.argmax(proba, axis=1)
+    return [(float(margin[j]), labels[i], float(proba[j, i])) for j, i in enumerate(best)]
+
+
+async def _refresh(user_id: Optional[str]) -> Dict[str, Any]:
+    vec, clf, labels = await asyncio.to_thread(registry.get, user_id)
+    if vec is None:
+        return {"queued": 0, "scored": 0}
+
+    t0 = time.perf_counter()
+    size = settings.LABEL_QUEUE_SIZE
+    cursor = get_collection(Transaction).find(
+        {"user_id": user_id, "category_id": None},
+        {"description": 1, "merchant": 1},
+    ).batch_size(settings.RETRAIN_FETCH_BATCH)
+
+    # max-heap (score negatif) berukuran `size`: simpan hanya baris paling tidak pasti
+    heap: List[Tuple[float, ObjectId, str, float]] = []
+    scored = 0
+    batch: List[Dict[str, Any]] = []
+
+    async def flush():
+        nonlocal scored
+        texts = [build_text(d.get("description"), d.get("merchant")) for d in batch]
+        results = await asyncio.to_thread(_score, vec, clf, labels, texts)
+        for d, (margin, cid, p) in zip(batch, results):
+            item = (-margin, d["_id"], cid, p)
+            if len(heap) < size:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+        scored += len(batch)
+        batch.clear()
+
+    async for d in cursor:
+        batch.append(d)
+        if len(batch) >= settings.RETRAIN_FETCH_BATCH:
+            await flush()
+    if batch:
+        await flush()
+
+    coll = get_collection(LabelQueueItem)
+    refresh_id = uuid.uuid4().hex
+    now = datetime.utcnow()
+    version = registry.version(user_id)
+    docs = [
+        {"user_id": user_id, "tx_id": oid, "score": -neg, "predicted_category": cid, "predicted_proba": p,
+         "model_version": version, "refresh_id": refresh_id, "refreshed_at": now}
+        for neg, oid, cid, p in heap
+    ]
+    if docs:
+        await coll.insert_many(docs, ordered=False)
+    # tulis dulu, baru hapus yang lama: pembaca tidak pernah melihat antrean kosong
+    await coll.delete_many({"user_id": user_id, "refresh_id": {"$ne": refresh_id}})
+    refresh_seconds.observe(time.perf_counter() - t0)
+    return {"queued": len(docs), "scored": scored, "model_version": version}
+
+
+async def _run(user_id: Optional[str]):
+    try:
+        return await _refresh(user_id)
+    except Exception:
+        logger.exception("labeling queue: refresh gagal (user=%s)", user_id)
+        return None
+    finally:
+        _running.pop(user_id, None)
+
+
+def schedule_refresh(user_id: Optional[str]) -> asyncio.Task:
+    # satu refresh per user sekaligus; panggilan berikutnya ikut menunggu task yang sama
+    task = _running.get(user_id)
+    if task is None or task.done():
+        task = _running[user_id] = asyncio.create_task(_run(user_id))
+    return task
+
+
+async def remove(user_id: Optional[str], tx_ids: List[ObjectId]):
+    if tx_ids:
+        await get_collection(LabelQueueItem).delete_many({"user_id": user_id, "tx_id": {"$in": tx_ids}})
+
+
+async def ranked(user_id: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    """Entry antrean teratas (paling tidak pasti), unik per transaksi."""
+    items = await get_collection(LabelQueueItem).find(
+        {"user_id": user_id},
+        {"_id": 0, "tx_id": 1, "score": 1, "predicted_category": 1, "predicted_proba": 1},
+    ).sort([("score", 1), ("_id", 1)]).limit(limit * 2).to_list(length=limit * 2)
+    seen, out = set(), []
+    for it in items:  # saat refresh berjalan entry lama & baru bisa tumpang tindih sebentar
+        if it["tx_id"] in seen:
+            continue
+        seen.add(it["tx_id"])
+        out.append(it)
+        if len(out) == limit:
+            break
+    return out
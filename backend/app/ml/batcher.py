@@ -0,0 +1,91 @@
+import asyncio, time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from app.core.metrics import Histogram, LATENCY_BUCKETS
+
+
+class MicroBatcher:
+    """
+    Kumpulkan item dari banyak request selama max_wait_ms atau sampai max_batch item,
+    lalu jalankan satu panggilan vektor per key (di worker thread) dan bagikan hasilnya ke tiap caller.
+    `fn(key, texts)` harus sinkron dan mengembalikan list sepanjang texts, atau None (model belum ada).
+    Key memisahkan item yang butuh model berbeda (mis. user_id); item dengan key sama digabung.
+    """
+
+    def __init__(self, fn: Callable[[Hashable, List[str]], Optional[List[Any]]], max_batch: int, max_wait_ms: float):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.batch_size = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024],
+                                    "predict_batch_size", "Jumlah item per batch prediksi")
+        self.queue_wait_ms = Histogram([0.5, 1, 2, 5, 10, 25, 50, 100, 250],
+                                       "predict_queue_wait_ms", "Waktu tunggu item di antrean batcher (ms)")
+        self.batch_seconds = Histogram(LATENCY_BUCKETS, "predict_batch_duration_seconds",
+                                       "Durasi transform + predict_proba per batch")
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def submit(self, texts: List[str], key: Hashable = None) -> Optional[List[Any]]:
+        if not texts:
+            return []
+        self._ensure_worker()
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((key, texts, fut, time.perf_counter()))
+        return await fut
+
+    async def _collect(self) -> List[Tuple[Hashable, List[str], asyncio.Future, float]]:
+        batch = [await self._queue.get()]
+        size = len(batch[0][1])
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while size < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            size += len(item[1])
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            started = time.perf_counter()
+            groups: Dict[Hashable, List[Tuple[List[str], asyncio.Future]]] = {}
+            for key, item_texts, fut, enqueued in batch:
+                groups.setdefault(key, []).append((item_texts, fut))
+                self.queue_wait_ms.observe((started - enqueued) * 1000.0)
+            for key, items in groups.items():
+                await self._run_group(key, items)
+
+    async def _run_group(self, key: Hashable, items: List[Tuple[List[str], asyncio.Future]]):
+        texts: List[str] = []
+        for item_texts, _ in items:
+            texts.extend(item_texts)
+        self.batch_size.observe(len(texts))
+
+        try:
+            with self.batch_seconds.time():
+                results = await asyncio.to_thread(self.fn, key, texts)
+        except Exception as e:
+            for _, fut in items:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        pos = 0
+        for item_texts, fut in items:
+            n = len(item_texts)
+            if not fut.done():
+                fut.set_result(None if results is None else results[pos:pos + n])
+            pos += n
+
+    def stats(self):
+        return {"batch_size": self.batch_size.snapshot(), "queue_wait_ms": self.queue_wait_ms.snapshot()}
@@ -0,0 +1,213 @@
+import asyncio, copy, logging, multiprocessing, time, uuid
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional
+from pymongo.errors import DuplicateKeyError
+from app.core.config import settings
+from app.core.db import get_collection
+from app.models.retrain_job import RetrainJob
+from app.models.transaction import Transaction
+from app.ml.model_store import save_model
+from app.ml.registry import registry
+from app.ml import active
+from app.ml.text import build_text
+
+logger = logging.getLogger(__name__)
+# status job disimpan di Mongo (retrain_jobs) supaya terbaca dari worker mana pun;
+# training-nya sendiri tetap jalan di process pool milik worker yang menerima request
+incremental_stats = {"updates": 0, "skipped": 0, "saves": 0}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_tasks = set()
+_learn_locks: Dict[Optional[str], asyncio.Lock] = {}
+_unsaved: Dict[Optional[str], int] = {}
+
+RUNNING = ("queued", "loading", "training")
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn (bukan fork): proses API sudah punya thread Motor/event loop yang tidak aman di-fork
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.RETRAIN_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _spawn(coro):
+    # simpan referensi task supaya tidak di-GC sebelum selesai
+    task = asyncio.create_task(coro)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
+
+
+def _coll():
+    return get_collection(RetrainJob)
+
+
+def _public(doc: Dict[str, Any]) -> Dict[str, Any]:
+    doc = dict(doc)
+    doc.pop("active", None)
+    return {"job_id": doc.pop("_id"), **doc}
+
+
+async def _save(job: Dict[str, Any], **fields):
+    job.update(fields)
+    fields["updated_at"] = job["updated_at"] = time.time()
+    await _coll().update_one({"_id": job["job_id"]}, {"$set": fields})
+
+
+async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    doc = await _coll().find_one({"_id": job_id})
+    return _public(doc) if doc else None
+
+
+async def active_job(user_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    doc = await _coll().find_one({"user_id": user_id, "active": True})
+    if doc is None:
+        return None
+    if time.time() - doc.get("updated_at", 0) > settings.JOB_STALE_SECONDS:
+        # worker pemilik job mati di tengah jalan: lepaskan slot supaya user bisa retrain lagi
+        await _coll().update_one(
+            {"_id": doc["_id"], "updated_at": doc.get("updated_at")},
+            {"$set": {"status": "failed", "error": "worker berhenti sebelum job selesai", "finished_at": time.time()},
+             "$unset": {"active": ""}},
+        )
+        return None
+    return _public(doc)
+
+
+async def _stream_training_data(job: Dict[str, Any]):
+    # baca langsung dari cursor Motor per batch, hanya field yang dipakai untuk teks & label
+    coll = get_collection(Transaction)
+    cursor = coll.find(
+        {"user_id": job["user_id"], "category_id": {"$ne": None}},
+        {"_id": 0, "description": 1, "merchant": 1, "category_id": 1},
+    ).batch_size(settings.RETRAIN_FETCH_BATCH)
+
+    texts: List[str] = []
+    y: List[str] = []
+    total = max(job["total_rows"], 1)
+    async for d in cursor:
+        texts.append(build_text(d.get("description"), d.get("merchant")))
+        y.append(d["category_id"])
+        if len(y) % settings.RETRAIN_FETCH_BATCH == 0:
+            await _save(job, rows_loaded=len(y), progress=round(0.5 * min(len(y) / total, 1.0), 3))
+    await _save(job, rows_loaded=len(y))
+    return texts, y
+
+
+async def _run(job: Dict[str, Any]):
+    try:
+        await _save(job, status="loading")
+        texts, y = await _stream_training_data(job)
+
+        await _save(job, status="training", progress=0.5)
+        from app.ml import training  # sklearn dimuat saat job pertama, bukan saat boot
+        if job["mode"] == "incremental":
+            fn = partial(training.train_incremental, texts, y,
+                         settings.INCREMENTAL_N_FEATURES, settings.RETRAIN_FETCH_BATCH, job["user_id"])
+        else:
+            fn = partial(training.train_full, texts, y, job["user_id"])
+        result = await asyncio.get_running_loop().run_in_executor(_get_pool(), fn)
+
+        # model ditulis oleh proses anak; paksa registry cek versi terbaru
+        registry.refresh(job["user_id"])
+        active.schedule_refresh(job["user_id"])
+        done = dict(
+            status="done",
+            progress=1.0,
+            trained_on_rows=len(y),
+            version=result["version"],
+            classes=result["classes"],
+            accuracy=result["accuracy"],
+        )
+    except Exception as e:
+        done = dict(status="failed", error=str(e))
+    job.update(done, finished_at=time.time())
+    try:
+        await _coll().update_one({"_id": job["job_id"]},
+                                 {"$set": {**done, "finished_at": job["finished_at"], "updated_at": job["finished_at"]},
+                                  "$unset": {"active": ""}})
+        await _prune_jobs(job["user_id"])
+    except Exception:
+        logger.exception("retrain: gagal menyimpan status akhir job %s", job["job_id"])
+
+
+async def _prune_jobs(user_id: Optional[str]):
+    # job yang sudah selesai hanya disimpan JOB_HISTORY terakhir per user; yang masih berjalan tidak disentuh
+    old = await _coll().find({"user_id": user_id, "finished_at": {"$ne": None}}, {"_id": 1}) \
+        .sort([("finished_at", -1)]).skip(settings.JOB_HISTORY).to_list(length=None)
+    if old:
+        await _coll().delete_many({"_id": {"$in": [d["_id"] for d in old]}})
+
+
+async def submit_retrain(user_id: Optional[str], mode: str, total_rows: int) -> Optional[Dict[str, Any]]:
+    """Simpan job baru lalu jalankan di background; None kalau user masih punya retrain yang berjalan."""
+    now = time.time()
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "user_id": user_id,
+        "mode": mode,
+        "status": "queued",
+        "progress": 0.0,
+        "total_rows": total_rows,
+        "rows_loaded": 0,
+        "trained_on_rows": None,
+        "version": None,
+        "classes": None,
+        "accuracy": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+        "finished_at": None,
+    }
+    doc = {"_id": job["job_id"], **{k: v for k, v in job.items() if k != "job_id"}, "active": True}
+    try:
+        await _coll().insert_one(doc)
+    except DuplicateKeyError:
+        return None  # index unik (user_id, active): worker lain baru saja memulai retrain user ini
+    _spawn(_run(job))
+    return job
+
+
+async def learn_labels(user_id: Optional[str], texts: List[str], y: List[str]) -> int:
+    """Update model incremental (partial_fit) milik user dengan label baru tanpa refit penuh."""
+    vec, clf, _ = await asyncio.to_thread(registry.get, user_id)
+    if clf is None or not hasattr(clf, "partial_fit"):
+        return 0
+    lock = _learn_locks.setdefault(user_id, asyncio.Lock())
+    from app.ml import training
+
+    async with lock:
+        vec, clf, _ = await asyncio.to_thread(registry.get, user_id)  # bisa sudah diganti pemegang lock sebelumnya
+        version = registry.version(user_id)
+        # copy-on-write: thread prediksi masih membaca coef_ model yang sedang dilayani registry
+        # (dan artefak hasil mmap read-only), jadi partial_fit selalu di salinan lalu salinan itu di-publish
+        clf = await asyncio.to_thread(copy.deepcopy, clf)
+        applied = await asyncio.to_thread(training.partial_update, vec, clf, texts, y)
+        incremental_stats["updates"] += applied
+        incremental_stats["skipped"] += len(y) - applied
+        if not applied:
+            return 0
+        _unsaved[user_id] = _unsaved.get(user_id, 0) + applied
+        if _unsaved[user_id] >= settings.INCREMENTAL_SAVE_EVERY:
+            _unsaved[user_id] = 0
+            version = await asyncio.to_thread(save_model, vec, clf, clf.classes_, user_id)
+            incremental_stats["saves"] += 1
+        registry.publish(user_id, version, vec, clf, clf.classes_)
+    return applied
+
+
+def schedule_learn(user_id: Optional[str], texts: List[str], y: List[str]):
+    _spawn(learn_labels(user_id, texts, y))
@@ -1,15 +1,15 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Literal, Optional
 from app.models.transaction import Transaction
-from app.models.category import Category
-from app.ml.model_store import load_model, save_model
-
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score
-import numpy as np
+from app.ml.registry import registry, category_cache
+from app.ml.batcher import MicroBatcher
+from app.ml.rules import rule_cache
+from app.ml.text import build_text as _build_text
+from app.ml import jobs
+from app.core.config import settings
+from app.core.tenancy import current_user
 
 
 router = APIRouter(prefix="/model", tags=["model"])
@@ -24,79 +24,113 @@ class PredictOut(BaseModel):
     predicted_category_name: Optional[str]
     proba: Optional[float]
 
-def _build_text(desc: str, merchant: Optional[str]) -> str:
-    return f"{(desc or '').strip()} {(merchant or '').strip()}".strip()
-
-def _rule_based(text: str):
-    t = text.upper()
-    if any(x in t for x in ["GRAB", "GOJEK", "GOCAR"]):
-        return "Transport", 0.65
-    if any(x in t for x in ["STARBUCKS", "KFC", "MCD", "WARTEG", "NASI", "RESTO", "BAKSO"]):
-        return "Food", 0.60
-    if any(x in t for x in ["PLN", "TOKEN", "PULSA", "TELKOM", "PDAM"]):
-        return "Bills", 0.60
-    return None, None
-
-async def _category_map():
-    cats = await Category.find_all().to_list()
-    return {str(c.id): c.name for c in cats}
-
-@router.post("/predict", response_model=List[PredictOut])
-async def predict(items: List[PredictIn]):
-    vec, clf, labels = load_model()
-    cat_names = await _category_map()
-    texts = [_build_text(i.description, i.merchant) for i in items]
-
+def _predict_texts(user_id: Optional[str], texts: List[str]):
+    # dijalankan di worker thread oleh MicroBatcher: satu transform + predict_proba per batch per user
+    vec, clf, labels = registry.get(user_id)
     if vec is None or clf is None or labels is None:
-        out = []
-        for t in texts:
-            name, p = _rule_based(t)
-            cid = None
-            if name:
-                cid = next((k for k, v in cat_names.items() if v.lower() == name.lower()), None)
-            out.append({"predicted_category_id": cid, "predicted_category_name": name, "proba": p})
-        return out
-
+        return None
+    import numpy as np  # lazy: worker yang tidak pernah prediksi tidak perlu memuat numpy
     X = vec.transform(texts)
     proba = clf.predict_proba(X)
     idx = np.argmax(proba, axis=1)
-    preds = [labels[i] for i in idx]
-    confs = [float(proba[j, i]) for j, i in enumerate(idx)]
+    return [(labels[i], float(proba[j, i])) for j, i in enumerate(idx)]
+
+batcher = MicroBatcher(_predict_texts, settings.PREDICT_MAX_BATCH, settings.PREDICT_MAX_WAIT_MS)
+
+RULES_IN_THREAD = 2000  # batch sebesar ini (mis. import) dijalankan di thread supaya event loop tidak tertahan
+
+async def classify_texts(
+    texts: List[str],
+    user_id: Optional[str] = None,
+    merchants: Optional[List[Optional[str]]] = None,
+    amounts: Optional[List[Optional[float]]] = None,
+):
+    """
+    Klasifikasi satu batch teks -> list (category_id, category_name, proba).
+    Rule user dipakai kalau model belum ada, atau kalau rule-nya ditandai override.
+    """
+    cat_names = await category_cache.get(user_id)
+    engine = await rule_cache.get(user_id)
+    preds = await batcher.submit(texts, user_id)
+    if len(texts) >= RULES_IN_THREAD:
+        hits = await asyncio.to_thread(engine.match, texts, merchants, amounts)
+    else:
+        hits = engine.match(texts, merchants, amounts)
+
+    by_name = None
+    out = []
+    for i, hit in enumerate(hits):
+        pred = preds[i] if preds is not None else None
+        if hit is not None and (pred is None or hit.override):
+            if hit.category_id is not None:
+                if hit.category_id in cat_names:  # rule ke kategori yang sudah dihapus diabaikan
+                    out.append((hit.category_id, cat_names[hit.category_id], hit.confidence))
+                    continue
+            else:
+                # rule bawaan menunjuk nama kategori; cari id-nya di kategori user
+                if by_name is None:
+                    by_name = {v.lower(): k for k, v in cat_names.items()}
+                out.append((by_name.get(hit.category_name.lower()), hit.category_name, hit.confidence))
+                continue
+        if pred is not None:
+            pid, conf = pred
+            out.append((pid, cat_names.get(pid, "(unknown)"), conf))
+        else:
+            out.append((None, None, None))
+    return out
+
+@router.post("/predict", response_model=List[PredictOut])
+async def predict(items: List[PredictIn], user_id: Optional[str] = Depends(current_user)):
+    texts = [_build_text(i.description, i.merchant) for i in items]
+    preds = await classify_texts(texts, user_id, [i.merchant for i in items], [i.amount for i in items])
     return [
-        {"predicted_category_id": pid,
-         "predicted_category_name": cat_names.get(pid, "(unknown)"),
-         "proba": conf}
-        for pid, conf in zip(preds, confs)
+        {"predicted_category_id": cid,
+         "predicted_category_name": name,
+         "proba": p}
+        for cid, name, p in preds
     ]
 
 class RetrainOut(BaseModel):
-    trained_on_rows: int
-    classes: List[str]
-    accuracy: Optional[float] = None
-
-@router.post("/retrain", response_model=RetrainOut)
-async def retrain():
-    txs = await Transaction.find({"category_id": {"$ne": None}}).to_list()
-    if len(txs) < 10:
+    job_id: str
+    mode: str
+    status: str
+
+@router.post("/retrain", response_model=RetrainOut, status_code=202)
+async def retrain(
+    mode: Literal["full", "incremental"] = Query("full"),
+    user_id: Optional[str] = Depends(current_user),
+):
+    running = await jobs.active_job(user_id)
+    if running:
+        raise HTTPException(status_code=409, detail=f"Retrain masih berjalan (job {running['job_id']}).")
+
+    total = await Transaction.find({"user_id": user_id, "category_id": {"$ne": None}}).count()
+    if total < 10:
         raise HTTPException(status_code=400, detail="Butuh minimal 10 transaksi berlabel untuk training.")
 
-    texts = [_build_text(t.description, t.merchant) for t in txs]
-    y = [t.category_id for t in txs]
-
-    vec = TfidfVectorizer(ngram_range=(1, 2), min_df=1, max_features=30000)
-    X = vec.fit_transform(texts)
-
-    Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
-    clf = LogisticRegression(max_iter=300, solver="liblinear")
-    clf.fit(Xtr, ytr)
-
-    acc = accuracy_score(yte, clf.predict(Xte))
-    labels = clf.classes_ # urutan label sesuai kolom predict_proba
+    job = await jobs.submit_retrain(user_id, mode, total)
+    if job is None:
+        raise HTTPException(status_code=409, detail="Retrain masih berjalan.")
+    return job
 
-    save_model(vec, clf, labels)
-    return {"trained_on_rows": len(txs), "classes": list(labels), "accuracy": float(acc)}
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, user_id: Optional[str] = Depends(current_user)):
+    job = await jobs.get_job(job_id)
+    if not job or job["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 @router.get("/metrics")
-async def metrics():
-    vec, clf, labels = load_model()
-    return {"has_model": vec is not None, "num_labels": 0 if labels is None else len(labels)}
\ No newline at end of file
+async def metrics(user_id: Optional[str] = Depends(current_user)):
+    # cache miss = baca + verifikasi + unpickle artefak: jangan di event loop
+    vec, clf, labels = await asyncio.to_thread(registry.get, user_id)
+    return {
+        "has_model": vec is not None,
+        "num_labels": 0 if labels is None else len(labels),
+        "version": registry.version(user_id),
+        "loaded_models": registry.loaded_users(),
+        "model_cache": dict(registry.stats),
+        "category_cache": dict(category_cache.stats),
+        "batcher": batcher.stats(),
+        "incremental": dict(jobs.incremental_stats),
+    }
\ No newline at end of file
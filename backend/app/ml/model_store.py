@@ -1,24 +1,230 @@
-import os, joblib
+import hashlib, io, json, logging, mmap, os, pickle, struct, time
+from typing import Optional
 
+from app.core.config import settings
 
-MODEL_DIR = "app/ml/models"
-VEC_PATH = os.path.join(MODEL_DIR, "vectorizer.pkl")
-CLF_PATH = os.path.join(MODEL_DIR, "model.pkl")
-LBL_PATH = os.path.join(MODEL_DIR, "labels.pkl")
+log = logging.getLogger(__name__)
 
+# path absolut (relatif ke paket), bukan ke cwd proses: worker yang start dari direktori lain
+# tetap membaca model yang sama
+MODEL_DIR = settings.MODEL_DIR or os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+LATEST_PATH = os.path.join(MODEL_DIR, "LATEST")
+# format lama (tiga dump joblib per direktori versi); hanya dibaca untuk kompatibilitas
+VEC_FILE = "vectorizer.pkl"
+CLF_FILE = "model.pkl"
+LBL_FILE = "labels.pkl"
 
-def _ensure_dir():
-   os.makedirs(MODEL_DIR, exist_ok=True)
+# Format artefak satu file per versi (<version>.model):
+#   MAGIC | array mentah (tiap array rata ALIGN byte) | pickle kerangka objek | manifest JSON | len(manifest) u64 | MAGIC
+# Array numpy besar tidak ikut di pickle (persistent_id); saat load di-mmap read-only dari file,
+# jadi semua worker di host berbagi page cache yang sama dan load hampir tanpa copy.
+MAGIC = b"XTMODEL1"
+FORMAT_VERSION = 1
+ALIGN = 64
+ARTIFACT_EXT = ".model"
+_TRAILER = struct.Struct("<Q8s")
 
 
-def save_model(vec, clf, labels):
-   _ensure_dir()
-joblib.dump(vec, VEC_PATH)
-joblib.dump(clf, CLF_PATH)
-joblib.dump(labels, LBL_PATH)
+def _ensure_dir(path: str):
+    os.makedirs(path, exist_ok=True)
 
 
-def load_model():
-    if not (os.path.exists(VEC_PATH) and os.path.exists(CLF_PATH) and os.path.exists(LBL_PATH)):
+def _user_dir(user_id: Optional[str]) -> str:
+    # tenant bersama (None) tetap di MODEL_DIR supaya model lama masih terbaca;
+    # user_id sudah divalidasi di app.core.tenancy (alfanumerik, _ dan -)
+    return MODEL_DIR if user_id is None else os.path.join(MODEL_DIR, "users", user_id)
+
+
+def _version_dir(version: str, user_id: Optional[str] = None) -> str:
+    return os.path.join(_user_dir(user_id), version)
+
+
+def _artifact_path(version: str, user_id: Optional[str] = None) -> str:
+    return os.path.join(_user_dir(user_id), version + ARTIFACT_EXT)
+
+
+def current_version(user_id: Optional[str] = None):
+    # versi aktif disimpan di file LATEST (ditulis atomik via os.replace)
+    try:
+        with open(os.path.join(_user_dir(user_id), "LATEST"), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class _ArrayPickler(pickle.Pickler):
+    """Pickler yang memindahkan ndarray numerik besar ke section data mentah di file artefak."""
+
+    def __init__(self, buf, out, min_bytes: int):
+        super().__init__(buf, protocol=pickle.HIGHEST_PROTOCOL)
+        self._out = out
+        self._min_bytes = min_bytes
+        self._np = __import__("numpy")
+        self.arrays = []
+
+    def persistent_id(self, obj):
+        np = self._np
+        if type(obj) is not np.ndarray and not isinstance(obj, np.memmap):
+            return None
+        if obj.dtype.hasobject or obj.nbytes < self._min_bytes:
+            return None
+        order = "F" if obj.flags.f_contiguous and not obj.flags.c_contiguous else "C"
+        data = np.asarray(obj, order=order)
+        offset = self._out.write_aligned(memoryview(data.reshape(-1, order="A")).cast("B"))
+        self.arrays.append({"offset": offset, "nbytes": data.nbytes, "dtype": data.dtype.str,
+                            "shape": list(data.shape), "order": order})
+        return len(self.arrays) - 1
+
+
+class _ArrayUnpickler(pickle.Unpickler):
+    def __init__(self, buf, mm, arrays):
+        super().__init__(buf)
+        self._mm = mm
+        self._arrays = arrays
+        self._np = __import__("numpy")
+
+    def persistent_load(self, pid):
+        meta = self._arrays[pid]
+        dtype = self._np.dtype(meta["dtype"])
+        count = meta["nbytes"] // dtype.itemsize if dtype.itemsize else 0
+        # view read-only langsung di atas mmap: tidak ada salinan per worker
+        arr = self._np.frombuffer(self._mm, dtype=dtype, count=count, offset=meta["offset"])
+        return arr.reshape(meta["shape"], order=meta["order"])
+
+
+class _HashingWriter:
+    def __init__(self, f):
+        self.f = f
+        self.pos = 0
+        self.sha = hashlib.sha256()
+
+    def write(self, data) -> int:
+        self.f.write(data)
+        self.sha.update(data)
+        start = self.pos
+        self.pos += len(data)
+        return start
+
+    def write_aligned(self, data) -> int:
+        pad = -self.pos % ALIGN
+        if pad:
+            self.write(b"\0" * pad)
+        return self.write(data)
+
+
+def _prune(user_id: Optional[str], keep: str):
+    # simpan N versi terbaru; file yang masih di-mmap worker lain aman dihapus (inode tetap hidup)
+    udir = _user_dir(user_id)
+    versions = sorted(n[: -len(ARTIFACT_EXT)] for n in os.listdir(udir) if n.endswith(ARTIFACT_EXT))
+    for version in versions[: max(len(versions) - settings.MODEL_KEEP_VERSIONS, 0)]:
+        if version == keep:
+            continue
+        try:
+            os.remove(_artifact_path(version, user_id))
+        except OSError:
+            pass
+
+
+def save_model(vec, clf, labels, user_id: Optional[str] = None) -> str:
+    now = time.time()
+    # mikrodetik ikut di nama supaya beberapa save incremental dalam satu detik tetap terurut
+    version = time.strftime("v%Y%m%d%H%M%S", time.localtime(now)) + f"{int(now * 1e6) % 10**6:06d}-{os.getpid()}"
+    udir = _user_dir(user_id)
+    _ensure_dir(udir)
+    path = _artifact_path(version, user_id)
+    tmp = os.path.join(udir, f".{version}{ARTIFACT_EXT}.tmp")
+
+    try:
+        with open(tmp, "wb") as f:
+            out = _HashingWriter(f)
+            out.write(MAGIC)
+            buf = io.BytesIO()
+            pickler = _ArrayPickler(buf, out, settings.MODEL_MMAP_MIN_BYTES)
+            pickler.dump((vec, clf, labels))
+            payload = buf.getbuffer()
+            pickle_offset = out.write_aligned(payload)
+            manifest = {
+                "format": FORMAT_VERSION,
+                "version": version,
+                "user_id": user_id,
+                "created_at": time.time(),
+                "pickle": {"offset": pickle_offset, "nbytes": len(payload)},
+                "arrays": pickler.arrays,
+                "data_nbytes": out.pos,
+                "sha256": out.sha.hexdigest(),
+            }
+            raw = json.dumps(manifest, separators=(",", ":")).encode()
+            f.write(raw)
+            f.write(_TRAILER.pack(len(raw), MAGIC))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+    # LATEST baru ditulis setelah artefak lengkap di tempatnya: pembaca tidak pernah melihat versi setengah jadi
+    latest = os.path.join(udir, "LATEST")
+    tmp = latest + f".tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp, latest)
+    _prune(user_id, version)
+    return version
+
+
+def read_manifest(path: str) -> dict:
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size < len(MAGIC) + _TRAILER.size:
+            raise ValueError("artefak model terpotong")
+        f.seek(size - _TRAILER.size)
+        length, magic = _TRAILER.unpack(f.read(_TRAILER.size))
+        f.seek(0)
+        if magic != MAGIC or f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("bukan artefak model")
+        f.seek(size - _TRAILER.size - length)
+        manifest = json.loads(f.read(length))
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"format artefak tidak didukung: {manifest.get('format')}")
+    return manifest
+
+
+def _load_artifact(path: str):
+    manifest = read_manifest(path)
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mm)
+    if settings.MODEL_VERIFY_CHECKSUM:
+        digest = hashlib.sha256(view[: manifest["data_nbytes"]]).hexdigest()
+        if digest != manifest["sha256"]:
+            raise ValueError("checksum artefak model tidak cocok")
+    p = manifest["pickle"]
+    payload = view[p["offset"]: p["offset"] + p["nbytes"]]
+    # array hasil frombuffer memegang referensi ke mm, jadi mapping hidup selama model dipakai
+    return _ArrayUnpickler(io.BytesIO(payload), mm, manifest["arrays"]).load()
+
+
+def load_model(version=None, user_id: Optional[str] = None):
+    version = version or current_version(user_id)
+    if not version:
+        return None, None, None
+    path = _artifact_path(version, user_id)
+    if os.path.exists(path):
+        try:
+            return _load_artifact(path)
+        except (OSError, ValueError, pickle.UnpicklingError) as e:
+            log.error("gagal load model %s (user=%s): %s", version, user_id, e)
+            return None, None, None
+
+    vdir = _version_dir(version, user_id)
+    paths = [os.path.join(vdir, n) for n in (VEC_FILE, CLF_FILE, LBL_FILE)]
+    if not all(os.path.exists(p) for p in paths):
         return None, None, None
-    return joblib.load(VEC_PATH), joblib.load(CLF_PATH), joblib.load(LBL_PATH)
\ No newline at end of file
+    import joblib  # lazy: ikut memuat numpy/sklearn saat unpickle
+    return tuple(joblib.load(p) for p in paths)
+
@@ -0,0 +1,155 @@
+import threading, time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+from app.core.cache import response_generation
+from app.models.category import Category
+from app.ml import model_store
+from app.core.metrics import CallbackMetric, Histogram, LATENCY_BUCKETS
+
+model_load_seconds = Histogram(LATENCY_BUCKETS, "model_load_duration_seconds", "Durasi load artefak model dari disk")
+
+
+class _Slot:
+    __slots__ = ("active", "latest", "checked_at")
+
+    def __init__(self):
+        self.active = (None, None, None, None)  # (version, vec, clf, labels)
+        self.latest: Optional[str] = None
+        self.checked_at: Optional[float] = None
+
+
+class ModelRegistry:
+    """
+    Cache artefak model per proses, satu slot per user. Artefak di-load sekali per versi,
+    lalu ditukar secara atomik (satu assignment tuple) saat versi baru muncul.
+    Slot disimpan sebagai LRU berukuran `capacity`: model user yang paling lama tidak dipakai
+    dilepas dari memori dan akan di-load ulang dari disk kalau user itu kembali.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._lock = threading.Lock()
+        self._slots: "OrderedDict[Optional[str], _Slot]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "loads": 0, "load_seconds": 0.0, "evictions": 0}
+
+    def _slot(self, user_id: Optional[str]) -> _Slot:
+        with self._lock:
+            slot = self._slots.get(user_id)
+            if slot is None:
+                slot = self._slots[user_id] = _Slot()
+            self._slots.move_to_end(user_id)
+            while len(self._slots) > self.capacity:
+                self._slots.popitem(last=False)
+                self.stats["evictions"] += 1
+            return slot
+
+    def version(self, user_id: Optional[str] = None) -> Optional[str]:
+        slot = self._slots.get(user_id)
+        return None if slot is None else slot.active[0]
+
+    def loaded_users(self) -> int:
+        return len(self._slots)
+
+    def _latest_version(self, user_id: Optional[str], slot: _Slot) -> Optional[str]:
+        # cek file LATEST paling sering sekali per interval, supaya worker lain ikut hot-reload
+        now = time.monotonic()
+        if slot.checked_at is None or now - slot.checked_at >= settings.MODEL_RELOAD_CHECK_SECONDS:
+            slot.latest = model_store.current_version(user_id)
+            slot.checked_at = now
+        return slot.latest
+
+    def get(self, user_id: Optional[str] = None):
+        slot = self._slot(user_id)
+        version = self._latest_version(user_id, slot)
+        if version is None:
+            return None, None, None
+        active = slot.active
+        if active[0] == version:
+            self.stats["hits"] += 1
+            return active[1], active[2], active[3]
+
+        with self._lock:
+            active = slot.active
+            if active[0] == version:
+                self.stats["hits"] += 1
+                return active[1], active[2], active[3]
+            self.stats["misses"] += 1
+            t0 = time.perf_counter()
+            vec, clf, labels = model_store.load_model(version, user_id)
+            elapsed = time.perf_counter() - t0
+            self.stats["loads"] += 1
+            self.stats["load_seconds"] += elapsed
+            model_load_seconds.observe(elapsed)
+            if vec is None:
+                return None, None, None
+            slot.active = (version, vec, clf, labels)
+            return vec, clf, labels
+
+    def refresh(self, user_id: Optional[str] = None):
+        slot = self._slots.get(user_id)
+        if slot is not None:
+            slot.checked_at = None
+
+    def warm_up(self, user_id: Optional[str] = None) -> Dict[str, object]:
+        # dipanggil di thread saat startup: load model + numpy sebelum request prediksi pertama datang
+        import numpy  # noqa: F401
+        vec, _, _ = self.get(user_id)
+        return {"has_model": vec is not None, "version": self.version(user_id)}
+
+    def publish(self, user_id: Optional[str], version: str, vec, clf, labels):
+        # dipanggil setelah retrain di proses yang sama: tidak perlu load ulang dari disk
+        slot = self._slot(user_id)
+        with self._lock:
+            slot.active = (version, vec, clf, labels)
+            slot.latest = version
+            slot.checked_at = time.monotonic()
+
+
+class CategoryMapCache:
+    """
+    Peta category_id -> nama per user, LRU berukuran `capacity` dengan TTL per entry.
+    Entry terikat ke generation cache respons (bersama antar worker kalau backend-nya mongo), jadi
+    create/delete kategori di worker lain tidak membuat respons baru di-cache dengan nama basi.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._names: "OrderedDict[Optional[str], Tuple[Dict[str, str], float, Optional[int]]]" = OrderedDict()
+        self._generations: Dict[Optional[str], int] = {}
+        self.stats = {"hits": 0, "misses": 0}
+
+    def invalidate(self, user_id: Optional[str]):
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        self._names.pop(user_id, None)
+
+    async def get(self, user_id: Optional[str]) -> Dict[str, str]:
+        shared = await response_generation(user_id)
+        item = self._names.get(user_id)
+        if item is not None and item[2] == shared and time.monotonic() - item[1] < settings.CATEGORY_CACHE_TTL:
+            self._names.move_to_end(user_id)
+            self.stats["hits"] += 1
+            return item[0]
+        self.stats["misses"] += 1
+        gen = self._generations.get(user_id, 0)
+        cats = await Category.find(Category.user_id == user_id).to_list()
+        names = {str(c.id): c.name for c in cats}
+        # jangan simpan hasil kalau ada invalidate selama query berjalan
+        if gen == self._generations.get(user_id, 0):
+            self._names[user_id] = (names, time.monotonic(), shared)
+            self._names.move_to_end(user_id)
+            while len(self._names) > self.capacity:
+                self._names.popitem(last=False)
+        return names
+
+
+registry = ModelRegistry(settings.MODEL_CACHE_USERS)
+category_cache = CategoryMapCache(settings.CATEGORY_CACHE_USERS)
+
+CallbackMetric("model_cache_events_total", "Hit/miss cache artefak model", lambda: {"hit": registry.stats["hits"], "miss": registry.stats["misses"], "eviction": registry.stats["evictions"]}, "counter", "event")
+CallbackMetric("model_cache_loaded_users", "Jumlah user yang modelnya ada di memori", registry.loaded_users)
+CallbackMetric("category_cache_events_total", "Hit/miss cache peta kategori", lambda: dict(category_cache.stats), "counter", "event")
+
+
+def invalidate_category_map(user_id: Optional[str]):
+    category_cache.invalidate(user_id)
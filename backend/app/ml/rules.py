@@ -0,0 +1,284 @@
+# Rule engine klasifikasi: rule per user disimpan di Mongo lalu dikompilasi sekali menjadi
+# satu matcher multi-pola (trie keyword -> satu regex, dijalankan oleh engine C `re`) dan di-cache per user.
+# Satu batch teks digabung jadi satu string dan discan sekali, jadi biayanya ~ total panjang teks,
+# bukan jumlah keyword x jumlah rule.
+import logging, re, time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from app.core.config import settings
+from app.core.db import get_collection
+from app.core.metrics import CallbackMetric, Histogram, LATENCY_BUCKETS
+from app.core.search import normalize_merchant
+from app.models.rule import Rule
+
+try:  # Python 3.11+
+    import re._parser as _sre_parse
+    from re._constants import MAXREPEAT as _MAXREPEAT
+except ImportError:  # pragma: no cover
+    import sre_parse as _sre_parse
+    from sre_constants import MAXREPEAT as _MAXREPEAT
+
+logger = logging.getLogger(__name__)
+
+rule_match_seconds = Histogram(LATENCY_BUCKETS, "rule_match_duration_seconds", "Durasi rule engine per batch")
+
+_SEP = "\x00"  # pemisah antar teks di string gabungan; tidak mungkin muncul di keyword
+# regex rule ditulis tenant: hanya subset tanpa backtracking eksponensial yang diterima, dan teks yang
+# dicocokkan dipotong supaya kasus polinomial (mis. dua `.*` berurutan) tetap terbatas
+REGEX_MAX_REPEATS = 2
+REGEX_MAX_TEXT = 256
+
+# dipakai kalau user belum punya rule sendiri (sama dengan keyword bawaan sebelumnya);
+# kategori di-resolve lewat nama karena tiap user punya category_id sendiri
+DEFAULT_RULES: List[Dict[str, Any]] = [
+    *({"kind": "keyword", "pattern": k, "category_name": "Transport", "priority": 30, "confidence": 0.65}
+      for k in ("GRAB", "GOJEK", "GOCAR")),
+    *({"kind": "keyword", "pattern": k, "category_name": "Food", "priority": 20, "confidence": 0.60}
+      for k in ("STARBUCKS", "KFC", "MCD", "WARTEG", "NASI", "RESTO", "BAKSO")),
+    *({"kind": "keyword", "pattern": k, "category_name": "Bills", "priority": 10, "confidence": 0.60}
+      for k in ("PLN", "TOKEN", "PULSA", "TELKOM", "PDAM")),
+]
+
+
+class RuleHit(NamedTuple):
+    category_id: Optional[str]
+    category_name: Optional[str]
+    confidence: float
+    override: bool
+    rule_id: Optional[str]
+
+
+class _Compiled(NamedTuple):
+    rank: Tuple[int, int, int]  # (priority, panjang pola, -urutan) -> max() memilih pemenang
+    hit: RuleHit
+    min_amount: Optional[float]
+    max_amount: Optional[float]
+
+    def amount_ok(self, amount: Optional[float]) -> bool:
+        if self.min_amount is None and self.max_amount is None:
+            return True
+        if amount is None:
+            return False
+        if self.min_amount is not None and amount < self.min_amount:
+            return False
+        return self.max_amount is None or amount <= self.max_amount
+
+
+def compile_regex(pattern: str) -> re.Pattern:
+    """
+    Kompilasi regex rule tenant; ValueError kalau di luar subset aman: tanpa backreference/lookaround,
+    tanpa pengulangan bersarang atau alternasi di dalam pengulangan, dan maksimal REGEX_MAX_REPEATS
+    pengulangan tak terbatas.
+    """
+    try:
+        parsed = _sre_parse.parse(pattern, re.IGNORECASE)
+    except re.error as e:
+        raise ValueError(f"regex tidak valid: {e}") from None
+    unbounded = 0
+
+    def walk(items, in_repeat: bool):
+        nonlocal unbounded
+        for op, av in items:
+            name = str(op)
+            if name in ("GROUPREF", "GROUPREF_EXISTS"):
+                raise ValueError("regex: backreference tidak didukung")
+            if name in ("ASSERT", "ASSERT_NOT"):
+                raise ValueError("regex: lookahead/lookbehind tidak didukung")
+            if name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+                lo, hi, sub = av
+                if in_repeat:
+                    raise ValueError("regex: pengulangan bersarang tidak didukung")
+                if hi == _MAXREPEAT:
+                    unbounded += 1
+                walk(sub, hi > 1)
+            elif name == "BRANCH":
+                if in_repeat:
+                    raise ValueError("regex: alternasi di dalam pengulangan tidak didukung")
+                for alt in av[1]:
+                    walk(alt, in_repeat)
+            elif name == "SUBPATTERN":
+                walk(av[-1], in_repeat)
+            elif name == "ATOMIC_GROUP":
+                walk(av, in_repeat)
+
+    walk(parsed, False)
+    if unbounded > REGEX_MAX_REPEATS:
+        raise ValueError(f"regex: maksimal {REGEX_MAX_REPEATS} pengulangan tak terbatas (*, +, {{n,}})")
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    # keyword -> trie -> regex bercabang per karakter: di tiap posisi engine hanya mengikuti cabang
+    # yang cocok (mirip goto Aho-Corasick), dan `?` greedy memilih keyword terpanjang lebih dulu
+    trie: Dict[str, Any] = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node: Dict[str, Any]) -> str:
+        alts = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        if "" in node:
+            return ("(?:" + body + ")?") if len(alts) == 1 else body + "?"
+        return body
+
+    return emit(trie)
+
+
+class RuleEngine:
+    def __init__(self, rules: Sequence[Dict[str, Any]]):
+        self._rules: List[_Compiled] = []
+        self._keywords: Dict[str, List[int]] = {}
+        self._merchants: Dict[str, List[int]] = {}
+        self._regexes: List[Tuple[re.Pattern, int]] = []
+        self._amount_only: List[int] = []
+
+        for order, r in enumerate(rules):
+            kind, pattern = r.get("kind", "keyword"), (r.get("pattern") or "")
+            key = pattern.strip().lower()
+            if kind != "amount" and not key:
+                continue
+            idx = len(self._rules)
+            self._rules.append(_Compiled(
+                rank=(int(r.get("priority", 0)), len(key), -order),
+                hit=RuleHit(r.get("category_id"), r.get("category_name"), float(r.get("confidence", 0.7)),
+                            bool(r.get("override", False)), str(r["_id"]) if r.get("_id") else None),
+                min_amount=r.get("min_amount"),
+                max_amount=r.get("max_amount"),
+            ))
+            if kind == "keyword":
+                self._keywords.setdefault(key.replace(_SEP, ""), []).append(idx)
+            elif kind == "merchant":
+                self._merchants.setdefault(normalize_merchant(pattern), []).append(idx)
+            elif kind == "regex":
+                try:
+                    self._regexes.append((compile_regex(pattern), idx))
+                except ValueError as e:
+                    # divalidasi saat rule dibuat; rule lama yang rusak / tidak aman diabaikan
+                    logger.warning("rule regex %s diabaikan: %s", r.get("_id"), e)
+            else:
+                self._amount_only.append(idx)
+
+        by_rank = lambda i: self._rules[i].rank
+        for table in (self._keywords, self._merchants):
+            for idxs in table.values():
+                idxs.sort(key=by_rank, reverse=True)
+        self._amount_only.sort(key=by_rank, reverse=True)
+        # lookahead hanya melaporkan keyword terpanjang di tiap posisi; keyword yang merupakan prefix-nya
+        # (mis. "grab" untuk "grabfood") juga cocok di posisi itu, jadi rule-nya digabung di sini sekali
+        self._keyword_hits: Dict[str, List[int]] = {
+            key: sorted({i for k in range(1, len(key) + 1) for i in self._keywords.get(key[:k], ())},
+                        key=by_rank, reverse=True)
+            for key in self._keywords
+        }
+        self._matcher = re.compile("(?=(" + _trie_pattern(self._keywords) + "))") if self._keywords else None
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def match(
+        self,
+        texts: Sequence[str],
+        merchants: Optional[Sequence[Optional[str]]] = None,
+        amounts: Optional[Sequence[Optional[float]]] = None,
+    ) -> List[Optional[RuleHit]]:
+        t0 = time.perf_counter()
+        n = len(texts)
+        best: List[Optional[_Compiled]] = [None] * n
+        rules = self._rules
+
+        def consider(row: int, idxs: List[int]):
+            # idxs sudah terurut rank menurun: rule pertama yang lolos syarat amount adalah kandidat terbaik
+            amount = amounts[row] if amounts is not None else None
+            for i in idxs:
+                c = rules[i]
+                if c.amount_ok(amount):
+                    cur = best[row]
+                    if cur is None or c.rank > cur.rank:
+                        best[row] = c
+                    return
+
+        if self._matcher is not None and n:
+            lowered = [(t or "").lower() for t in texts]
+            ends, pos = [], 0
+            for t in lowered:
+                pos += len(t) + 1
+                ends.append(pos)
+            keywords, row = self._keyword_hits, 0
+            # lookahead menangkap match yang tumpang tindih di posisi berbeda, semuanya dalam satu scan;
+            # posisi match naik monoton, jadi baris cukup dilacak dengan satu pointer
+            for m in self._matcher.finditer(_SEP.join(lowered)):
+                start = m.start()
+                while ends[row] <= start:
+                    row += 1
+                consider(row, keywords[m.group(1)])
+
+        if self._merchants and merchants is not None:
+            for row, merchant in enumerate(merchants):
+                idxs = self._merchants.get(normalize_merchant(merchant))
+                if idxs:
+                    consider(row, idxs)
+
+        for rx, idx in self._regexes:
+            for row, t in enumerate(texts):
+                if t and rx.search(t, 0, REGEX_MAX_TEXT):
+                    consider(row, [idx])
+
+        if self._amount_only:
+            for row in range(n):
+                consider(row, self._amount_only)
+
+        rule_match_seconds.observe(time.perf_counter() - t0)
+        return [None if c is None else c.hit for c in best]
+
+
+class RuleCache:
+    """RuleEngine terkompilasi per user (LRU + TTL); dikompilasi ulang hanya kalau rule berubah."""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._engines: "OrderedDict[Optional[str], Tuple[RuleEngine, float]]" = OrderedDict()
+        self._generations: Dict[Optional[str], int] = {}
+        self.stats = {"hits": 0, "misses": 0, "compiles": 0}
+        self._default: Optional[RuleEngine] = None
+
+    def invalidate(self, user_id: Optional[str]):
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        self._engines.pop(user_id, None)
+
+    def default_engine(self) -> RuleEngine:
+        if self._default is None:
+            self._default = RuleEngine(DEFAULT_RULES)
+        return self._default
+
+    async def get(self, user_id: Optional[str]) -> RuleEngine:
+        item = self._engines.get(user_id)
+        if item is not None and time.monotonic() - item[1] < settings.RULE_CACHE_TTL:
+            self._engines.move_to_end(user_id)
+            self.stats["hits"] += 1
+            return item[0]
+        self.stats["misses"] += 1
+        gen = self._generations.get(user_id, 0)
+        rules = await get_collection(Rule).find(
+            {"user_id": user_id, "enabled": True},
+        ).sort([("priority", -1), ("_id", 1)]).to_list(length=None)
+        if rules:
+            engine = RuleEngine(rules)
+            self.stats["compiles"] += 1
+        else:
+            engine = self.default_engine()
+        # jangan simpan hasil kalau ada invalidate selama query berjalan
+        if gen == self._generations.get(user_id, 0):
+            self._engines[user_id] = (engine, time.monotonic())
+            self._engines.move_to_end(user_id)
+            while len(self._engines) > self.capacity:
+                self._engines.popitem(last=False)
+        return engine
+
+
+rule_cache = RuleCache(settings.CATEGORY_CACHE_USERS)
+CallbackMetric("rule_cache_events_total", "Hit/miss/compile cache rule engine", lambda: dict(rule_cache.stats), "counter", "event")
@@ -0,0 +1,6 @@
+# Helper teks tanpa dependensi ML, aman di-import router tanpa memuat sklearn/numpy.
+from typing import Optional
+
+
+def build_text(desc: str, merchant: Optional[str]) -> str:
+    return f"{(desc or '').strip()} {(merchant or '').strip()}".strip()
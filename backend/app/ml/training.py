@@ -0,0 +1,59 @@
+# Fungsi training murni (tanpa I/O Mongo / event loop) supaya bisa dijalankan di process pool.
+# Modul ini memuat sklearn/numpy: import hanya di jalur training, jangan dari router.
+from typing import List, Optional
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score
+from app.ml.model_store import save_model
+
+
+def train_full(texts: List[str], y: List[str], user_id: Optional[str] = None):
+    vec = TfidfVectorizer(ngram_range=(1, 2), min_df=1, max_features=30000)
+    X = vec.fit_transform(texts)
+
+    Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    clf = LogisticRegression(max_iter=300, solver="liblinear")
+    clf.fit(Xtr, ytr)
+
+    acc = accuracy_score(yte, clf.predict(Xte))
+    labels = clf.classes_ # urutan label sesuai kolom predict_proba
+
+    version = save_model(vec, clf, labels, user_id)
+    return {"version": version, "classes": list(labels), "accuracy": float(acc)}
+
+
+def make_incremental(n_features: int):
+    # HashingVectorizer stateless: tidak perlu fit vocabulary, jadi model bisa di-update per batch
+    vec = HashingVectorizer(ngram_range=(1, 2), n_features=n_features, alternate_sign=False)
+    clf = SGDClassifier(loss="log_loss", alpha=1e-5, random_state=42)
+    return vec, clf
+
+
+def train_incremental(texts: List[str], y: List[str], n_features: int, chunk_size: int,
+                      user_id: Optional[str] = None):
+    vec, clf = make_incremental(n_features)
+    classes = np.unique(y)
+
+    tr_idx, te_idx = train_test_split(np.arange(len(texts)), test_size=0.2, random_state=42, stratify=y)
+    for _ in range(5):  # beberapa epoch kecil
+        for start in range(0, len(tr_idx), chunk_size):
+            part = tr_idx[start:start + chunk_size]
+            clf.partial_fit(vec.transform([texts[i] for i in part]), [y[i] for i in part], classes=classes)
+
+    acc = accuracy_score([y[i] for i in te_idx], clf.predict(vec.transform([texts[i] for i in te_idx])))
+    labels = clf.classes_
+
+    version = save_model(vec, clf, labels, user_id)
+    return {"version": version, "classes": list(labels), "accuracy": float(acc)}
+
+
+def partial_update(vec, clf, texts: List[str], y: List[str]) -> int:
+    # label baru yang belum dikenal model diabaikan; butuh retrain penuh untuk menambah kelas
+    known = set(clf.classes_)
+    pairs = [(t, c) for t, c in zip(texts, y) if c in known]
+    if not pairs:
+        return 0
+    clf.partial_fit(vec.transform([t for t, _ in pairs]), [c for _, c in pairs])
+    return len(pairs)
@@ -0,0 +1,17 @@
+from beanie import Document, PydanticObjectId
+from pydantic import Field
+from datetime import datetime
+from typing import Optional
+
+class LabelQueueItem(Document):
+    user_id: Optional[str] = None
+    tx_id: PydanticObjectId
+    score: float  # margin top-1 - top-2 predict_proba; makin kecil makin tidak pasti
+    predicted_category: Optional[str] = None
+    predicted_proba: Optional[float] = None
+    model_version: Optional[str] = None
+    refresh_id: str  # id refresh yang menulis entry ini (entry refresh lama dihapus setelah yang baru lengkap)
+    refreshed_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "labeling_queue"
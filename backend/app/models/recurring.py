@@ -0,0 +1,43 @@
+from beanie import Document, PydanticObjectId
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Optional
+
+class Occurrence(BaseModel):
+    date: datetime
+    tx_id: PydanticObjectId
+    desc: str = ""  # description ternormalisasi, untuk membedakan duplikat dari transaksi lain di hari yang sama
+
+class RecurringSeries(Document):
+    """Satu signature (merchant + nominal) per user, dengan riwayat tanggal terbaru yang terurut."""
+    user_id: Optional[str] = None
+    key: str  # "<merchant ternormalisasi>|<amount 2 desimal>"
+    merchant: Optional[str] = None
+    description: str = ""
+    amount: float = 0.0
+    occurrences: List[Occurrence] = Field(default_factory=list)  # dibatasi RECURRING_HISTORY terakhir
+    n: int = 0  # total kemunculan, termasuk yang sudah terpotong dari occurrences (bukan `count`: method Document)
+    first_date: Optional[datetime] = None
+    last_date: Optional[datetime] = None
+    period: Optional[str] = None  # weekly | biweekly | monthly | quarterly | yearly; None = belum terlihat berulang
+    period_days: Optional[int] = None
+    confidence: float = 0.0  # porsi jarak antar kemunculan yang cocok dengan period
+    next_expected: Optional[datetime] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "recurring_series"
+
+class DuplicateFlag(Document):
+    user_id: Optional[str] = None
+    tx_id: PydanticObjectId  # transaksi yang kemungkinan dobel
+    duplicate_of: PydanticObjectId  # transaksi lebih dulu dengan signature + tanggal yang sama
+    key: str
+    date: datetime
+    amount: float = 0.0
+    description: str = ""
+    dismissed: bool = False  # ditandai user bukan duplikat; tidak dimunculkan lagi
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "duplicate_flags"
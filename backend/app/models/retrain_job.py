@@ -0,0 +1,24 @@
+from beanie import Document
+from typing import List, Optional
+
+class RetrainJob(Document):
+    """Status job retrain, dibagi semua worker API (GET /model/jobs/{id} bisa mendarat di worker mana saja)."""
+    id: str  # job_id (uuid hex)
+    user_id: Optional[str] = None
+    mode: str = "full"
+    status: str = "queued"  # queued | loading | training | done | failed
+    active: Optional[bool] = True  # hanya ada selama berjalan; unique per user -> satu retrain per user
+    progress: float = 0.0
+    total_rows: int = 0
+    rows_loaded: int = 0
+    trained_on_rows: Optional[int] = None
+    version: Optional[str] = None
+    classes: Optional[List[str]] = None
+    accuracy: Optional[float] = None
+    error: Optional[str] = None
+    created_at: float = 0.0
+    updated_at: float = 0.0  # heartbeat; job berjalan yang lama tidak diperbarui dianggap mati bersama workernya
+    finished_at: Optional[float] = None
+
+    class Settings:
+        name = "retrain_jobs"
@@ -0,0 +1,15 @@
+from beanie import Document
+from datetime import datetime
+from typing import Optional
+
+class DailyCategoryRollup(Document):
+    user_id: Optional[str] = None
+    date: datetime  # hari (jam 00:00), sama seperti Transaction.date di Mongo
+    category_id: Optional[str] = None
+    total: float = 0.0
+    n: int = 0  # jumlah transaksi; bukan `count`/`min`/`max` yang menimpa method Document
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+
+    class Settings:
+        name = "rollup_daily_category"
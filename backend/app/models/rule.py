@@ -0,0 +1,20 @@
+from beanie import Document
+from pydantic import Field
+from datetime import datetime
+from typing import Literal, Optional
+
+class Rule(Document):
+    user_id: Optional[str] = None
+    kind: Literal["keyword", "merchant", "regex", "amount"] = "keyword"
+    pattern: Optional[str] = None  # keyword (substring), nama merchant (persis), atau regex; kosong untuk kind=amount
+    min_amount: Optional[float] = None  # syarat tambahan untuk semua kind
+    max_amount: Optional[float] = None
+    category_id: str
+    priority: int = 0  # makin besar makin menang kalau beberapa rule cocok
+    confidence: float = 0.7
+    override: bool = False  # True: menang atas prediksi model; False: hanya dipakai kalau model belum ada
+    enabled: bool = True
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "rules"
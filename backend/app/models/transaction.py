@@ -1,7 +1,8 @@
-from beanie import Document
+from beanie import Document, Insert, Replace, Save, SaveChanges, before_event
 from pydantic import Field
 from datetime import datetime, date
 from typing import Optional
+from app.core.search import normalize_merchant
 
 class Transaction(Document):
     user_id: Optional[str] = None
@@ -9,11 +10,18 @@ class Transaction(Document):
     description: str = ""
     amount: float = 0.0
     merchant: Optional[str] = None
+    merchant_lc: Optional[str] = None  # merchant lower-case, untuk pencarian prefix ber-index
     category_id: Optional[str] = None
     predicted_category: Optional[str] = None
     predicted_proba: Optional[float] = None
     source: Optional[str] = None
+    dedupe_key: Optional[str] = None  # hash date+amount+description untuk import idempoten
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+    @before_event(Insert, Replace, Save, SaveChanges)
+    def sync_merchant_lc(self):
+        self.merchant_lc = normalize_merchant(self.merchant)
+
     class Settings:
         name = "transactions"
+        use_revision = True  # revision_id diganti tiap tulis; PATCH memakainya untuk optimistic concurrency
@@ -1,8 +1,14 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
 from typing import Optional, List
+from bson import ObjectId
 from app.models.category import Category
 from app.models.transaction import Transaction
+from app.ml.registry import invalidate_category_map, category_cache
+from app.core.cache import response_cache, invalidate_responses
+from app.core import rollup
+from app.core.db import get_collection, new_revision, revision_update, run_in_transaction
+from app.core.tenancy import current_user
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
@@ -10,46 +16,61 @@ class CategoryIn(BaseModel):
     name: str
 
 @router.get("")
-async def list_categories():
-    items = await Category.find_all().to_list()
+async def list_categories(user_id: Optional[str] = Depends(current_user)):
+    items = await Category.find(Category.user_id == user_id).to_list()
     items.sort(key=lambda x: x.name.lower())
     return {"items": items}
 
 @router.post("")
-async def create_category(payload: CategoryIn):
+async def create_category(payload: CategoryIn, user_id: Optional[str] = Depends(current_user)):
     name = payload.name.strip()
     if not name:
         raise HTTPException(status_code=400, detail="Name is required")
-    exists = await Category.find_one(Category.name == name)
+    exists = await Category.find_one(Category.user_id == user_id, Category.name == name)
     if exists:
         raise HTTPException(status_code=409, detail="Category already exists")
-    saved = await Category(name=name).insert()
+    saved = await Category(name=name, user_id=user_id).insert()
+    invalidate_category_map(user_id)
+    await invalidate_responses(user_id)
     return {"id": str(saved.id), "name": name}
 
 @router.delete("/{category_id}")
-async def delete_category(category_id: str, force: bool = Query(False, description="Set true to detach transactions then delete")):
-    cat = await Category.get(category_id)
+async def delete_category(
+    category_id: str,
+    force: bool = Query(False, description="Set true to detach transactions then delete"),
+    user_id: Optional[str] = Depends(current_user),
+):
+    cat = None
+    if ObjectId.is_valid(category_id):
+        cat = await Category.find_one({"_id": ObjectId(category_id), "user_id": user_id})
     if not cat:
         raise HTTPException(status_code=404, detail="Category not found")
 
-    used = await Transaction.find(Transaction.category_id == category_id).count()
+    used = await Transaction.find({"user_id": user_id, "category_id": category_id}).count()
     if used > 0 and not force:
         raise HTTPException(status_code=400, detail=f"Category in use by {used} transactions. Use ?force=true to delete and detach.")
 
-    if used > 0:
-        txs = await Transaction.find(Transaction.category_id == category_id).to_list()
-        for t in txs:
-            t.category_id = None
-            await t.save()
+    async def detach_and_delete(session):
+        # satu update_many + rollup + hapus kategori, atomik kalau deployment mendukung transaksi
+        res = await get_collection(Transaction).update_many(
+            {"user_id": user_id, "category_id": category_id}, revision_update({"category_id": None}, new_revision()), session=session
+        )
+        await rollup.move_category(user_id, category_id, None, session=session)
+        await get_collection(Category).delete_one({"_id": cat.id}, session=session)
+        return res.modified_count
 
-    await cat.delete()
-    return {"deleted": True, "detached": used}
+    detached = await run_in_transaction(detach_and_delete)
+    invalidate_category_map(user_id)
+    await invalidate_responses(user_id)
+    return {"deleted": True, "detached": detached}
 
 @router.get("/summary")
-async def categories_summary():
-    cats = await Category.find_all().to_list()
-    result = []
-    for c in cats:
-        cnt = await Transaction.find(Transaction.category_id == str(c.id)).count()
-        result.append({"id": str(c.id), "name": c.name, "count": cnt})
+async def categories_summary(request: Request, user_id: Optional[str] = Depends(current_user)):
+    return await response_cache.respond(request, "categories.summary", lambda: _categories_summary(user_id), user_id)
+
+async def _categories_summary(user_id: Optional[str]):
+    names = await category_cache.get(user_id)
+    counts = await rollup.category_counts(user_id)
+    result = [{"id": cid, "name": name, "count": counts.get(cid, 0)} for cid, name in names.items()]
+    result.append({"id": None, "name": "Uncategorized", "count": counts.get(None, 0)})
     return {"items": result}
\ No newline at end of file
@@ -0,0 +1,82 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from datetime import date
+from typing import Any, Dict, Literal, Optional
+from app.models.transaction import Transaction
+from app.models.rollup import DailyCategoryRollup
+from app.core import export
+from app.core.config import settings
+from app.core.db import get_collection
+from app.core.search import SEARCH_MODES
+from app.core.tenancy import current_user
+from app.ml.registry import category_cache
+from app.routers.transactions import TX_FIELDS, tx_criteria, tx_projection, tx_row, _parse_sort
+from app.routers.report import _date_match
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+# tipe kolom untuk Arrow/Parquet; CSV/NDJSON hanya memakai urutannya
+_TX_TYPES = {"user_id": "string", "date": "date", "description": "string", "amount": "float",
+             "merchant": "string", "category_id": "string", "predicted_category": "string",
+             "predicted_proba": "float", "source": "string", "created_at": "timestamp",
+             "revision_id": "string"}
+_ROLLUP_COLUMNS = [("date", "date"), ("category_id", "string"), ("category_name", "string"),
+                   ("total", "float"), ("count", "int"), ("min", "float"), ("max", "float")]
+
+def _response(body, fmt: str, name: str) -> StreamingResponse:
+    filename = f"{name}-{date.today().isoformat()}.{export.EXTENSIONS[fmt]}"
+    return StreamingResponse(body, media_type=export.MEDIA_TYPES[fmt],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+def _check_format(fmt: str):
+    try:
+        export.require_pyarrow(fmt)
+    except ImportError:
+        raise HTTPException(status_code=400, detail=f"format {fmt} butuh pyarrow yang belum terpasang")
+
+@router.get("/transactions")
+async def export_transactions(
+    format: Literal[export.FORMATS] = Query("csv"),
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    category_id: Optional[str] = None,
+    q: Optional[str] = Query(None),
+    search: Literal[SEARCH_MODES] = Query("contains", description="contains | text | prefix (merchant)"),
+    sort: str = Query("-created_at"),
+    fields: Optional[str] = Query(None, description="daftar field, pisahkan dengan koma (id selalu ada)"),
+    user_id: Optional[str] = Depends(current_user),
+):
+    _check_format(format)
+    # filter sama dengan GET /transactions, tapi satu cursor dari awal sampai akhir (tanpa skip)
+    criteria, _ = tx_criteria(user_id, start, end, category_id, q, search)
+    field, direction = _parse_sort(sort)
+    projection = tx_projection(fields)
+    columns = [("id", "string")] + [(f, _TX_TYPES[f]) for f in TX_FIELDS if f in projection]
+    cursor = (get_collection(Transaction).find(criteria, projection)
+              .sort([(field, direction), ("_id", direction)])
+              .batch_size(settings.EXPORT_BATCH))
+    return _response(export.stream(cursor, format, columns, tx_row), format, "transactions")
+
+@router.get("/reports/daily")
+async def export_daily_report(
+    format: Literal[export.FORMATS] = Query("csv"),
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    user_id: Optional[str] = Depends(current_user),
+):
+    _check_format(format)
+    names = await category_cache.get(user_id)
+
+    def to_row(doc: Dict[str, Any]) -> Dict[str, Any]:
+        cid = doc.get("category_id")
+        doc["category_name"] = "Uncategorized" if cid is None else names.get(cid, f"(deleted:{cid})")
+        # nama kolom export tetap count/min/max walau field rollup-nya n/min_amount/max_amount
+        doc["count"], doc["min"], doc["max"] = doc.pop("n", 0), doc.pop("min_amount", None), doc.pop("max_amount", None)
+        return doc
+
+    # satu baris per hari x kategori langsung dari rollup (index user_id, date, category_id)
+    cursor = (get_collection(DailyCategoryRollup)
+              .find(_date_match(user_id, start, end), {"_id": 0, "user_id": 0})
+              .sort([("date", 1), ("category_id", 1)])
+              .batch_size(settings.EXPORT_BATCH))
+    return _response(export.stream(cursor, format, _ROLLUP_COLUMNS, to_row), format, "daily-report")
@@ -1,7 +1,15 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.core.readiness import readiness
 
 router = APIRouter()
 
 @router.get("/health")
 async def health():
     return {"ok": True}
+
+@router.get("/ready")
+async def ready():
+    # 503 sampai index, rollup, dan model selesai disiapkan di background
+    report = readiness.report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
@@ -0,0 +1,209 @@
+import asyncio, codecs, csv, hashlib, re, time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Literal, Optional
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from app.core.config import settings
+from app.core.db import get_collection, as_datetime, new_revision
+from app.core import recurring, rollup
+from app.core.cache import invalidate_responses
+from app.models.transaction import Transaction
+from app.core.search import normalize_merchant
+from app.core.tenancy import current_user
+from app.routers.transactions import TxIn, _classify_rows
+
+router = APIRouter(prefix="/transactions", tags=["transactions"])
+
+_OFX_TAG = re.compile(r"<(\w+)>([^<\r\n]*)")
+_DUPLICATE_KEY = 11000
+
+
+def _dedupe_base(tx: TxIn) -> str:
+    desc = " ".join(tx.description.lower().split())
+    return f"{tx.date.isoformat()}|{tx.amount:.2f}|{desc}"
+
+
+def _dedupe_key(base: str, occurrence: int) -> str:
+    # occurrence membedakan transaksi identik yang sah di hari yang sama (mis. 2x kopi 25rb)
+    return hashlib.sha1(f"{base}|{occurrence}".encode("utf-8")).hexdigest()
+
+
+def _iter_csv(stream) -> Iterator[Dict[str, Any]]:
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield {(k or "").strip().lower(): (v.strip() if isinstance(v, str) else v) for k, v in row.items()}
+
+
+def _iter_ofx(stream, chunk_size: int = 64 * 1024) -> Iterator[Dict[str, Any]]:
+    # parser SGML minimal: ambil blok <STMTTRN> satu per satu tanpa memuat seluruh file
+    buf = ""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        buf += chunk
+        while True:
+            start = buf.find("<STMTTRN>")
+            if start < 0:
+                buf = buf[-16:]
+                break
+            end = buf.find("</STMTTRN>", start)
+            if end < 0:
+                buf = buf[start:]
+                break
+            block, buf = buf[start:end], buf[end + len("</STMTTRN>"):]
+            tags = {k.upper(): v.strip() for k, v in _OFX_TAG.findall(block)}
+            amount = tags.get("TRNAMT", "")
+            if tags.get("TRNTYPE", "").upper() == "CREDIT" or (amount and not amount.startswith("-")):
+                # OFX: debit bertanda minus; kredit (gaji, refund) bukan pengeluaran -> dilewati
+                yield {"skip": "credit"}
+                continue
+            posted = tags.get("DTPOSTED", "")
+            yield {
+                "date": f"{posted[:4]}-{posted[4:6]}-{posted[6:8]}" if len(posted) >= 8 else posted,
+                "amount": amount.lstrip("-"),
+                "description": tags.get("MEMO") or tags.get("NAME") or "",
+                "merchant": tags.get("NAME"),
+                "source": "ofx",
+            }
+
+
+def _clean(raw: Dict[str, Any], source: str) -> Dict[str, Any]:
+    row = {k: v for k, v in raw.items() if k in TxIn.model_fields and v not in ("", None)}
+    row.setdefault("source", source)
+    return row
+
+
+def _parse_chunk(rows: Iterator[Dict[str, Any]], state: Dict[str, Any], source: str, user_id: Optional[str]):
+    docs: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+    for _ in range(settings.IMPORT_CHUNK_SIZE):
+        try:
+            raw = next(rows)
+        except StopIteration:
+            state["done"] = True
+            break
+        except (csv.Error, UnicodeDecodeError) as e:
+            state["row"] += 1
+            errors.append({"row": state["row"], "error": str(e)})
+            state["done"] = True
+            break
+        state["row"] += 1
+        if raw.get("skip"):
+            state["skipped"] += 1
+            continue
+        try:
+            tx = TxIn(**_clean(raw, source))
+        except ValidationError as e:
+            errors.append({"row": state["row"], "error": "; ".join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())})
+            continue
+
+        # dihitung per (tanggal, nominal, description ternormalisasi) sepanjang file, dengan normalisasi
+        # yang sama dengan dedupe_key: statement tidak harus terurut tanggal
+        base = _dedupe_base(tx)
+        occurrence = state["seen"].get(base, 0)
+        state["seen"][base] = occurrence + 1
+
+        d = tx.model_dump()
+        d.update(
+            date=as_datetime(tx.date),
+            user_id=user_id,
+            created_at=datetime.utcnow(),
+            merchant_lc=normalize_merchant(tx.merchant),
+            dedupe_key=_dedupe_key(base, occurrence),
+            revision_id=new_revision(),  # insert_many mentah: tidak lewat Document.insert yang mengisinya
+            row=state["row"],
+        )
+        docs.append(d)
+    return docs, errors
+
+
+async def _insert_chunk(coll, docs: List[Dict[str, Any]], stats: Dict[str, Any], user_id: Optional[str]):
+    rows = [d.pop("row") for d in docs]
+    failed_idx = set()
+    try:
+        res = await coll.insert_many(docs, ordered=False)
+        stats["inserted"] += len(res.inserted_ids)
+    except BulkWriteError as e:
+        details = e.details or {}
+        stats["inserted"] += details.get("nInserted", 0)
+        for err in details.get("writeErrors", []):
+            failed_idx.add(err["index"])
+            if err.get("code") == _DUPLICATE_KEY:
+                stats["duplicates"] += 1
+            else:
+                stats["failed"] += 1
+                _add_error(stats, rows[err["index"]], err.get("errmsg", "write error"))
+    inserted = [d for i, d in enumerate(docs) if i not in failed_idx]
+    await rollup.add(user_id, ((d["date"], d.get("category_id"), d["amount"]) for d in inserted))
+    # insert_many mengisi _id di dict yang dikirim, jadi baris baru bisa langsung dicek recurring/duplikat
+    stats["possible_duplicates"] += len(await recurring.observe(user_id, inserted))
+
+
+def _add_error(stats: Dict[str, Any], row: int, msg: str):
+    if len(stats["errors"]) < settings.IMPORT_MAX_ERRORS:
+        stats["errors"].append({"row": row, "error": msg})
+
+
+@router.post("/import")
+async def import_transactions(
+    file: UploadFile = File(...),
+    format: Literal["auto", "csv", "ofx"] = Query("auto"),
+    classify: bool = Query(False),
+    user_id: Optional[str] = Depends(current_user),
+):
+    fmt = format
+    if fmt == "auto":
+        name = (file.filename or "").lower()
+        fmt = "ofx" if name.endswith((".ofx", ".qfx")) else "csv"
+    if fmt not in ("csv", "ofx"):
+        raise HTTPException(status_code=400, detail="Format tidak didukung")
+
+    # UploadFile sudah di-spool ke disk oleh Starlette; baca bertahap per chunk di thread
+    stream = codecs.getreader("utf-8-sig")(file.file)
+    rows = _iter_ofx(stream) if fmt == "ofx" else _iter_csv(stream)
+    source = "ofx" if fmt == "ofx" else "csv"
+
+    coll = get_collection(Transaction)
+    state: Dict[str, Any] = {"row": 0, "done": False, "seen": {}, "skipped": 0}
+    stats: Dict[str, Any] = {"inserted": 0, "duplicates": 0, "possible_duplicates": 0, "failed": 0, "errors": []}
+    t0 = time.perf_counter()
+
+    # backpressure: paling banyak satu chunk sedang ditulis sementara chunk berikutnya di-parse
+    pending: Optional[asyncio.Task] = None
+    try:
+        while not state["done"]:
+            docs, errors = await asyncio.to_thread(_parse_chunk, rows, state, source, user_id)
+            stats["failed"] += len(errors)
+            for e in errors:
+                _add_error(stats, e["row"], e["error"])
+            if not docs:
+                continue
+            if classify:
+                await _classify_rows(docs, user_id)
+            if pending:
+                await pending
+            pending = asyncio.create_task(_insert_chunk(coll, docs, stats, user_id))
+        if pending:
+            await pending
+    finally:
+        await file.close()
+        if stats["inserted"]:
+            await invalidate_responses(user_id)
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "format": fmt,
+        "rows": state["row"],
+        "inserted": stats["inserted"],
+        "skipped": state["skipped"],  # baris kredit OFX (pemasukan), bukan pengeluaran
+        "duplicates": stats["duplicates"],
+        "possible_duplicates": stats["possible_duplicates"],  # baris masuk tapi mirip transaksi lain di hari yang sama
+        "failed": stats["failed"],
+        "errors": stats["errors"],
+        "errors_truncated": stats["failed"] > len(stats["errors"]),
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(state["row"] / elapsed, 1) if elapsed > 0 else None,
+    }
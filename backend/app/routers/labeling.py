@@ -1,49 +1,155 @@
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel
-from typing import Optional, Dict, Any, List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List, Literal, Set, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+from app.models.category import Category
 from app.models.transaction import Transaction
+from app.models.labeling_queue import LabelQueueItem
+from app.core import rollup
+from app.core.cache import invalidate_responses
+from app.core.search import SEARCH_MODES, TEXT_SCORE_SORT, search_criteria
+from app.core.db import get_collection, new_revision, revision_update, unapplied_revisions
+from app.core.responses import FastJSONResponse
+from app.core.tenancy import current_user
+from app.routers.transactions import tx_row
+from app.ml import active
+from app.ml.jobs import schedule_learn
+from app.ml.text import build_text
 
 router = APIRouter(prefix="/labeling", tags=["labeling"])
 
+BULK_MAX = 1000
+
 class LabelIn(BaseModel):
     category_id: Optional[str] = None  
 
+class BulkLabelItem(BaseModel):
+    tx_id: str
+    category_id: Optional[str] = None
+
+class BulkLabelIn(BaseModel):
+    items: List[BulkLabelItem] = Field(min_length=1, max_length=BULK_MAX)
+
+_PROJECTION = {"date": 1, "description": 1, "merchant": 1, "amount": 1, "category_id": 1, "revision_id": 1}
+
 @router.get("/unlabeled")
 async def get_unlabeled(
     limit: int = Query(50, ge=1, le=200),
-    q: Optional[str] = Query(None, description="cari di description/merchant (case-insensitive)")
+    q: Optional[str] = Query(None, description="cari di description/merchant (case-insensitive)"),
+    search: Literal[SEARCH_MODES] = Query("contains", description="contains | text (ranking $text) | prefix (merchant)"),
+    user_id: Optional[str] = Depends(current_user),
 ):
-    crit: Dict[str, Any] = {"category_id": None}
-    if q:
-        crit["$or"] = [
-            {"description": {"$regex": q, "$options": "i"}},
-            {"merchant": {"$regex": q, "$options": "i"}},
-        ]
-    txs: List[Transaction] = await Transaction.find(crit).sort("-created_at").limit(limit).to_list()
-    items = [
-        {
-            "id": str(t.id),
-            "date": t.date,
-            "description": t.description,
-            "merchant": t.merchant,
-            "amount": t.amount,
-            "category_id": t.category_id,
-        }
-        for t in txs
-    ]
-    return {"items": items}
+    coll = get_collection(Transaction)
+    crit: Dict[str, Any] = {"user_id": user_id, "category_id": None}
+    if q and q.strip():
+        found_q, text_rank = search_criteria(q, search)
+        crit.update(found_q)
+        sort_spec = [TEXT_SCORE_SORT, ("created_at", -1)] if text_rank else [("created_at", -1)]
+        docs = await coll.find(crit, _PROJECTION).sort(sort_spec).limit(limit).to_list(length=limit)
+        return FastJSONResponse({"items": [tx_row(d) for d in docs], "ranked": 0})
+
+    # tanpa pencarian: baris paling tidak pasti dari antrean dulu, sisanya diisi transaksi terbaru
+    queued = await active.ranked(user_id, limit)
+    ids = [it["tx_id"] for it in queued]
+    items: List[Dict[str, Any]] = []
+    if ids:
+        found = {d["_id"]: d for d in await coll.find({**crit, "_id": {"$in": ids}}, _PROJECTION).to_list(length=len(ids))}
+        for it in queued:
+            d = found.get(it["tx_id"])
+            if d is None:  # sudah dilabel / dihapus sejak refresh terakhir
+                continue
+            row = tx_row(d)
+            row.update(predicted_category=it.get("predicted_category"),
+                       predicted_proba=it.get("predicted_proba"), margin=it["score"])
+            items.append(row)
+    ranked = len(items)
+    if ranked < limit:
+        rest = limit - ranked
+        if ids:
+            crit["_id"] = {"$nin": ids}
+        docs = await coll.find(crit, _PROJECTION).sort([("created_at", -1)]).limit(rest).to_list(length=rest)
+        items.extend(tx_row(d) for d in docs)
+    return FastJSONResponse({"items": items, "ranked": ranked})
+
+async def _unknown_categories(user_id: Optional[str], labels: Dict[ObjectId, Optional[str]]) -> Set[str]:
+    wanted = {cid for cid in labels.values() if cid is not None}
+    if not wanted:
+        return set()
+    oids = [ObjectId(cid) for cid in wanted if ObjectId.is_valid(cid)]
+    owned = {str(d["_id"]) for d in await get_collection(Category).find(
+        {"_id": {"$in": oids}, "user_id": user_id}, {"_id": 1}).to_list(length=len(oids))}
+    return wanted - owned
+
+async def _apply_labels(user_id: Optional[str], labels: Dict[ObjectId, Optional[str]]) -> Tuple[int, int, int]:
+    """Terapkan banyak label dengan satu find + satu bulk_write; -> (ditemukan, berubah, konflik)."""
+    coll = get_collection(Transaction)
+    docs = await coll.find({"_id": {"$in": list(labels)}, "user_id": user_id}, _PROJECTION).to_list(length=len(labels))
+    changed = [d for d in docs if d.get("category_id") != labels[d["_id"]]]
+    lost: Set[ObjectId] = set()
+    if changed:
+        # filter memakai revisi yang barusan dibaca: PATCH yang masuk di antaranya tidak tertimpa,
+        # dan delta rollup di bawah dihitung dari kategori yang memang diganti
+        sent = [(d["_id"], new_revision()) for d in changed]
+        res = await coll.bulk_write([
+            UpdateOne({"_id": d["_id"], "user_id": user_id, "revision_id": d.get("revision_id")},
+                      revision_update({"category_id": labels[d["_id"]]}, rev))
+            for d, (_, rev) in zip(changed, sent)
+        ], ordered=False)
+        if res.matched_count < len(sent):
+            lost = await unapplied_revisions(coll, sent)
+            changed = [d for d in changed if d["_id"] not in lost]
+    if changed:
+        await rollup.remove(user_id, [(d["date"], d.get("category_id"), d.get("amount")) for d in changed])
+        await rollup.add(user_id, [(d["date"], labels[d["_id"]], d.get("amount")) for d in changed])
+        await invalidate_responses(user_id)
+
+    await active.remove(user_id, [d["_id"] for d in docs if labels[d["_id"]] and d["_id"] not in lost])
+    learn = [d for d in changed if labels[d["_id"]]]
+    if learn:
+        schedule_learn(user_id, [build_text(d.get("description"), d.get("merchant")) for d in learn],
+                       [labels[d["_id"]] for d in learn])
+    return len(docs), len(changed), len(lost)
+
+@router.post("/bulk")
+async def set_labels_bulk(body: BulkLabelIn, user_id: Optional[str] = Depends(current_user)):
+    labels: Dict[ObjectId, Optional[str]] = {}
+    invalid: List[str] = []
+    for it in body.items:
+        if ObjectId.is_valid(it.tx_id):
+            labels[ObjectId(it.tx_id)] = it.category_id
+        else:
+            invalid.append(it.tx_id)
+    unknown = await _unknown_categories(user_id, labels)
+    rejected = [oid for oid, cid in labels.items() if cid in unknown]
+    for oid in rejected:
+        del labels[oid]
+    found, changed, conflicts = await _apply_labels(user_id, labels) if labels else (0, 0, 0)
+    return {"matched": found, "updated": changed, "conflicts": conflicts, "not_found": len(labels) - found,
+            "invalid_ids": invalid, "invalid_category_ids": sorted(unknown), "rejected": len(rejected)}
+
+@router.post("/queue/refresh", status_code=202)
+async def refresh_queue(user_id: Optional[str] = Depends(current_user)):
+    active.schedule_refresh(user_id)
+    return {"scheduled": True}
 
 @router.post("/{tx_id}")
-async def set_label(tx_id: str, body: LabelIn):
-    doc = await Transaction.get(tx_id)
-    if not doc:
+async def set_label(tx_id: str, body: LabelIn, user_id: Optional[str] = Depends(current_user)):
+    found = conflicts = 0
+    if ObjectId.is_valid(tx_id):
+        labels = {ObjectId(tx_id): body.category_id}
+        if await _unknown_categories(user_id, labels):
+            raise HTTPException(status_code=400, detail="category_id tidak ditemukan")
+        found, _, conflicts = await _apply_labels(user_id, labels)
+    if not found:
         raise HTTPException(status_code=404, detail="Transaction not found")
-    doc.category_id = body.category_id
-    await doc.save()
-    return {"updated": True, "category_id": doc.category_id}
+    if conflicts:
+        raise HTTPException(status_code=409, detail="Transaksi sedang diubah request lain; coba lagi")
+    return {"updated": True, "category_id": body.category_id}
 
 @router.get("/stats")
-async def labeling_stats():
-    cnt_unlabeled = await Transaction.find(Transaction.category_id == None).count() 
-    cnt_total = await Transaction.find_all().count()
-    return {"unlabeled": cnt_unlabeled, "total": cnt_total}
\ No newline at end of file
+async def labeling_stats(user_id: Optional[str] = Depends(current_user)):
+    cnt_unlabeled = await Transaction.find(Transaction.user_id == user_id, Transaction.category_id == None).count()
+    cnt_total = await Transaction.find(Transaction.user_id == user_id).count()
+    cnt_queued = await get_collection(LabelQueueItem).count_documents({"user_id": user_id})
+    return {"unlabeled": cnt_unlabeled, "total": cnt_total, "queued": cnt_queued}
@@ -0,0 +1,9 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core.metrics import REGISTRY
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
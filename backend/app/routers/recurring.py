@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from bson import ObjectId
+from app.models.recurring import DuplicateFlag, RecurringSeries
+from app.core import recurring
+from app.core.db import get_collection
+from app.core.responses import FastJSONResponse
+from app.core.tenancy import current_user
+
+router = APIRouter(prefix="/recurring", tags=["recurring"])
+
+_SERIES_PROJECTION = {"occurrences": 0, "user_id": 0}
+_FLAG_PROJECTION = {"user_id": 0}
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+@router.get("")
+async def list_recurring(
+    min_confidence: float = Query(0.6, ge=0.0, le=1.0),
+    include_inactive: bool = Query(False, description="sertakan langganan yang sudah melewatkan satu periode penuh"),
+    user_id: Optional[str] = Depends(current_user),
+):
+    # dibaca dari recurring_series yang sudah dihitung saat transaksi masuk; tanpa scan riwayat
+    docs = await get_collection(RecurringSeries).find(
+        {"user_id": user_id, "period": {"$ne": None}, "confidence": {"$gte": min_confidence}},
+        _SERIES_PROJECTION,
+    ).sort([("next_expected", 1)]).to_list(length=None)
+
+    today = datetime.utcnow()
+    items: List[Dict[str, Any]] = []
+    monthly_total = 0.0
+    for d in docs:
+        days = d.get("period_days") or 30
+        active = d["next_expected"] + timedelta(days=days) >= today
+        if not active and not include_inactive:
+            continue
+        monthly = round(float(d.get("amount") or 0.0) * 30 / days, 2)
+        if active:
+            monthly_total += monthly
+        items.append({
+            "id": str(d.pop("_id")), "count": d.pop("n", 0), **d, "active": active, "monthly_amount": monthly,
+            "first_date": _as_date(d.get("first_date")), "last_date": _as_date(d.get("last_date")),
+            "next_expected": _as_date(d.get("next_expected")),
+        })
+    return FastJSONResponse({"items": items, "monthly_total": round(monthly_total, 2),
+                             "rebuilding": recurring.is_running(user_id)})
+
+@router.get("/duplicates")
+async def list_duplicates(
+    include_dismissed: bool = Query(False),
+    limit: int = Query(100, ge=1, le=1000),
+    user_id: Optional[str] = Depends(current_user),
+):
+    crit: Dict[str, Any] = {"user_id": user_id}
+    if not include_dismissed:
+        crit["dismissed"] = False
+    docs = await get_collection(DuplicateFlag).find(crit, _FLAG_PROJECTION) \
+        .sort([("date", -1)]).limit(limit).to_list(length=limit)
+    items = [{"id": str(d.pop("_id")), **d, "date": _as_date(d.get("date"))} for d in docs]
+    return FastJSONResponse({"items": items})
+
+@router.post("/duplicates/{tx_id}/dismiss")
+async def dismiss_duplicate(tx_id: str, user_id: Optional[str] = Depends(current_user)):
+    matched = 0
+    if ObjectId.is_valid(tx_id):
+        res = await get_collection(DuplicateFlag).update_one(
+            {"user_id": user_id, "tx_id": ObjectId(tx_id)}, {"$set": {"dismissed": True}}
+        )
+        matched = res.matched_count
+    if not matched:
+        raise HTTPException(status_code=404, detail="Duplicate flag not found")
+    return {"dismissed": True}
+
+@router.post("/rebuild", status_code=202)
+async def rebuild_recurring(user_id: Optional[str] = Depends(current_user)):
+    # sekali untuk transaksi lama (sebelum deteksi inkremental aktif); berjalan di background
+    recurring.schedule_rebuild(user_id)
+    return {"scheduled": True}
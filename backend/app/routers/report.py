@@ -1,60 +1,82 @@
 # app/routers/reports.py
-from fastapi import APIRouter, Query
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from typing import Optional, Dict, Any, List
-from datetime import date
+from datetime import date, timedelta
 from collections import defaultdict
 from app.models.transaction import Transaction
-from app.models.category import Category
+from app.core.db import get_collection, as_datetime
+from app.core import rollup
+from app.models.rollup import DailyCategoryRollup
+from app.core.config import settings
+from app.core.metrics import Counter
+from app.core.cache import response_cache, invalidate_responses
+from app.core.tenancy import current_user
+from app.ml.registry import category_cache
 
 router = APIRouter(prefix="/reports", tags=["reports"])
+logger = logging.getLogger(__name__)
 
-def _get_collection():
+# berapa kali fallback Python dipakai, per endpoint
+report_fallbacks = Counter("report_fallback_total", "Fallback Python di endpoint laporan", ("endpoint",))
+
+def _date_match(user_id: Optional[str], start: Optional[date], end: Optional[date]) -> Dict[str, Any]:
+    # tanggal disimpan sebagai datetime 00:00 di Mongo (BSON tidak punya tipe date)
+    match: Dict[str, Any] = {"user_id": user_id}
+    if start or end:
+        d: Dict[str, Any] = {}
+        if start: d["$gte"] = as_datetime(start)
+        if end:   d["$lte"] = as_datetime(end)
+        match["date"] = d
+    return match
+
+async def _fallback_scan(endpoint: str, match: Dict[str, Any], key: str):
     """
-    Beberapa versi Beanie expose:
-      - get_motor_collection()  (baru, Motor Async)
-      - get_collection()        (lama)
-    Pakai yang tersedia.
+    Fallback kalau aggregation gagal: iterasi cursor Motor mentah (tanpa validasi Beanie),
+    hanya ambil field `key` + amount, dan akumulasi ke dict.
     """
-    m = getattr(Transaction, "get_motor_collection", None)
-    if callable(m):
-        return Transaction.get_motor_collection()
-    g = getattr(Transaction, "get_collection", None)
-    if callable(g):
-        return Transaction.get_collection()
-    raise RuntimeError("Tidak menemukan accessor koleksi Mongo untuk Transaction")
+    report_fallbacks.inc(endpoint)
+    logger.exception("reports/%s: aggregation gagal, pakai fallback Python (ke-%d)",
+                     endpoint, report_fallbacks.get(endpoint))
+
+    coll = get_collection(Transaction)
+    cursor = coll.find(match, {"_id": 0, key: 1, "amount": 1}).batch_size(settings.REPORT_FALLBACK_BATCH)
+    bucket_total: Dict[Any, float] = defaultdict(float)
+    bucket_count: Dict[Any, int] = defaultdict(int)
+    async for d in cursor:
+        k = d.get(key)
+        bucket_total[k] += float(d.get("amount") or 0.0)
+        bucket_count[k] += 1
+    return bucket_total, bucket_count
 
 @router.get("/summary")
 async def summary(
+    request: Request,
     start: Optional[date] = Query(None),
     end: Optional[date] = Query(None),
+    user_id: Optional[str] = Depends(current_user),
 ):
-    # Bangun filter match (pakai type 'date' saja)
-    match: Dict[str, Any] = {}
-    if start or end:
-        d: Dict[str, Any] = {}
-        if start: d["$gte"] = start
-        if end:   d["$lte"] = end
-        match["date"] = d
+    return await response_cache.respond(request, "reports.summary", lambda: _summary(user_id, start, end), user_id)
+
+async def _summary(user_id: Optional[str], start: Optional[date], end: Optional[date]):
+    match = _date_match(user_id, start, end)
 
-    # Coba aggregation di Mongo dulu
+    # Baca dari rollup user x hari x kategori: biaya sebanding jumlah hari, bukan jumlah transaksi
     try:
-        coll = _get_collection()
-        pipeline: List[Dict[str, Any]] = []
-        if match:
-            pipeline.append({"$match": match})
-        pipeline += [
+        coll = get_collection(DailyCategoryRollup)
+        pipeline: List[Dict[str, Any]] = [
+            {"$match": match},
             {"$group": {
                 "_id": "$category_id",
-                "totalAmount": {"$sum": "$amount"},
-                "count": {"$sum": 1},
+                "totalAmount": {"$sum": "$total"},
+                "count": {"$sum": "$n"},
             }},
             {"$sort": {"totalAmount": -1}},
         ]
         rows = await coll.aggregate(pipeline).to_list(length=2000)
 
         # map id -> name
-        cats = await Category.find_all().to_list()
-        names = {str(c.id): c.name for c in cats}
+        names = await category_cache.get(user_id)
 
         def resolve_name(cid):
             if cid is None:
@@ -78,17 +100,8 @@ async def summary(
 
     except Exception:
         # Fallback aman di Python (lebih lambat tapi anti-500)
-        qry = Transaction.find(match) if match else Transaction.find_all()
-        txs = await qry.to_list()
-        cats = await Category.find_all().to_list()
-        names = {str(c.id): c.name for c in cats}
-
-        bucket_total = defaultdict(float)
-        bucket_count = defaultdict(int)
-        for t in txs:
-            cid = t.category_id
-            bucket_total[cid] += float(t.amount or 0.0)
-            bucket_count[cid] += 1
+        bucket_total, bucket_count = await _fallback_scan("summary", match, "category_id")
+        names = await category_cache.get(user_id)
 
         def resolve_name(cid):
             if cid is None:
@@ -112,36 +125,161 @@ async def summary(
 
 @router.get("/daily")
 async def daily(
+    request: Request,
     start: Optional[date] = Query(None),
     end: Optional[date] = Query(None),
+    user_id: Optional[str] = Depends(current_user),
 ):
-    match: Dict[str, Any] = {}
-    if start or end:
-        d: Dict[str, Any] = {}
-        if start: d["$gte"] = start
-        if end:   d["$lte"] = end
-        match["date"] = d
+    return await response_cache.respond(request, "reports.daily", lambda: _daily(user_id, start, end), user_id)
+
+async def _daily(user_id: Optional[str], start: Optional[date], end: Optional[date]):
+    match = _date_match(user_id, start, end)
 
     try:
-        coll = _get_collection()
-        pipeline: List[Dict[str, Any]] = []
-        if match:
-            pipeline.append({"$match": match})
-        pipeline += [
-            {"$group": {"_id": "$date", "totalAmount": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+        coll = get_collection(DailyCategoryRollup)
+        pipeline: List[Dict[str, Any]] = [
+            {"$match": match},
+            {"$group": {"_id": "$date", "totalAmount": {"$sum": "$total"}, "count": {"$sum": "$n"}}},
             {"$sort": {"_id": 1}},
         ]
-        rows = await coll.aggregate(pipeline).to_list(length=3000)
-        items = [{"date": r["_id"], "total": float(r.get("totalAmount", 0.0)), "count": int(r.get("count", 0))} for r in rows]
+        rows = await coll.aggregate(pipeline).to_list(length=None)
+        items = [{"date": r["_id"].date(), "total": float(r.get("totalAmount", 0.0)), "count": int(r.get("count", 0))} for r in rows]
         return {"items": items}
 
     except Exception:
         # Fallback Python
-        qry = Transaction.find(match) if match else Transaction.find_all()
-        txs = await qry.to_list()
-        bucket = defaultdict(lambda: {"total": 0.0, "count": 0})
-        for t in txs:
-            bucket[t.date]["total"] += float(t.amount or 0.0)
-            bucket[t.date]["count"] += 1
-        items = [{"date": d, "total": v["total"], "count": v["count"]} for d, v in sorted(bucket.items())]
+        bucket_total, bucket_count = await _fallback_scan("daily", match, "date")
+        items = [
+            {"date": d.date(), "total": total, "count": bucket_count[d]}
+            for d, total in sorted(bucket_total.items())
+        ]
         return {"items": items}
+
+def _previous_period(start: date, end: date):
+    # periode sebelumnya dengan panjang hari yang sama, tepat sebelum start
+    days = (end - start).days + 1
+    prev_end = start - timedelta(days=1)
+    return prev_end - timedelta(days=days - 1), prev_end
+
+def _delta(cur: float, prev: Optional[float]) -> Dict[str, Any]:
+    if prev is None:
+        return {"previous_total": None, "delta": None, "delta_pct": None}
+    return {
+        "previous_total": prev,
+        "delta": cur - prev,
+        "delta_pct": round((cur - prev) / prev * 100.0, 2) if prev else None,
+    }
+
+_BUCKET = {"total": {"$sum": "$amount"}, "count": {"$sum": 1}}
+_CURRENT = {"$match": {"cur": True}}
+
+@router.get("/analytics")
+async def analytics(
+    request: Request,
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    top: int = Query(10, ge=1, le=100, description="jumlah merchant teratas"),
+    user_id: Optional[str] = Depends(current_user),
+):
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start harus <= end")
+    return await response_cache.respond(request, "reports.analytics", lambda: _analytics(user_id, start, end, top), user_id)
+
+async def _analytics(user_id: Optional[str], start: Optional[date], end: Optional[date], top: int):
+    """
+    Satu round-trip untuk dashboard: satu $match (index user_id, date) lalu $facet untuk kategori,
+    bucket harian/mingguan/bulanan, merchant teratas, dan pembanding periode sebelumnya.
+    Periode sebelumnya ikut di-match supaya delta tidak butuh scan kedua.
+    """
+    previous = _previous_period(start, end) if start and end else None
+    match = _date_match(user_id, previous[0] if previous else start, end)
+    is_current = {"$gte": ["$date", as_datetime(start)]} if previous else {"$literal": True}
+
+    pipeline: List[Dict[str, Any]] = [
+        {"$match": match},
+        {"$project": {"date": 1, "amount": 1, "category_id": 1, "merchant": 1, "merchant_lc": 1, "cur": is_current}},
+        {"$facet": {
+            "totals": [{"$group": {"_id": "$cur", **_BUCKET}}],
+            "categories": [{"$group": {"_id": {"cid": "$category_id", "cur": "$cur"}, **_BUCKET}}],
+            "daily": [_CURRENT, {"$group": {"_id": "$date", **_BUCKET}}, {"$sort": {"_id": 1}}],
+            # $dateFromParts (bukan $dateTrunc) supaya tetap jalan di MongoDB < 5.0
+            "weekly": [_CURRENT, {"$group": {"_id": {"$dateFromParts": {
+                "isoWeekYear": {"$isoWeekYear": "$date"}, "isoWeek": {"$isoWeek": "$date"}, "isoDayOfWeek": 1,
+            }}, **_BUCKET}}, {"$sort": {"_id": 1}}],
+            "monthly": [_CURRENT, {"$group": {"_id": {"$dateFromParts": {
+                "year": {"$year": "$date"}, "month": {"$month": "$date"}, "day": 1,
+            }}, **_BUCKET}}, {"$sort": {"_id": 1}}],
+            "merchants": [
+                _CURRENT,
+                {"$match": {"merchant_lc": {"$ne": None}}},
+                {"$group": {"_id": "$merchant_lc", "merchant": {"$first": "$merchant"}, **_BUCKET}},
+                {"$sort": {"total": -1}},
+                {"$limit": top},
+            ],
+        }},
+    ]
+    facets = (await get_collection(Transaction).aggregate(pipeline).to_list(length=1))[0]
+    names = await category_cache.get(user_id)
+
+    def resolve_name(cid):
+        if cid is None:
+            return "Uncategorized"
+        return names.get(cid, f"(deleted:{cid})")
+
+    totals = {t["_id"]: t for t in facets["totals"]}
+    cur_tot = totals.get(True, {})
+    prev_tot = totals.get(False, {})
+    cur_total = float(cur_tot.get("total", 0.0))
+
+    cats: Dict[Any, Dict[str, Any]] = {}
+    for r in facets["categories"]:
+        c = cats.setdefault(r["_id"].get("cid"), {"total": 0.0, "count": 0, "prev": 0.0})
+        if r["_id"]["cur"]:
+            c["total"], c["count"] = float(r["total"]), int(r["count"])
+        else:
+            c["prev"] = float(r["total"])
+    categories = [
+        {"category_id": cid, "category_name": resolve_name(cid), "total": c["total"], "count": c["count"],
+         **_delta(c["total"], c["prev"] if previous else None)}
+        for cid, c in sorted(cats.items(), key=lambda kv: kv[1]["total"], reverse=True)
+    ]
+
+    def buckets(rows, key: str, fmt=lambda d: d.date()):
+        return [{key: fmt(r["_id"]), "total": float(r["total"]), "count": int(r["count"])} for r in rows]
+
+    return {
+        "range": {
+            "start": start, "end": end,
+            "previous_start": previous[0] if previous else None,
+            "previous_end": previous[1] if previous else None,
+        },
+        "totals": {
+            "total": cur_total,
+            "count": int(cur_tot.get("count", 0)),
+            "previous_count": int(prev_tot.get("count", 0)) if previous else None,
+            **_delta(cur_total, float(prev_tot.get("total", 0.0)) if previous else None),
+        },
+        "categories": categories,
+        "daily": buckets(facets["daily"], "date"),
+        "weekly": buckets(facets["weekly"], "week_start"),
+        "monthly": buckets(facets["monthly"], "month", lambda d: d.strftime("%Y-%m")),
+        "top_merchants": [
+            {"merchant": r.get("merchant") or r["_id"], "total": float(r["total"]), "count": int(r["count"])}
+            for r in facets["merchants"]
+        ],
+    }
+
+@router.post("/rollup/rebuild")
+async def rollup_rebuild(user_id: Optional[str] = Depends(current_user)):
+    # hanya rollup milik pemanggil; rebuild semua user lewat `python -m app.core.rollup rebuild`
+    buckets = await rollup.rebuild(user_id)
+    await invalidate_responses(user_id)
+    return {"rebuilt": True, "buckets": buckets}
+
+@router.get("/rollup/check")
+async def rollup_check(
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    user_id: Optional[str] = Depends(current_user),
+):
+    return await rollup.check(_date_match(user_id, start, end))
@@ -0,0 +1,97 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from typing import Literal, Optional
+from bson import ObjectId
+from app.models.rule import Rule
+from app.models.category import Category
+from app.core.db import get_collection
+from app.core.tenancy import current_user
+from app.ml.rules import compile_regex, rule_cache
+
+router = APIRouter(prefix="/rules", tags=["rules"])
+
+class RuleIn(BaseModel):
+    kind: Literal["keyword", "merchant", "regex", "amount"] = "keyword"
+    pattern: Optional[str] = Field(None, max_length=200)
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    category_id: str
+    priority: int = 0
+    confidence: float = Field(0.7, ge=0.0, le=1.0)
+    override: bool = False
+    enabled: bool = True
+
+    @model_validator(mode="after")
+    def check_shape(self):
+        if self.kind == "amount":
+            if self.min_amount is None and self.max_amount is None:
+                raise ValueError("rule amount butuh min_amount atau max_amount")
+        elif not (self.pattern or "").strip():
+            raise ValueError("pattern wajib diisi")
+        if self.min_amount is not None and self.max_amount is not None and self.min_amount > self.max_amount:
+            raise ValueError("min_amount > max_amount")
+        if self.kind == "regex":
+            compile_regex(self.pattern)  # hanya subset aman; regex tenant jalan di event loop
+        return self
+
+class RulePatch(BaseModel):
+    # partial update: field yang tidak dikirim tidak berubah; hasil gabungannya divalidasi ulang lewat RuleIn
+    kind: Optional[Literal["keyword", "merchant", "regex", "amount"]] = None
+    pattern: Optional[str] = Field(None, max_length=200)
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    category_id: Optional[str] = None
+    priority: Optional[int] = None
+    confidence: Optional[float] = Field(None, ge=0.0, le=1.0)
+    override: Optional[bool] = None
+    enabled: Optional[bool] = None
+
+async def _check_category(category_id: str, user_id: Optional[str]):
+    cat = None
+    if ObjectId.is_valid(category_id):
+        cat = await Category.find_one({"_id": ObjectId(category_id), "user_id": user_id})
+    if not cat:
+        raise HTTPException(status_code=400, detail="category_id tidak ditemukan")
+
+@router.get("")
+async def list_rules(user_id: Optional[str] = Depends(current_user)):
+    items = await Rule.find(Rule.user_id == user_id).sort(-Rule.priority).to_list()
+    return {"items": items}
+
+@router.post("")
+async def create_rule(payload: RuleIn, user_id: Optional[str] = Depends(current_user)):
+    await _check_category(payload.category_id, user_id)
+    saved = await Rule(**payload.model_dump(), user_id=user_id).insert()
+    rule_cache.invalidate(user_id)
+    return {"id": str(saved.id)}
+
+@router.patch("/{rule_id}")
+async def update_rule(rule_id: str, payload: RulePatch, user_id: Optional[str] = Depends(current_user)):
+    coll = get_collection(Rule)
+    owned = {"_id": ObjectId(rule_id), "user_id": user_id} if ObjectId.is_valid(rule_id) else None
+    current = await coll.find_one(owned) if owned else None
+    if not current:
+        raise HTTPException(status_code=404, detail="Rule not found")
+    changes = payload.model_dump(exclude_unset=True)
+    try:
+        merged = RuleIn(**{**{k: current.get(k) for k in RuleIn.model_fields if k in current}, **changes})
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    if "category_id" in changes:
+        await _check_category(merged.category_id, user_id)
+    # $set seluruh field RuleIn: kind yang berubah bisa mengosongkan pattern / batas amount
+    await coll.update_one(owned, {"$set": merged.model_dump()})
+    rule_cache.invalidate(user_id)
+    return {"id": rule_id, **merged.model_dump()}
+
+@router.delete("/{rule_id}")
+async def delete_rule(rule_id: str, user_id: Optional[str] = Depends(current_user)):
+    deleted = 0
+    if ObjectId.is_valid(rule_id):
+        res = await get_collection(Rule).delete_one({"_id": ObjectId(rule_id), "user_id": user_id})
+        deleted = res.deleted_count
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Rule not found")
+    rule_cache.invalidate(user_id)
+    return {"deleted": True}
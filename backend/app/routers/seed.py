@@ -1,16 +1,52 @@
-from fastapi import APIRouter
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends
+from pymongo import UpdateOne
 from app.models.category import Category
+from app.models.rule import Rule
+from app.core.db import get_collection
+from app.ml.registry import invalidate_category_map
+from app.ml.rules import DEFAULT_RULES, rule_cache
+from app.core.cache import invalidate_responses
+from app.core.tenancy import current_user
 
 router = APIRouter(prefix="/seed")
 
 @router.post("/categories-default")
-async def seed_categories_default():
+async def seed_categories_default(user_id: Optional[str] = Depends(current_user)):
     defaults = ["Food","Transport","Bills","Entertainment","Groceries","Other"]
-    # upsert sederhana: cek ada atau belum (by name)
-    inserted = 0
-    for name in defaults:
-        exists = await Category.find_one(Category.name == name)
-        if not exists:
-            await Category(name=name).insert()
-            inserted += 1
+    # upsert by (user, name) dalam satu bulk_write
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne({"user_id": user_id, "name": name},
+                  {"$setOnInsert": {"name": name, "user_id": user_id, "created_at": now}}, upsert=True)
+        for name in defaults
+    ]
+    res = await get_collection(Category).bulk_write(ops, ordered=False)
+    inserted = res.upserted_count
+    if inserted:
+        invalidate_category_map(user_id)
+        await invalidate_responses(user_id)
     return {"ok": True, "inserted": inserted, "total_defaults": len(defaults)}
+
+@router.post("/rules-default")
+async def seed_rules_default(user_id: Optional[str] = Depends(current_user)):
+    # salin rule bawaan ke rule milik user supaya bisa diedit; kategori di-resolve lewat nama
+    cats = {c.name.lower(): str(c.id) for c in await Category.find(Category.user_id == user_id).to_list()}
+    now = datetime.utcnow()
+    ops, skipped = [], 0
+    for r in DEFAULT_RULES:
+        cid = cats.get(r["category_name"].lower())
+        if cid is None:
+            skipped += 1
+            continue
+        doc = {k: v for k, v in r.items() if k != "category_name"}
+        doc.update(user_id=user_id, category_id=cid, override=False, enabled=True, created_at=now)
+        ops.append(UpdateOne({"user_id": user_id, "kind": r["kind"], "pattern": r["pattern"]},
+                             {"$setOnInsert": doc}, upsert=True))
+    inserted = 0
+    if ops:
+        inserted = (await get_collection(Rule).bulk_write(ops, ordered=False)).upserted_count
+    if inserted:
+        rule_cache.invalidate(user_id)
+    return {"ok": True, "inserted": inserted, "skipped_missing_category": skipped}
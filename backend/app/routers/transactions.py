@@ -1,8 +1,22 @@
-from fastapi import APIRouter, HTTPException, Query
+import base64, binascii
+from uuid import uuid4
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel, Field
-from datetime import date
-from typing import Optional, Any, Dict
+from datetime import date, datetime
+from typing import Optional, Any, Dict, List, Literal, Tuple
+from bson import ObjectId, json_util
+from pymongo import ReturnDocument, UpdateOne
 from app.models.transaction import Transaction
+from app.core.config import settings
+from app.core.db import (get_collection, as_datetime, new_revision, parse_revision, revision_str,
+                         revision_update, unapplied_revisions)
+from app.core import recurring, rollup
+from app.core.cache import invalidate_responses
+from app.core.responses import FastJSONResponse
+from app.core.search import SEARCH_MODES, TEXT_SCORE_SORT, search_criteria, normalize_merchant
+from app.core.tenancy import current_user
+from app.ml.model_ai import classify_texts
+from app.ml.text import build_text
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 
@@ -28,31 +42,300 @@ class TxUpdate(BaseModel):
     predicted_category: Optional[str] = None
     predicted_proba: Optional[float] = None
     source: Optional[str] = None
+    # revisi yang terakhir dibaca client; kalau dikirim dan sudah berubah di server -> 409 / conflict
+    revision_id: Optional[str] = None
+
+class TxPatchItem(TxUpdate):
+    id: str
+
+BULK_PATCH_MAX = 1000
+
+class TxPatchBulkIn(BaseModel):
+    items: List[TxPatchItem] = Field(min_length=1, max_length=BULK_PATCH_MAX)
+
+# field yang dikirim ke client (field internal seperti merchant_lc / dedupe_key tidak ikut)
+TX_FIELDS = ("user_id", "date", "description", "amount", "merchant", "category_id",
+             "predicted_category", "predicted_proba", "source", "created_at", "revision_id")
+
+def tx_projection(fields: Optional[str] = None) -> Dict[str, int]:
+    if not fields:
+        return {f: 1 for f in TX_FIELDS}
+    wanted = [f.strip() for f in fields.split(",") if f.strip() and f.strip() != "id"]
+    unknown = [f for f in wanted if f not in TX_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"fields tidak dikenal: {', '.join(unknown)}")
+    return {f: 1 for f in wanted} or {"_id": 1}
+
+def tx_row(doc: Dict[str, Any]) -> Dict[str, Any]:
+    # dokumen mentah -> bentuk respons ringan, tanpa validasi model per baris
+    row = {"id": str(doc.pop("_id"))}
+    row.update(doc)
+    d = row.get("date")
+    if isinstance(d, datetime):
+        row["date"] = d.date()
+    if "revision_id" in row:
+        row["revision_id"] = revision_str(row["revision_id"])
+    return row
+
+# field yang boleh dipakai sort (semuanya punya compound index (field, _id) untuk keyset)
+_SORT_FIELDS = {"created_at", "date", "amount"}
+
+def _parse_sort(sort: str) -> Tuple[str, int]:
+    field, direction = (sort[1:], -1) if sort.startswith("-") else (sort.lstrip("+"), 1)
+    if field not in _SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort harus salah satu dari: {', '.join(sorted(_SORT_FIELDS))}")
+    return field, direction
+
+def _encode_cursor(sort: str, value: Any, oid) -> str:
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = as_datetime(value)
+    raw = json_util.dumps({"s": sort, "v": value, "id": oid})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def _decode_cursor(token: str, sort: str) -> Tuple[Any, Any]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json_util.loads(raw)
+        value, oid = data["v"], data["id"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor tidak valid")
+    if data.get("s") != sort:
+        raise HTTPException(status_code=400, detail="Cursor dibuat untuk sort yang berbeda")
+    return value, oid
+
+async def _count(criteria: Dict[str, Any], mode: str) -> Tuple[Optional[int], bool]:
+    # -> (total, exact?); criteria selalu berisi user_id, jadi estimated_document_count tidak berlaku
+    if mode == "none":
+        return None, False
+    coll = get_collection(Transaction)
+    if mode == "estimate":
+        cap = settings.TX_COUNT_CAP
+        n = await coll.count_documents(criteria, limit=cap)
+        return n, n < cap
+    return await coll.count_documents(criteria), True
+
+def tx_criteria(
+    user_id: Optional[str],
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    category_id: Optional[str] = None,
+    q: Optional[str] = None,
+    search: str = "contains",
+) -> Tuple[Dict[str, Any], bool]:
+    # filter yang sama untuk list & export -> (criteria, pakai_text_score?)
+    criteria: Dict[str, Any] = {"user_id": user_id}
+    if category_id:
+        criteria["category_id"] = category_id
+    if start or end:
+        d: Dict[str, Any] = {}
+        if start: d["$gte"] = as_datetime(start)
+        if end:   d["$lte"] = as_datetime(end)
+        criteria["date"] = d
+    text_rank = False
+    if q and q.strip():
+        found_q, text_rank = search_criteria(q, search)
+        criteria.update(found_q)
+    return criteria, text_rank
+
+async def _get_owned(tx_id: str, user_id: Optional[str]) -> Transaction:
+    # transaksi user lain diperlakukan sama dengan yang tidak ada
+    doc = None
+    if ObjectId.is_valid(tx_id):
+        doc = await Transaction.find_one({"_id": ObjectId(tx_id), "user_id": user_id})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    return doc
+
+async def _classify_rows(rows: List[Dict[str, Any]], user_id: Optional[str]):
+    # satu pass vektor untuk seluruh batch; prediksi dari client tetap dipakai kalau sudah ada
+    preds = await classify_texts(
+        [build_text(r["description"], r.get("merchant")) for r in rows], user_id,
+        [r.get("merchant") for r in rows], [r.get("amount") for r in rows],
+    )
+    threshold = settings.AUTO_CATEGORY_THRESHOLD
+    for r, (cid, _, proba) in zip(rows, preds):
+        if r.get("predicted_category") is None:
+            r["predicted_category"] = cid
+            r["predicted_proba"] = proba
+        if (threshold is not None and not r.get("category_id") and cid
+                and proba is not None and proba >= threshold):
+            r["category_id"] = cid
 
 @router.post("")
-async def create_transaction(payload: TxIn):
-    doc = Transaction(**payload.model_dump())
+async def create_transaction(
+    payload: TxIn,
+    classify: bool = Query(False),
+    user_id: Optional[str] = Depends(current_user),
+):
+    row = payload.model_dump()
+    row["user_id"] = user_id
+    if classify:
+        await _classify_rows([row], user_id)
+    doc = Transaction(**row)
     saved = await doc.insert()
-    return {"id": str(saved.id)}
+    await rollup.add(user_id, [(doc.date, doc.category_id, doc.amount)])
+    dupes = await recurring.observe(user_id, [{"_id": saved.id, **row}])
+    await invalidate_responses(user_id)
+    out: Dict[str, Any] = {"id": str(saved.id), "revision_id": revision_str(doc.revision_id)}
+    if dupes:
+        out["duplicate_of"] = str(dupes[saved.id])
+    if classify:
+        out.update(category_id=doc.category_id, predicted_category=doc.predicted_category, predicted_proba=doc.predicted_proba)
+    return out
 
 @router.get("/{tx_id}")
-async def get_transaction(tx_id: str):
-    doc = await Transaction.get(tx_id)
+async def get_transaction(
+    tx_id: str,
+    fields: Optional[str] = Query(None, description="daftar field, pisahkan dengan koma"),
+    user_id: Optional[str] = Depends(current_user),
+):
+    doc = None
+    if ObjectId.is_valid(tx_id):
+        doc = await get_collection(Transaction).find_one({"_id": ObjectId(tx_id), "user_id": user_id}, tx_projection(fields))
     if not doc:
         raise HTTPException(status_code=404, detail="Transaction not found")
-    return doc
+    return FastJSONResponse(tx_row(doc))
+
+# field yang tidak boleh di-set null lewat PATCH
+_NOT_NULL = ("date", "description", "amount")
+# perubahan field ini memindahkan transaksi ke signature recurring lain
+_SIGNATURE_FIELDS = {"date", "description", "merchant", "amount"}
+# cukup untuk update rollup + cek revisi
+_PATCH_PROJECTION = {"date": 1, "category_id": 1, "amount": 1, "revision_id": 1}
+
+def _patch_set(data: Dict[str, Any]) -> Dict[str, Any]:
+    # payload PATCH (exclude_unset) -> isi $set mentah; hook Beanie tidak jalan, jadi merchant_lc dihitung di sini
+    nulls = [f for f in _NOT_NULL if f in data and data[f] is None]
+    if nulls:
+        raise ValueError(f"{', '.join(nulls)} tidak boleh null")
+    if data.get("description") == "" or (data.get("amount") is not None and data["amount"] <= 0):
+        raise ValueError("description tidak boleh kosong dan amount harus > 0")
+    out = dict(data)
+    if "date" in out:
+        out["date"] = as_datetime(out["date"])
+    if "merchant" in out:
+        out["merchant_lc"] = normalize_merchant(out["merchant"])
+    return out
+
+def _parse_patch(item: TxUpdate, exclude=None) -> Tuple[Dict[str, Any], bool, Any]:
+    """-> ($set tanpa revision_id, client mengirim revision_id?, revision yang diharapkan)."""
+    data = item.model_dump(exclude_unset=True, exclude=exclude)
+    check = "revision_id" in data
+    try:
+        expected = parse_revision(data.pop("revision_id", None))
+    except ValueError:
+        raise ValueError("revision_id tidak valid")
+    return _patch_set(data), check, expected
+
+def _rollup_row(doc: Dict[str, Any]) -> Tuple[Any, Optional[str], Any]:
+    return doc["date"], doc.get("category_id"), doc.get("amount")
+
+@router.patch("/bulk")
+async def update_transactions_bulk(payload: TxPatchBulkIn, user_id: Optional[str] = Depends(current_user)):
+    """Banyak partial update dalam satu find + satu bulk_write unordered; hasil dilaporkan per item."""
+    coll = get_collection(Transaction)
+    results: List[Dict[str, Any]] = [{"id": it.id} for it in payload.items]
+    planned: List[Tuple[int, ObjectId, Dict[str, Any], bool, Any]] = []
+    seen = set()
+    for i, it in enumerate(payload.items):
+        if not ObjectId.is_valid(it.id):
+            results[i].update(status="invalid", detail="id tidak valid")
+            continue
+        oid = ObjectId(it.id)
+        if oid in seen:
+            results[i].update(status="invalid", detail="id muncul lebih dari sekali")
+            continue
+        seen.add(oid)
+        try:
+            changes, check, expected = _parse_patch(it, exclude={"id"})
+        except ValueError as e:
+            results[i].update(status="invalid", detail=str(e))
+            continue
+        planned.append((i, oid, changes, check, expected))
+
+    olds = {}
+    if planned:
+        olds = {d["_id"]: d for d in await coll.find(
+            {"_id": {"$in": [p[1] for p in planned]}, "user_id": user_id}, _PATCH_PROJECTION
+        ).to_list(length=len(planned))}
+
+    ops: List[UpdateOne] = []
+    sent: List[Tuple[int, ObjectId, Dict[str, Any], Any]] = []
+    for i, oid, changes, check, expected in planned:
+        old = olds.get(oid)
+        if old is None:
+            results[i]["status"] = "not_found"
+            continue
+        current = old.get("revision_id")
+        if check and current != expected:
+            results[i].update(status="conflict", revision_id=revision_str(current))
+            continue
+        # filter selalu memakai revisi yang barusan dibaca, jadi item yang diubah writer lain di antaranya tidak ikut tertimpa
+        rev = new_revision()
+        ops.append(UpdateOne({"_id": oid, "user_id": user_id, "revision_id": current},
+                             revision_update(changes, rev)))
+        sent.append((i, oid, changes, rev))
+
+    if ops:
+        res = await coll.bulk_write(ops, ordered=False)
+        lost = set()
+        if res.matched_count < len(ops):
+            # revision_id saja tidak cukup: tulisan kita bisa sudah masuk lalu ditimpa writer lain sebelum dibaca ulang
+            lost = await unapplied_revisions(coll, [(oid, rev) for _, oid, _, rev in sent])
+        removed, added, resync = [], [], []
+        for i, oid, changes, rev in sent:
+            if oid in lost:
+                results[i]["status"] = "conflict"
+                continue
+            results[i].update(status="updated", revision_id=revision_str(rev))
+            old = olds[oid]
+            removed.append(_rollup_row(old))
+            added.append(_rollup_row({**old, **changes}))
+            if _SIGNATURE_FIELDS.intersection(changes):
+                resync.append(oid)
+        if removed:
+            await rollup.remove(user_id, removed)
+            await rollup.add(user_id, added)
+            await recurring.resync(user_id, resync)
+            await invalidate_responses(user_id)
+
+    counts: Dict[str, int] = {"updated": 0, "not_found": 0, "conflict": 0, "invalid": 0}
+    for r in results:
+        counts[r["status"]] += 1
+    return {**counts, "items": results}
 
 @router.patch("/{tx_id}")
-async def update_transaction(tx_id: str, payload: TxUpdate):
-    doc = await Transaction.get(tx_id)
-    if not doc:
+async def update_transaction(tx_id: str, payload: TxUpdate, user_id: Optional[str] = Depends(current_user)):
+    try:
+        changes, check, expected = _parse_patch(payload)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not ObjectId.is_valid(tx_id):
         raise HTTPException(status_code=404, detail="Transaction not found")
 
-    data = payload.model_dump(exclude_unset=True)
-    for k, v in data.items():
-        setattr(doc, k, v)
-    await doc.save()
-    return {"updated": True}
+    # satu round trip: $set field yang berubah saja + revisi baru, dokumen lama dikembalikan untuk rollup
+    coll = get_collection(Transaction)
+    owned = {"_id": ObjectId(tx_id), "user_id": user_id}
+    rev = new_revision()
+    old = await coll.find_one_and_update(
+        {**owned, "revision_id": expected} if check else owned,
+        revision_update(changes, rev),
+        projection=_PATCH_PROJECTION,
+        return_document=ReturnDocument.BEFORE,
+    )
+    if old is None:
+        current = await coll.find_one(owned, {"revision_id": 1}) if check else None
+        if current is None:
+            raise HTTPException(status_code=404, detail="Transaction not found")
+        raise HTTPException(status_code=409, detail={
+            "message": "Transaksi sudah diubah request lain; ambil ulang lalu kirim revision_id terbaru",
+            "revision_id": revision_str(current.get("revision_id")),
+        })
+    await rollup.move(user_id, _rollup_row(old), _rollup_row({**old, **changes}))
+    if _SIGNATURE_FIELDS.intersection(changes):
+        await recurring.resync(user_id, [old["_id"]])
+    await invalidate_responses(user_id)
+    return {"updated": True, "revision_id": revision_str(rev)}
 
 @router.get("")
 async def list_transactions(
@@ -60,47 +343,91 @@ async def list_transactions(
     end: Optional[date] = Query(None),
     category_id: Optional[str] = None,
     q: Optional[str] = Query(None),
+    search: Literal[SEARCH_MODES] = Query("contains", description="contains | text (ranking $text) | prefix (merchant)"),
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=200),
     sort: str = Query("-created_at"),
+    cursor: Optional[str] = Query(None, description="token next_cursor dari halaman sebelumnya (mengabaikan page)"),
+    count: Literal["exact", "estimate", "none"] = Query("estimate"),
+    fields: Optional[str] = Query(None, description="daftar field, pisahkan dengan koma (id selalu ada)"),
+    user_id: Optional[str] = Depends(current_user),
 ):
-    criteria: Dict[str, Any] = {}
-    if category_id:
-        criteria["category_id"] = category_id
-    if start or end:
-        d: Dict[str, Any] = {}
-        if start: d["$gte"] = start
-        if end:   d["$lte"] = end
-        criteria["date"] = d
-    if q:
-        criteria["$or"] = [
-            {"description": {"$regex": q, "$options": "i"}},
-            {"merchant": {"$regex": q, "$options": "i"}},
-        ]
-
-    skip = (page - 1) * limit
-    cursor = Transaction.find(criteria).sort(sort)
-    total = await Transaction.find(criteria).count()
-    items = await cursor.skip(skip).limit(limit).to_list()
-
-    return {
+    criteria, text_rank = tx_criteria(user_id, start, end, category_id, q, search)
+
+    field, direction = _parse_sort(sort)
+    query = criteria
+    skip = 0
+    if text_rank and cursor:
+        raise HTTPException(status_code=400, detail="search=text diurutkan per relevansi; pakai page, bukan cursor")
+    if cursor:
+        # keyset: lanjut setelah pasangan (sort key, _id) terakhir, tanpa skip
+        value, oid = _decode_cursor(cursor, sort)
+        op = "$lt" if direction < 0 else "$gt"
+        keyset = {"$or": [{field: {op: value}}, {field: value, "_id": {op: oid}}]}
+        query = {"$and": [criteria, keyset]}
+    else:
+        skip = (page - 1) * limit
+
+    # ambil limit+1 untuk tahu masih ada halaman berikutnya tanpa count
+    sort_spec = [TEXT_SCORE_SORT, ("_id", -1)] if text_rank else [(field, direction), ("_id", direction)]
+    projection = tx_projection(fields)
+    requested = set(projection)
+    projection[field] = 1  # dibutuhkan untuk next_cursor
+
+    found = get_collection(Transaction).find(query, projection).sort(sort_spec)
+    if skip:
+        found = found.skip(skip)
+    docs = await found.limit(limit + 1).to_list(length=limit + 1)
+    has_next = len(docs) > limit
+    docs = docs[:limit]
+    total, total_exact = await _count(criteria, count)
+
+    next_cursor = None
+    if has_next and docs and not text_rank:
+        last = docs[-1]
+        next_cursor = _encode_cursor(sort, last.get(field), last["_id"])
+
+    items = []
+    for d in docs:
+        if field not in requested:
+            d.pop(field, None)
+        items.append(tx_row(d))
+
+    return FastJSONResponse({
         "items": items,
-        "page": page,
+        "page": None if cursor else page,
         "limit": limit,
         "total": total,
-        "has_next": (skip + len(items)) < total,
-    }
+        "total_exact": total_exact,
+        "has_next": has_next,
+        "next_cursor": next_cursor,
+    })
 
 @router.delete("/{tx_id}")
-async def delete_transaction(tx_id: str):
-    doc = await Transaction.get(tx_id)
-    if not doc:
-        raise HTTPException(status_code=404, detail="Transaction not found")
+async def delete_transaction(tx_id: str, user_id: Optional[str] = Depends(current_user)):
+    doc = await _get_owned(tx_id, user_id)
     await doc.delete()
+    await rollup.remove(user_id, [(doc.date, doc.category_id, doc.amount)])
+    await recurring.forget(user_id, [doc.id])
+    await invalidate_responses(user_id)
     return {"deleted": True}
 
 @router.post("/bulk")
-async def create_transactions_bulk(payload: TxBulkIn):
-    docs = [Transaction(**it.model_dump()) for it in payload.items]
+async def create_transactions_bulk(
+    payload: TxBulkIn,
+    classify: bool = Query(False),
+    user_id: Optional[str] = Depends(current_user),
+):
+    rows = [dict(it.model_dump(), user_id=user_id) for it in payload.items]
+    if classify and rows:
+        await _classify_rows(rows, user_id)
+    docs = [Transaction(**r) for r in rows]
+    for d in docs:  # insert_many tidak menjalankan event hook Beanie maupun pengisian revision_id dari insert()
+        d.merchant_lc = normalize_merchant(d.merchant)
+        d.revision_id = uuid4()
     res = await Transaction.insert_many(docs)
-    return {"inserted": len(res.inserted_ids), "ids": [str(i) for i in res.inserted_ids]}
\ No newline at end of file
+    await rollup.add(user_id, ((d.date, d.category_id, d.amount) for d in docs))
+    dupes = await recurring.observe(user_id, [{"_id": i, **r} for i, r in zip(res.inserted_ids, rows)])
+    await invalidate_responses(user_id)
+    return {"inserted": len(res.inserted_ids), "ids": [str(i) for i in res.inserted_ids],
+            "duplicates": {str(k): str(v) for k, v in dupes.items()}}
\ No newline at end of file
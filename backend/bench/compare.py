@@ -0,0 +1,49 @@
+"""
+Bandingkan dua baseline JSON dari bench.run.
+
+    python -m bench.compare old.json new.json --threshold 10
+
+Exit code 1 kalau ada skenario yang p95-nya naik lebih dari threshold persen.
+"""
+import argparse, json, sys
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+
+
+def _delta(old: float, new: float) -> float:
+    return 0.0 if not old else (new - old) / old * 100.0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("old")
+    ap.add_argument("new")
+    ap.add_argument("--threshold", type=float, default=10.0, help="persen kenaikan p95 yang dianggap regresi")
+    args = ap.parse_args()
+
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"old: {old['meta'].get('commit')}  new: {new['meta'].get('commit')}")
+
+    regressions = []
+    for name in sorted(set(old["results"]) | set(new["results"])):
+        o, n = old["results"].get(name), new["results"].get(name)
+        if not o or not n:
+            print(f"{name}: hanya ada di {'new' if n else 'old'}")
+            continue
+        print(name)
+        for m in METRICS:
+            print(f"  {m:15} {o[m]:>10} -> {n[m]:>10}  {_delta(o[m], n[m]):+6.1f}%")
+        if _delta(o["p95_ms"], n["p95_ms"]) > args.threshold:
+            regressions.append(name)
+
+    if regressions:
+        print(f"\nregresi p95 > {args.threshold}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Generator transaksi sintetis yang deterministik (seed) untuk benchmark.
+
+Merchant mengikuti kata kunci rule bawaan app.ml.rules.DEFAULT_RULES (GRAB, KFC, PLN, ...),
+nominal lognormal per kategori (banyak transaksi kecil, sedikit yang besar),
+tanggal tersebar beberapa tahun dengan lonjakan di akhir pekan dan awal bulan.
+"""
+import hashlib, random, uuid
+from datetime import datetime, timedelta
+from bson import Binary
+from typing import Dict, Iterator, List, Optional
+from app.core.search import normalize_merchant
+
+# kategori -> (merchant, median nominal Rupiah, sigma lognormal)
+PROFILES: Dict[str, tuple] = {
+    "Transport": (["GRAB", "GOJEK", "GOCAR", "BLUEBIRD", "KRL COMMUTER", "PERTAMINA"], 25_000, 0.6),
+    "Food": (["STARBUCKS", "KFC", "MCD", "WARTEG BAHARI", "NASI PADANG SEDERHANA", "BAKSO PAK KUMIS",
+              "RESTO PADANG", "KOPI KENANGAN", "JANJI JIWA", "SOTO AYAM LAMONGAN"], 45_000, 0.7),
+    "Bills": (["PLN", "TOKEN PLN", "PULSA TELKOMSEL", "TELKOM INDIHOME", "PDAM", "BPJS"], 250_000, 0.8),
+    "Groceries": (["INDOMARET", "ALFAMART", "SUPERINDO", "HYPERMART", "PASAR MINGGU"], 120_000, 0.9),
+    "Entertainment": (["NETFLIX", "SPOTIFY", "CGV", "XXI", "STEAM"], 80_000, 0.7),
+    "Other": (["TOKOPEDIA", "SHOPEE", "LAZADA", "APOTEK K24", "BUKALAPAK"], 150_000, 1.2),
+}
+WEIGHTS = {"Food": 0.35, "Transport": 0.25, "Groceries": 0.15, "Bills": 0.08, "Entertainment": 0.07, "Other": 0.10}
+WORDS = ["bayar", "pembayaran", "trx", "debit", "qris", "transfer", "ovo", "gopay", "dana", "shopeepay"]
+
+
+def generate(
+    rows: int,
+    seed: int = 42,
+    category_ids: Optional[Dict[str, str]] = None,
+    labeled_ratio: float = 0.3,
+    years: int = 4,
+    end: Optional[datetime] = None,
+) -> Iterator[Dict]:
+    """Hasil berupa dict siap insert ke koleksi transactions (format sama seperti dokumen Beanie)."""
+    rng = random.Random(seed)
+    names = list(WEIGHTS)
+    weights = [WEIGHTS[n] for n in names]
+    end = end or datetime(2025, 1, 1)
+    span = years * 365
+    category_ids = category_ids or {}
+
+    for i in range(rows):
+        cat = rng.choices(names, weights)[0]
+        merchants, median, sigma = PROFILES[cat]
+        merchant = rng.choice(merchants)
+
+        day = end - timedelta(days=rng.randrange(span))
+        if day.weekday() < 5 and rng.random() < 0.2:  # geser sebagian ke akhir pekan
+            day += timedelta(days=5 - day.weekday())
+        if rng.random() < 0.1:  # tagihan awal bulan
+            day = day.replace(day=1)
+        day = datetime(day.year, day.month, day.day)
+
+        amount = float(max(1000, round(rng.lognormvariate(0, sigma) * median, -2)))
+        labeled = category_ids.get(cat) if rng.random() < labeled_ratio else None
+        yield {
+            "user_id": None,
+            "date": day,
+            "description": f"{rng.choice(WORDS)} {merchant} {rng.randrange(1000, 9999)}",
+            "amount": amount,
+            "merchant": merchant,
+            "merchant_lc": normalize_merchant(merchant),
+            "category_id": labeled,
+            "predicted_category": None,
+            "predicted_proba": None,
+            "source": "bench",
+            "dedupe_key": hashlib.sha1(f"bench|{seed}|{i}".encode()).hexdigest(),
+            # deterministik dari seed (tanpa mengubah urutan rng); PATCH butuh revision_id di setiap dokumen
+            "revision_id": Binary.from_uuid(uuid.UUID(bytes=hashlib.md5(f"rev|{seed}|{i}".encode()).digest(), version=4)),
+            "created_at": day + timedelta(seconds=rng.randrange(86400)),
+        }
+
+
+def batches(it: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    batch: List[Dict] = []
+    for d in it:
+        batch.append(d)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def load(db, rows: int, seed: int = 42, batch_size: int = 10_000, labeled_ratio: float = 0.3) -> int:
+    """Isi db.transactions sampai `rows` dokumen (idempoten via dedupe_key). Kategori diambil dari db.categories (tenant bersama)."""
+    coll = db["transactions"]
+    have = await coll.count_documents({"source": "bench"})
+    if have >= rows:
+        return 0
+    cats = {c["name"]: str(c["_id"]) async for c in db["categories"].find({"user_id": None}, {"name": 1})}
+    inserted = 0
+    for chunk in batches(generate(rows, seed, cats, labeled_ratio), batch_size):
+        try:
+            res = await coll.insert_many(chunk, ordered=False)
+            inserted += len(res.inserted_ids)
+        except Exception as e:  # duplikat dari run sebelumnya
+            inserted += (getattr(e, "details", None) or {}).get("nInserted", 0)
+    return inserted
@@ -0,0 +1,195 @@
+"""
+Workload benchmark terhadap API yang sedang jalan + mongod lokal.
+
+    uvicorn app.main:app --port 8000                    # MONGO_DB=expense_tracker_bench
+    python -m bench.run --rows 1000000 --out bench/baselines/$(git rev-parse --short HEAD).json
+    python -m bench.compare bench/baselines/old.json bench/baselines/new.json
+
+Setiap skenario mencatat p50/p95/p99 latency dan throughput; hasil ditulis ke JSON baseline.
+"""
+import argparse, asyncio, json, random, subprocess, time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+from bench import generator
+from bench.stats import summarize
+
+TERMS = ["grab", "kopi", "indomaret", "pln", "starbucks", "shopee", "nasi", "token"]
+Request = Tuple[str, str, Dict[str, Any]]
+
+
+async def _scenario(client: httpx.AsyncClient, make: Callable[[int], Request], n: int, concurrency: int):
+    latencies: List[float] = []
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        nonlocal errors
+        method, url, kw = make(i)
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                r = await client.request(method, url, **kw)
+                if r.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return summarize(latencies, time.perf_counter() - t0, errors)
+
+
+async def _cursor_walk(client: httpx.AsyncClient, pages: int):
+    # pagination dalam: ikuti next_cursor berurutan (tidak bisa paralel)
+    latencies: List[float] = []
+    errors, cursor = 0, None
+    t_all = time.perf_counter()
+    for _ in range(pages):
+        params = {"limit": 50, "count": "none"}
+        if cursor:
+            params["cursor"] = cursor
+        t0 = time.perf_counter()
+        r = await client.get("/transactions", params=params)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+        if r.status_code >= 400:
+            errors += 1
+            break
+        cursor = r.json().get("next_cursor")
+        if not cursor:
+            break
+    return summarize(latencies, time.perf_counter() - t_all, errors)
+
+
+async def _retrain(client: httpx.AsyncClient, runs: int, timeout: float):
+    durations: List[float] = []
+    errors = 0
+    t_all = time.perf_counter()
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        r = await client.post("/model/retrain")
+        if r.status_code != 202:
+            errors += 1
+            continue
+        job_id = r.json()["job_id"]
+        while time.perf_counter() - t0 < timeout:
+            job = (await client.get(f"/model/jobs/{job_id}")).json()
+            if job["status"] in ("done", "failed"):
+                errors += job["status"] == "failed"
+                break
+            await asyncio.sleep(0.5)
+        durations.append((time.perf_counter() - t0) * 1000.0)
+    return summarize(durations, time.perf_counter() - t_all, errors)
+
+
+def _bulk_payload(rng: random.Random, size: int) -> Dict[str, Any]:
+    rows = generator.generate(size, seed=rng.randrange(1 << 30), labeled_ratio=0.0)
+    return {"items": [
+        {"date": r["date"].date().isoformat(), "description": r["description"],
+         "amount": r["amount"], "merchant": r["merchant"], "source": "bench-write"}
+        for r in rows
+    ]}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+async def _wait_ready(client: httpx.AsyncClient, timeout: float = 120.0):
+    # index & model dibangun di background setelah boot; jangan ukur latency sebelum worker siap
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise SystemExit("API belum ready setelah %.0fs" % timeout)
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base-url", default="http://localhost:8000")
+    ap.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    ap.add_argument("--mongo-db", default="expense_tracker_bench", help="harus sama dengan MONGO_DB milik API")
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--requests", type=int, default=500, help="jumlah request per skenario baca")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--skip-load", action="store_true")
+    ap.add_argument("--skip-writes", action="store_true")
+    ap.add_argument("--out", default="bench/baseline.json")
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120.0, limits=limits) as client:
+        await _wait_ready(client)
+        if not args.skip_load:
+            await client.post("/seed/categories-default")
+            db = AsyncIOMotorClient(args.mongo_uri)[args.mongo_db]
+            t0 = time.perf_counter()
+            inserted = await generator.load(db, args.rows, args.seed)
+            print(f"loaded {inserted} rows in {time.perf_counter() - t0:.1f}s")
+            await client.post("/reports/rollup/rebuild")
+
+        def date_range(i: int):
+            end = date(2025, 1, 1) - timedelta(days=rng.randrange(365 * 3))
+            return {"start": (end - timedelta(days=rng.choice([7, 30, 90, 365]))).isoformat(), "end": end.isoformat()}
+
+        n, c = args.requests, args.concurrency
+        reads: Dict[str, Callable[[int], Request]] = {
+            "list_first_page": lambda i: ("GET", "/transactions", {"params": {"limit": 50}}),
+            "list_deep_page": lambda i: ("GET", "/transactions", {"params": {"limit": 50, "page": 200}}),
+            "search_contains": lambda i: ("GET", "/transactions", {"params": {"q": TERMS[i % len(TERMS)], "search": "contains"}}),
+            "search_text": lambda i: ("GET", "/transactions", {"params": {"q": TERMS[i % len(TERMS)], "search": "text"}}),
+            "search_prefix": lambda i: ("GET", "/transactions", {"params": {"q": TERMS[i % len(TERMS)][:3], "search": "prefix"}}),
+            "labeling_unlabeled": lambda i: ("GET", "/labeling/unlabeled", {"params": {"limit": 50}}),
+            "reports_summary": lambda i: ("GET", "/reports/summary", {"params": date_range(i)}),
+            "reports_summary_repeat": lambda i: ("GET", "/reports/summary", {"params": {"start": "2024-01-01", "end": "2024-12-31"}}),
+            "reports_daily": lambda i: ("GET", "/reports/daily", {"params": date_range(i)}),
+            "categories_summary": lambda i: ("GET", "/categories/summary", {}),
+            "predict": lambda i: ("POST", "/model/predict", {"json": [
+                {"description": f"bayar {TERMS[(i + k) % len(TERMS)]}", "merchant": None} for k in range(5)]}),
+        }
+
+        results: Dict[str, Any] = {}
+        for name, make in reads.items():
+            results[name] = await _scenario(client, make, n, c)
+            print(name, results[name])
+        results["list_cursor_walk"] = await _cursor_walk(client, min(n, 200))
+        print("list_cursor_walk", results["list_cursor_walk"])
+
+        if not args.skip_writes:
+            payloads = [_bulk_payload(rng, 500) for _ in range(20)]
+            results["bulk_insert_500"] = await _scenario(
+                client, lambda i: ("POST", "/transactions/bulk", {"json": payloads[i]}), len(payloads), 4)
+            results["retrain"] = await _retrain(client, 1, timeout=1800)
+            for name in ("bulk_insert_500", "retrain"):
+                print(name, results[name])
+
+    baseline = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "base_url": args.base_url,
+            "rows": args.rows,
+            "seed": args.seed,
+            "requests": n,
+            "concurrency": c,
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2)
+    print(f"baseline -> {args.out}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+"""
+Benchmark mode pencarian (contains / text / prefix) di koleksi transactions.
+
+    python -m bench.search_modes --rows 1000000 --queries 200
+
+Butuh mongod lokal. Data sintetis ditulis ke DB terpisah (default expense_tracker_bench)
+dan index dibuat sama seperti app.core.db.ensure_indexes (berawalan user_id, query di tenant bersama).
+"""
+import argparse, asyncio, json, statistics, time
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.search import SEARCH_MODES, TEXT_SCORE_SORT, search_criteria
+from bench import generator
+from bench.stats import percentile
+
+TERMS = ["grab", "starb", "token", "nasi", "indo", "kopi", "shopee", "pln"]
+
+
+async def _ensure_indexes(coll):
+    await coll.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+    await coll.create_index([("user_id", 1), ("merchant_lc", 1)])
+    await coll.create_index([("user_id", 1), ("description", "text"), ("merchant", "text")],
+                            name="text_user_desc_merchant")
+
+
+def _criteria(term: str, mode: str):
+    crit, text_rank = search_criteria(term, mode)
+    return {"user_id": None, **crit}, text_rank
+
+
+async def _run_mode(coll, mode: str, queries: int, limit: int):
+    latencies = []
+    for i in range(queries):
+        crit, text_rank = _criteria(TERMS[i % len(TERMS)], mode)
+        sort = [TEXT_SCORE_SORT, ("_id", -1)] if text_rank else [("created_at", -1), ("_id", -1)]
+        t0 = time.perf_counter()
+        await coll.find(crit).sort(sort).limit(limit).to_list(length=limit)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+
+    crit, text_rank = _criteria(TERMS[0], mode)
+    sort = [TEXT_SCORE_SORT, ("_id", -1)] if text_rank else [("created_at", -1), ("_id", -1)]
+    plan = await coll.find(crit).sort(sort).limit(limit).explain()
+    stats = plan.get("executionStats", {})
+    return {
+        "mode": mode,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.mean(latencies), 2),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+    }
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--uri", default="mongodb://localhost:27017")
+    ap.add_argument("--db", default="expense_tracker_bench")
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--limit", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    db = AsyncIOMotorClient(args.uri)[args.db]
+    coll = db["transactions"]
+    await generator.load(db, args.rows, args.seed)
+    await _ensure_indexes(coll)
+    results = [await _run_mode(coll, m, args.queries, args.limit) for m in SEARCH_MODES]
+    print(json.dumps({"rows": await coll.estimated_document_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,21 @@
+from typing import Dict, List
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def summarize(latencies_ms: List[float], wall_seconds: float, errors: int = 0) -> Dict[str, float]:
+    n = len(latencies_ms)
+    return {
+        "requests": n,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "max_ms": round(max(latencies_ms), 2) if n else 0.0,
+        "throughput_rps": round(n / wall_seconds, 1) if wall_seconds > 0 else 0.0,
+    }
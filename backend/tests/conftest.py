@@ -0,0 +1,106 @@
+import asyncio
+import pytest
+
+
+@pytest.fixture
+def run_db():
+    """Jalankan `scenario(db)` di atas Mongo in-memory (mongomock) dengan semua Document Beanie terdaftar."""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from beanie import init_beanie
+    from app.core.db import DOCUMENT_MODELS
+    _patch_mongomock_bulk()
+    _patch_mongomock_iso_week()
+
+    async def main(scenario):
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        await init_beanie(database=db, document_models=DOCUMENT_MODELS)
+        return await scenario(db)
+
+    return lambda scenario: asyncio.run(main(scenario))
+
+
+def _patch_mongomock_bulk():
+    # pymongo >= 4.11 mengirim argumen `sort` ke builder bulk; mongomock 4.3 belum mengenalnya
+    from mongomock.collection import BulkOperationBuilder
+    for name in ("add_update", "add_replace"):
+        method = getattr(BulkOperationBuilder, name)
+        if getattr(method, "_drops_sort", False):
+            continue
+
+        def patched(self, *args, sort=None, _method=method, **kwargs):
+            return _method(self, *args, **kwargs)
+
+        patched._drops_sort = True
+        setattr(BulkOperationBuilder, name, patched)
+
+
+def _patch_mongomock_iso_week():
+    # mongomock 4.3 belum punya $isoWeekYear/$isoWeek dan $dateFromParts berbasis minggu ISO (dipakai analytics)
+    from datetime import datetime
+    from mongomock import aggregate
+    original = aggregate._Parser._handle_date_operator
+    if getattr(original, "_iso_week", False):
+        return
+
+    def patched(self, operator, values):
+        if operator in ("$isoWeekYear", "$isoWeek"):
+            year, week, _ = self.parse(values).isocalendar()
+            return year if operator == "$isoWeekYear" else week
+        if operator == "$dateFromParts" and isinstance(values, dict) and "isoWeekYear" in values:
+            parts = {k: self.parse(v) for k, v in values.items()}
+            return datetime.fromisocalendar(parts["isoWeekYear"], parts.get("isoWeek", 1), parts.get("isoDayOfWeek", 1))
+        return original(self, operator, values)
+
+    patched._iso_week = True
+    aggregate._Parser._handle_date_operator = patched
+    for op in ("$isoWeekYear", "$isoWeek"):
+        if op not in aggregate.date_operators:
+            aggregate.date_operators.append(op)
+
+
+@pytest.fixture
+def run_api(run_db):
+    """Seperti run_db, tapi `scenario(db, client)` juga dapat httpx client ke app (tanpa lifespan)."""
+    httpx = pytest.importorskip("httpx")
+    from app.main import app
+
+    async def with_client(db, scenario):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await scenario(db, client)
+
+    return lambda scenario: run_db(lambda db: with_client(db, scenario))
+
+
+@pytest.fixture
+def around_bulk_write(monkeypatch):
+    """`around_bulk_write(module, before=, after=)`: writer lain menulis tepat sebelum / sesudah bulk_write modul itu."""
+    def install(module, before=None, after=None):
+        get_collection = module.get_collection
+
+        class Coll:
+            def __init__(self, model):
+                self._coll = get_collection(model)
+
+            def __getattr__(self, name):
+                return getattr(self._coll, name)
+
+            async def bulk_write(self, ops, **kwargs):
+                if before:
+                    await before(self._coll)
+                res = await self._coll.bulk_write(ops, **kwargs)
+                if after:
+                    await after(self._coll)
+                return res
+
+        monkeypatch.setattr(module, "get_collection", Coll)
+
+    return install
+
+
+@pytest.fixture
+def model_dir(monkeypatch, tmp_path):
+    """Artefak model ditulis ke direktori sementara, bukan app/ml/models."""
+    from app.ml import model_store
+    monkeypatch.setattr(model_store, "MODEL_DIR", str(tmp_path))
+    return tmp_path
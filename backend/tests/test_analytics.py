@@ -0,0 +1,60 @@
+from datetime import date
+
+H = {"X-User-Id": "u1"}
+ROWS = [  # (tanggal, merchant, amount, kategori)
+    ("2026-05-04", "Kopi Kenangan", 30, "food"),
+    ("2026-05-04", "Grab", 20, "transport"),
+    ("2026-05-06", "kopi kenangan", 50, "food"),
+    ("2026-05-12", "PLN", 200, None),
+    ("2026-05-31", "Grab", 25, "transport"),
+    ("2026-06-02", "Grab", 999, "transport"),  # di luar periode
+    ("2026-04-20", "PLN", 100, None),          # periode sebelumnya
+    ("2026-04-21", "Grab", 40, "transport"),   # periode sebelumnya
+]
+
+
+async def _analytics(client, **params):
+    for d, m, a, c in ROWS:
+        await client.post("/transactions", headers=H, json={
+            "date": d, "description": m, "merchant": m, "amount": a, "category_id": c})
+    await client.post("/transactions", headers={"X-User-Id": "u2"}, json={
+        "date": "2026-05-05", "description": "x", "merchant": "Grab", "amount": 7777})
+    resp = await client.get("/reports/analytics", headers=H, params=params)
+    assert resp.status_code == 200, resp.text
+    return resp.json()
+
+
+def test_analytics_buckets_and_top_merchants(run_api):
+    out = run_api(lambda db, client: _analytics(client, start="2026-05-04", end="2026-05-31", top=2))
+
+    assert out["range"]["previous_start"] == "2026-04-06" and out["range"]["previous_end"] == "2026-05-03"
+    totals = out["totals"]
+    assert (totals["total"], totals["count"], totals["previous_total"], totals["previous_count"]) == (325.0, 5, 140.0, 2)
+    assert totals["delta"] == 185.0 and totals["delta_pct"] == 132.14
+
+    cats = {c["category_id"]: (c["total"], c["count"], c["previous_total"]) for c in out["categories"]}
+    assert cats == {None: (200.0, 1, 100.0), "food": (80.0, 2, 0.0), "transport": (45.0, 2, 40.0)}
+    assert [c["category_id"] for c in out["categories"]] == [None, "food", "transport"]
+
+    assert [(d["date"], d["total"]) for d in out["daily"]] == [
+        ("2026-05-04", 50.0), ("2026-05-06", 50.0), ("2026-05-12", 200.0), ("2026-05-31", 25.0)]
+    assert [(w["week_start"], w["count"]) for w in out["weekly"]] == [
+        ("2026-05-04", 3), ("2026-05-11", 1), ("2026-05-25", 1)]
+    assert out["monthly"] == [{"month": "2026-05", "total": 325.0, "count": 5}]
+    # merchant dikelompokkan lewat merchant_lc (huruf besar/kecil digabung), diurutkan total menurun
+    assert [(m["merchant"].lower(), m["total"], m["count"]) for m in out["top_merchants"]] == [
+        ("pln", 200.0, 1), ("kopi kenangan", 80.0, 2)]
+
+
+def test_analytics_without_range_has_no_comparison(run_api):
+    out = run_api(lambda db, client: _analytics(client))
+    assert out["totals"]["count"] == len(ROWS) and out["totals"]["previous_total"] is None
+    assert out["categories"][0]["delta"] is None
+
+
+def test_analytics_rejects_inverted_range(run_api):
+    async def scenario(db, client):
+        return (await client.get("/reports/analytics", headers=H,
+                                 params={"start": date(2026, 5, 2), "end": date(2026, 5, 1)})).status_code
+
+    assert run_api(scenario) == 400
@@ -0,0 +1,39 @@
+import asyncio
+import pytest
+from app.ml.batcher import MicroBatcher
+
+
+def _batcher(calls, max_batch=64):
+    def fn(key, texts):
+        calls.append((key, list(texts)))
+        if key == "boom":
+            raise RuntimeError("model rusak")
+        return None if key == "empty" else [f"{key}:{t}" for t in texts]
+    return MicroBatcher(fn, max_batch=max_batch, max_wait_ms=20)
+
+
+def test_concurrent_requests_share_one_call_per_key():
+    calls = []
+
+    async def scenario():
+        b = _batcher(calls)
+        return await asyncio.gather(b.submit(["a", "b"], "u1"), b.submit(["c"], "u1"),
+                                    b.submit(["d"], "u2"), b.submit(["e"], "empty"))
+
+    results = asyncio.run(scenario())
+    assert results == [["u1:a", "u1:b"], ["u1:c"], ["u2:d"], None]
+    assert sorted(calls) == [("empty", ["e"]), ("u1", ["a", "b", "c"]), ("u2", ["d"])]
+
+
+def test_batch_is_cut_at_max_batch_and_errors_reach_callers():
+    calls = []
+
+    async def scenario():
+        b = _batcher(calls, max_batch=2)
+        ok = await asyncio.gather(*(b.submit([str(i)], "u1") for i in range(5)))
+        with pytest.raises(RuntimeError):
+            await b.submit(["x"], "boom")
+        return ok
+
+    assert asyncio.run(scenario()) == [[f"u1:{i}"] for i in range(5)]
+    assert max(len(texts) for key, texts in calls if key == "u1") == 2
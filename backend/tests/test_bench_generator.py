@@ -0,0 +1,24 @@
+from bench import generator
+
+
+def test_same_seed_gives_same_rows():
+    a, b = list(generator.generate(200, seed=7)), list(generator.generate(200, seed=7))
+    assert a == b
+    assert a != list(generator.generate(200, seed=8))
+    assert len({d["dedupe_key"] for d in a}) == len({d["revision_id"] for d in a}) == 200
+    assert all(d["amount"] >= 1000 and d["merchant_lc"] == d["merchant"].lower() for d in a)
+
+
+def test_load_is_idempotent_and_rows_are_patchable(run_api):
+    async def scenario(db, client):
+        first = await generator.load(db, 50, seed=3, batch_size=16)
+        again = await generator.load(db, 50, seed=3, batch_size=16)
+        doc = await db["transactions"].find_one({"source": "bench"})
+        got = (await client.get(f"/transactions/{doc['_id']}")).json()
+        patched = await client.patch(f"/transactions/{doc['_id']}",
+                                     json={"amount": 1234.0, "revision_id": got["revision_id"]})
+        return first, again, got["revision_id"], patched.status_code
+
+    first, again, rev, status = run_api(scenario)
+    assert (first, again) == (50, 0)
+    assert rev is not None and status == 200
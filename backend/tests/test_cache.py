@@ -0,0 +1,56 @@
+import asyncio
+from starlette.requests import Request
+from app.core import cache
+from app.core.cache import MemoryBackend, MongoBackend, ResponseCache
+from app.core.config import settings
+from app.ml.registry import CategoryMapCache
+from app.models.category import Category
+
+
+def _request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/reports/summary", "query_string": b"", "headers": headers})
+
+
+async def _summary():
+    return {"total": 1}
+
+
+def test_etag_from_previous_process_is_not_reused():
+    async def scenario():
+        before = ResponseCache(MemoryBackend(8))
+        first = await before.respond(_request(), "reports.summary", _summary, "u1")
+        etag = first.headers["etag"]
+
+        same = await before.respond(_request(etag), "reports.summary", _summary, "u1")
+        # restart / worker lain: generation mulai lagi dari 0, tapi epoch berbeda
+        after = ResponseCache(MemoryBackend(8))
+        other = await after.respond(_request(etag), "reports.summary", _summary, "u1")
+        return same.status_code, other.status_code, other.headers["etag"] != etag
+
+    assert asyncio.run(scenario()) == (304, 200, True)
+
+
+def test_write_invalidates_etag():
+    async def scenario():
+        cache = ResponseCache(MemoryBackend(8))
+        etag = (await cache.respond(_request(), "reports.summary", _summary, "u1")).headers["etag"]
+        await cache.invalidate("u1")
+        return (await cache.respond(_request(etag), "reports.summary", _summary, "u1")).status_code
+
+    assert asyncio.run(scenario()) == 200
+
+
+def test_category_map_follows_shared_generation(run_db, monkeypatch):
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_GENERATION_TTL", 0.0)
+    monkeypatch.setattr(cache.response_cache, "backend", MongoBackend())
+
+    async def scenario(db):
+        names = CategoryMapCache(8)  # cache di worker ini
+        before = await names.get("u1")
+        # worker lain membuat kategori lalu menaikkan generation bersama; invalidate lokal di sini tidak terjadi
+        await Category(name="Food", user_id="u1").insert()
+        await MongoBackend().bump("u1")
+        return before, sorted((await names.get("u1")).values())
+
+    assert run_db(scenario) == ({}, ["Food"])
@@ -0,0 +1,61 @@
+import pytest
+from pymongo.errors import OperationFailure
+from app.core import db as core_db
+
+H = {"X-User-Id": "u1"}
+
+
+@pytest.fixture
+def standalone(monkeypatch):
+    # mongomock tidak punya session; tiru mongod standalone supaya jalur fallback run_in_transaction dipakai
+    def start_session(*a, **kw):
+        raise OperationFailure("Transaction numbers are only allowed on a replica set", code=core_db._ILLEGAL_OPERATION)
+
+    monkeypatch.setattr("mongomock_motor.AsyncMongoMockClient.start_session", start_session, raising=False)
+
+
+async def _setup(client):
+    seeded = [(await client.post("/seed/categories-default", headers=H)).json() for _ in range(2)]
+    cats = {c["name"]: c["_id"] for c in (await client.get("/categories", headers=H)).json()["items"]}
+    for day, cid in [(1, "Food"), (2, "Food"), (2, "Transport"), (3, None)]:
+        await client.post("/transactions", headers=H, json={
+            "date": f"2026-03-0{day}", "description": "x", "amount": 10, "category_id": cats.get(cid)})
+    return seeded, cats
+
+
+async def _summary(client):
+    return {c["name"]: c["count"] for c in (await client.get("/categories/summary", headers=H)).json()["items"]}
+
+
+def test_seed_is_idempotent_and_summary_counts(run_api):
+    async def scenario(db, client):
+        seeded, cats = await _setup(client)
+        return seeded, len(cats), await _summary(client)
+
+    seeded, n_cats, summary = run_api(scenario)
+    assert [s["inserted"] for s in seeded] == [6, 0] and n_cats == 6
+    assert summary == {"Food": 2, "Transport": 1, "Bills": 0, "Entertainment": 0,
+                       "Groceries": 0, "Other": 0, "Uncategorized": 1}
+
+
+def test_force_delete_detaches_transactions(run_api, standalone):
+    async def scenario(db, client):
+        _, cats = await _setup(client)
+        refused = await client.delete(f"/categories/{cats['Food']}", headers=H)
+        deleted = (await client.delete(f"/categories/{cats['Food']}", headers=H, params={"force": "true"})).json()
+        left = await db["transactions"].count_documents({"category_id": cats["Food"]})
+        return refused.status_code, deleted, left, await _summary(client)
+
+    refused, deleted, left, summary = run_api(scenario)
+    assert refused == 400
+    assert deleted == {"deleted": True, "detached": 2} and left == 0
+    assert "Food" not in summary and summary["Uncategorized"] == 3 and summary["Transport"] == 1
+
+
+def test_delete_other_users_category_is_404(run_api):
+    async def scenario(db, client):
+        _, cats = await _setup(client)
+        return (await client.delete(f"/categories/{cats['Food']}", headers={"X-User-Id": "u2"},
+                                    params={"force": "true"})).status_code
+
+    assert run_api(scenario) == 404
@@ -0,0 +1,23 @@
+from app.core.config import settings
+
+H = {"X-User-Id": "u1"}
+ITEMS = [{"date": "2026-01-05", "description": "GRAB CAR 0812", "amount": 30000.0},
+         {"date": "2026-01-05", "description": "transfer arisan", "amount": 50000.0}]
+
+
+def test_bulk_create_classifies_when_asked(run_api, model_dir, monkeypatch):
+    monkeypatch.setattr(settings, "AUTO_CATEGORY_THRESHOLD", 0.6)
+
+    async def scenario(db, client):
+        await client.post("/seed/categories-default", headers=H)
+        transport = await db["categories"].find_one({"user_id": "u1", "name": "Transport"})
+        plain = (await client.post("/transactions/bulk", headers=H, json={"items": ITEMS[:1]})).json()
+        auto = (await client.post("/transactions/bulk", headers=H, params={"classify": True},
+                                  json={"items": ITEMS})).json()
+        rows = {str(d["_id"]): d for d in await db["transactions"].find({}).to_list(length=None)}
+        return str(transport["_id"]), [(rows[i]["predicted_category"], rows[i]["category_id"])
+                                       for i in plain["ids"] + auto["ids"]]
+
+    transport, rows = run_api(scenario)
+    # tanpa model, rule bawaan (GRAB -> Transport, confidence 0.65) yang mengisi prediksi
+    assert rows == [(None, None), (transport, transport), (None, None)]
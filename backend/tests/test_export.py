@@ -0,0 +1,69 @@
+import csv, io, json
+import pytest
+from app.core.config import settings
+
+H = {"X-User-Id": "u1"}
+
+
+async def _seed(client, n=7):
+    for i in range(n):
+        await client.post("/transactions", headers=H, json={
+            "date": f"2026-04-{i + 1:02d}", "description": f"belanja, \"toko\" {i}", "amount": 1000 + i})
+    await client.post("/transactions", headers={"X-User-Id": "u2"}, json={
+        "date": "2026-04-01", "description": "lain", "amount": 5})
+
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    monkeypatch.setattr(settings, "EXPORT_BATCH", 3)
+
+
+def test_csv_export_streams_every_row_once(run_api, small_batches):
+    async def scenario(db, client):
+        await _seed(client)
+        return await client.get("/export/transactions", headers=H, params={"sort": "date", "fields": "date,amount,description"})
+
+    resp = run_api(scenario)
+    assert resp.headers["content-type"].startswith("text/csv")
+    assert resp.headers["content-disposition"].startswith('attachment; filename="transactions-')
+    rows = list(csv.DictReader(io.StringIO(resp.text)))
+    assert list(rows[0]) == ["id", "date", "description", "amount"]
+    assert [r["date"] for r in rows] == [f"2026-04-{i:02d}" for i in range(1, 8)]
+    assert rows[0]["description"] == 'belanja, "toko" 0' and len({r["id"] for r in rows}) == 7
+
+
+def test_ndjson_export_matches_list_filter(run_api, small_batches):
+    async def scenario(db, client):
+        await _seed(client)
+        exported = await client.get("/export/transactions", headers=H,
+                                    params={"format": "ndjson", "start": "2026-04-03", "end": "2026-04-05"})
+        listed = await client.get("/transactions", headers=H, params={"start": "2026-04-03", "end": "2026-04-05"})
+        return exported.text, listed.json()
+
+    text, listed = run_api(scenario)
+    rows = [json.loads(line) for line in text.splitlines()]
+    assert [r["id"] for r in rows] == [it["id"] for it in listed["items"]]
+    assert {r["user_id"] for r in rows} == {"u1"} and rows[0]["date"] == listed["items"][0]["date"]
+
+
+def test_daily_report_export_from_rollup(run_api):
+    async def scenario(db, client):
+        await _seed(client, 2)
+        return await client.get("/export/reports/daily", headers=H)
+
+    rows = list(csv.DictReader(io.StringIO(run_api(scenario).text)))
+    assert [(r["date"], r["category_name"], r["total"], r["count"], r["min"], r["max"]) for r in rows] == [
+        ("2026-04-01", "Uncategorized", "1000.0", "1", "1000.0", "1000.0"),
+        ("2026-04-02", "Uncategorized", "1001.0", "1", "1001.0", "1001.0"),
+    ]
+
+
+def test_columnar_formats(run_api):
+    pa = pytest.importorskip("pyarrow")
+
+    async def scenario(db, client):
+        await _seed(client)
+        return await client.get("/export/transactions", headers=H, params={"format": "arrow", "sort": "date"})
+
+    table = pa.ipc.open_stream(run_api(scenario).content).read_all()
+    assert table.num_rows == 7 and table.column("amount").to_pylist()[0] == 1000.0
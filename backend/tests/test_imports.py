@@ -0,0 +1,37 @@
+CSV = (
+    "date,amount,description\n"
+    "2026-01-05,25000,Kopi Susu\n"
+    "2026-01-06,10000,Roti\n"
+    "2026-01-05,25000,kopi  susu\n"  # sama setelah normalisasi, dan tanggalnya tidak terurut
+)
+
+OFX = (
+    "<OFX><STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20260105<TRNAMT>-25000<NAME>KOPI</STMTTRN>"
+    "<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20260106<TRNAMT>5000000<NAME>GAJI</STMTTRN></OFX>"
+)
+
+
+async def _import(client, name, body):
+    r = await client.post("/transactions/import", headers={"X-User-Id": "u1"},
+                          files={"file": (name, body.encode(), "text/plain")})
+    return r.json()
+
+
+def test_reimport_is_idempotent_and_keeps_same_day_repeats(run_api):
+    async def scenario(db, client):
+        await db["transactions"].create_index([("user_id", 1), ("dedupe_key", 1)], unique=True)
+        first = await _import(client, "bank.csv", CSV)
+        again = await _import(client, "bank.csv", CSV)
+        return first["inserted"], again["inserted"], again["duplicates"], \
+            await db["transactions"].count_documents({"user_id": "u1"})
+
+    assert run_api(scenario) == (3, 0, 3, 3)
+
+
+def test_ofx_credits_are_skipped(run_api):
+    async def scenario(db, client):
+        out = await _import(client, "bank.ofx", OFX)
+        doc = await db["transactions"].find_one({"user_id": "u1"})
+        return out["inserted"], out["skipped"], doc["amount"], doc["source"]
+
+    assert run_api(scenario) == (1, 1, 25000.0, "ofx")
@@ -0,0 +1,81 @@
+import asyncio, time
+import pytest
+from datetime import datetime
+from app.core.config import settings
+from app.ml import jobs
+
+H1, H2 = {"X-User-Id": "u1"}, {"X-User-Id": "u2"}
+
+
+async def _seed_labeled(db, n=12):
+    await db["transactions"].insert_many([
+        {"user_id": "u1", "date": datetime(2026, 1, 5), "description": f"kopi {i}", "amount": 10.0,
+         "category_id": "food"} for i in range(n)
+    ])
+
+
+def test_job_status_is_shared_through_mongo(run_api, monkeypatch):
+    monkeypatch.setattr(jobs, "_spawn", lambda coro: coro.close())  # training tidak dijalankan di test
+
+    async def scenario(db, client):
+        await db["retrain_jobs"].create_index([("user_id", 1), ("active", 1)], unique=True,
+                                              partialFilterExpression={"active": True})
+        await _seed_labeled(db)
+        job_id = (await client.post("/model/retrain", headers=H1)).json()["job_id"]
+        # worker lain: tidak ada state di memori, hanya dokumen di retrain_jobs
+        seen = (await client.get(f"/model/jobs/{job_id}", headers=H1)).json()
+        second = await client.post("/model/retrain", headers=H1)
+        other = await client.get(f"/model/jobs/{job_id}", headers=H2)
+        raced = await jobs.submit_retrain("u1", "full", 12)  # lolos cek active_job, ditolak index unik
+        return seen["status"], "active" in seen, second.status_code, other.status_code, raced
+
+    assert run_api(scenario) == ("queued", False, 409, 404, None)
+
+
+def test_stale_running_job_releases_the_slot(run_db, monkeypatch):
+    monkeypatch.setattr(jobs, "_spawn", lambda coro: coro.close())
+
+    async def scenario(db):
+        job = await jobs.submit_retrain("u1", "full", 12)
+        await db["retrain_jobs"].update_one(
+            {"_id": job["job_id"]}, {"$set": {"updated_at": time.time() - settings.JOB_STALE_SECONDS - 1}})
+        return await jobs.active_job("u1"), (await jobs.get_job(job["job_id"]))["status"]
+
+    assert run_db(scenario) == (None, "failed")
+
+
+def test_finished_jobs_are_pruned_per_user(run_db, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_HISTORY", 2)
+
+    async def scenario(db):
+        await db["retrain_jobs"].insert_many(
+            [{"_id": f"j{i}", "user_id": "u1", "finished_at": float(i)} for i in range(4)]
+            + [{"_id": "other", "user_id": "u2", "finished_at": 0.0}])
+        await jobs._prune_jobs("u1")
+        return sorted(d["_id"] for d in await db["retrain_jobs"].find({}).to_list(length=None))
+
+    assert run_db(scenario) == ["j2", "j3", "other"]
+
+
+def test_retrain_job_runs_to_done(run_api, monkeypatch, tmp_path):
+    pytest.importorskip("sklearn")
+    from app.ml import model_store
+    monkeypatch.setattr(model_store, "MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(jobs, "_get_pool", lambda: None)  # executor default (thread) menggantikan process pool
+
+    async def scenario(db, client):
+        await db["transactions"].insert_many([
+            {"user_id": "u1", "date": datetime(2026, 1, 5), "description": f"{w} {i}", "amount": 10.0,
+             "category_id": cid} for i in range(10) for w, cid in (("kopi", "food"), ("ojek", "transport"))
+        ])
+        job_id = (await client.post("/model/retrain", headers=H1)).json()["job_id"]
+        for _ in range(200):
+            job = (await client.get(f"/model/jobs/{job_id}", headers=H1)).json()
+            if job["status"] in ("done", "failed"):
+                break
+            await asyncio.sleep(0.05)
+        return job, await jobs.active_job("u1")
+
+    job, running = run_api(scenario)
+    assert (job["status"], job["trained_on_rows"], sorted(job["classes"]), running) == \
+        ("done", 20, ["food", "transport"], None)
@@ -0,0 +1,51 @@
+from datetime import datetime
+from app.core import rollup
+from app.core.db import new_revision
+from app.routers import labeling
+
+H = {"X-User-Id": "u1"}
+DAY = datetime(2026, 1, 5)
+
+
+async def _seed(db, client, n=3):
+    food = (await client.post("/categories", headers=H, json={"name": "Food"})).json()["id"]
+    foreign = (await client.post("/categories", headers={"X-User-Id": "u2"}, json={"name": "Food"})).json()["id"]
+    docs = [{"user_id": "u1", "date": DAY, "description": f"kopi {i}", "amount": 10.0 * (i + 1),
+             "category_id": None, "revision_id": new_revision()} for i in range(n)]
+    await db["transactions"].insert_many(docs)
+    await rollup.add("u1", [(DAY, None, d["amount"]) for d in docs])
+    return food, foreign, [str(d["_id"]) for d in docs]
+
+
+def test_bulk_label_rejects_foreign_category(run_api):
+    async def scenario(db, client):
+        food, foreign, ids = await _seed(db, client)
+        out = (await client.post("/labeling/bulk", headers=H, json={"items": [
+            {"tx_id": ids[0], "category_id": food}, {"tx_id": ids[1], "category_id": foreign},
+        ]})).json()
+        single = await client.post(f"/labeling/{ids[2]}", headers=H, json={"category_id": foreign})
+        labeled = await db["transactions"].count_documents({"category_id": {"$ne": None}})
+        return out["updated"], out["rejected"], out["invalid_category_ids"] == [foreign], single.status_code, \
+            labeled, (await rollup.check({"user_id": "u1"}))["ok"]
+
+    assert run_api(scenario) == (1, 1, True, 400, 1, True)
+
+
+def test_concurrent_patch_is_not_overwritten(run_api, around_bulk_write):
+    async def scenario(db, client):
+        food, _, ids = await _seed(db, client)
+        other = (await client.post("/categories", headers=H, json={"name": "Fun"})).json()["id"]
+        tx = await db["transactions"].find_one({"description": "kopi 0"})
+
+        async def patch_in_between(coll):
+            # PATCH lain masuk setelah labeling membaca dokumen, sebelum bulk_write-nya
+            await client.patch(f"/transactions/{tx['_id']}", headers=H, json={"category_id": other})
+
+        around_bulk_write(labeling, before=patch_in_between)
+        out = (await client.post("/labeling/bulk", headers=H, json={"items": [
+            {"tx_id": ids[0], "category_id": food}, {"tx_id": ids[1], "category_id": food},
+        ]})).json()
+        kept = (await db["transactions"].find_one({"_id": tx["_id"]}))["category_id"]
+        return out["updated"], out["conflicts"], kept == other, (await rollup.check({"user_id": "u1"}))["ok"]
+
+    assert run_api(scenario) == (1, 1, True, True)
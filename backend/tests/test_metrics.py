@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+from app.core import monitoring
+from app.core.config import settings
+from app.core.metrics import http_request_seconds
+
+
+def test_metrics_exposes_route_latency_by_template(run_api):
+    before = http_request_seconds.snapshot("GET", "/transactions/{tx_id}", "404")["count"]
+
+    async def scenario(db, client):
+        for _ in range(3):
+            await client.get("/transactions/000000000000000000000000", headers={"X-User-Id": "u1"})
+        return await client.get("/metrics")
+
+    resp = run_api(scenario)
+    assert resp.status_code == 200 and resp.headers["content-type"].startswith("text/plain")
+    assert http_request_seconds.snapshot("GET", "/transactions/{tx_id}", "404")["count"] == before + 3
+    # label route memakai template, bukan id konkret
+    assert 'http_request_duration_seconds_count{method="GET",route="/transactions/{tx_id}",status="404"}' in resp.text
+    assert "000000000000000000000000" not in resp.text
+    assert "# TYPE mongo_command_duration_seconds histogram" in resp.text
+
+
+def test_command_listener_records_duration_and_slow_queries(monkeypatch):
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 50)
+    monkeypatch.setattr(settings, "SLOW_QUERY_EXPLAIN", False)
+    listener = monitoring.CommandMetrics()
+    fast_before = monitoring.mongo_command_seconds.snapshot("find", "metrics_test")["count"]
+    slow_before = monitoring.slow_queries.get("find", "metrics_test")
+
+    for request_id, micros in ((1, 2_000), (2, 80_000)):
+        listener.started(SimpleNamespace(command_name="find", connection_id="c", request_id=request_id,
+                                         command={"find": "metrics_test", "filter": {"user_id": "u1"}}))
+        listener.succeeded(SimpleNamespace(connection_id="c", request_id=request_id, duration_micros=micros))
+    listener.started(SimpleNamespace(command_name="ping", connection_id="c", request_id=3, command={"ping": 1}))
+    listener.succeeded(SimpleNamespace(connection_id="c", request_id=3, duration_micros=90_000))
+
+    assert monitoring.mongo_command_seconds.snapshot("find", "metrics_test")["count"] == fast_before + 2
+    assert monitoring.slow_queries.get("find", "metrics_test") == slow_before + 1
+    assert 'command="ping"' not in "\n".join(monitoring.mongo_command_seconds.render())
@@ -0,0 +1,75 @@
+import os, threading
+import numpy as np
+import pytest
+from app.core.config import settings
+from app.ml import model_store
+
+
+@pytest.fixture
+def saved(model_dir, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_MMAP_MIN_BYTES", 1024)
+    weights = np.arange(4096, dtype=np.float64).reshape(64, 64)
+    version = model_store.save_model({"vocab": {"kopi": 0}}, {"coef": weights}, ["Food", "Bills"], "u1")
+    return version, model_store._artifact_path(version, "u1"), weights
+
+
+def test_round_trip_memory_maps_large_arrays(saved):
+    version, path, weights = saved
+    vec, clf, labels = model_store.load_model(user_id="u1")
+    assert model_store.current_version("u1") == version
+    assert vec == {"vocab": {"kopi": 0}} and labels == ["Food", "Bills"]
+    np.testing.assert_array_equal(clf["coef"], weights)
+    # array besar dibaca langsung dari mmap, bukan salinan yang bisa ditulis
+    assert not clf["coef"].flags.writeable and not clf["coef"].flags.owndata
+    assert model_store.read_manifest(path)["arrays"][0]["shape"] == [64, 64]
+
+
+def _flip_byte(path, offset):
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        b = f.read(1)
+        f.seek(offset)
+        f.write(bytes([b[0] ^ 0xFF]))
+
+
+def test_corrupted_artifact_is_rejected(saved, caplog):
+    version, path, _ = saved
+    arr = model_store.read_manifest(path)["arrays"][0]
+    _flip_byte(path, arr["offset"] + 100)
+
+    assert model_store.load_model(user_id="u1") == (None, None, None)
+    assert "checksum artefak model tidak cocok" in caplog.text
+
+
+def test_wrong_magic_and_truncated_file_are_rejected(saved):
+    version, path, _ = saved
+    _flip_byte(path, 0)
+    with pytest.raises(ValueError, match="bukan artefak model"):
+        model_store.read_manifest(path)
+    with open(path, "r+b") as f:
+        f.truncate(10)
+    with pytest.raises(ValueError, match="terpotong"):
+        model_store.read_manifest(path)
+    assert model_store.load_model(version, "u1") == (None, None, None)
+
+
+def test_failed_save_keeps_previous_latest(saved):
+    version, _, _ = saved
+    with pytest.raises(TypeError):
+        model_store.save_model({"lock": threading.Lock()}, {}, [], "u1")
+    udir = model_store._user_dir("u1")
+    assert model_store.current_version("u1") == version
+    assert not [n for n in os.listdir(udir) if n.endswith(".tmp")]
+
+
+def test_latest_swaps_and_old_versions_are_pruned(model_dir, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_KEEP_VERSIONS", 2)
+    versions = [model_store.save_model({"v": i}, {}, [], "u1") for i in range(4)]
+    udir = model_store._user_dir("u1")
+    kept = sorted(n for n in os.listdir(udir) if n.endswith(model_store.ARTIFACT_EXT))
+    assert model_store.current_version("u1") == versions[-1]
+    assert kept == [v + model_store.ARTIFACT_EXT for v in versions[-2:]]
+    assert model_store.load_model(user_id="u1")[0] == {"v": 3}
+    assert model_store.load_model(versions[0], "u1") == (None, None, None)
+    # tenant lain tidak ikut terlihat
+    assert model_store.current_version("u2") is None
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+import pytest
+from app.core.config import settings
+
+H = {"X-User-Id": "u1"}
+
+
+async def _seed(db, n=23):
+    # banyak nilai sort yang kembar: keyset harus tetap memakai _id sebagai tie-breaker
+    base = datetime(2026, 1, 1)
+    await db["transactions"].insert_many([
+        {"user_id": "u1", "date": base + timedelta(days=i % 4), "amount": float(i % 3), "description": f"tx {i}",
+         "created_at": base + timedelta(minutes=i // 2)} for i in range(n)
+    ] + [{"user_id": "u2", "date": base, "amount": 1.0, "description": "lain", "created_at": base}])
+
+
+async def _walk(client, **params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        r = (await client.get("/transactions", headers=H,
+                              params={**params, **({"cursor": cursor} if cursor else {})})).json()
+        ids += [it["id"] for it in r["items"]]
+        pages += 1
+        cursor = r["next_cursor"]
+        if not cursor:
+            return ids, pages
+
+
+@pytest.mark.parametrize("sort", ["-created_at", "date", "-amount"])
+def test_cursor_round_trip_has_no_gaps_or_duplicates(run_api, sort):
+    async def scenario(db, client):
+        await _seed(db)
+        walked, pages = await _walk(client, limit=5, sort=sort, count="none")
+        everything = (await client.get("/transactions", headers=H, params={"limit": 100, "sort": sort})).json()
+        return walked, pages, [it["id"] for it in everything["items"]]
+
+    walked, pages, expected = run_api(scenario)
+    assert walked == expected and len(set(walked)) == 23 and pages == 5
+
+
+def test_cursor_is_bound_to_its_sort(run_api):
+    async def scenario(db, client):
+        await _seed(db)
+        first = (await client.get("/transactions", headers=H, params={"limit": 5, "sort": "date"})).json()
+        wrong = await client.get("/transactions", headers=H, params={"cursor": first["next_cursor"], "sort": "amount"})
+        garbage = await client.get("/transactions", headers=H, params={"cursor": "!!"})
+        return wrong.status_code, garbage.status_code
+
+    assert run_api(scenario) == (400, 400)
+
+
+def test_estimated_count_is_capped(run_api, monkeypatch):
+    monkeypatch.setattr(settings, "TX_COUNT_CAP", 10)
+
+    async def scenario(db, client):
+        await _seed(db)
+        est = (await client.get("/transactions", headers=H)).json()
+        exact = (await client.get("/transactions", headers=H, params={"count": "exact"})).json()
+        return est["total"], est["total_exact"], exact["total"], exact["total_exact"]
+
+    assert run_api(scenario) == (10, False, 23, True)
@@ -0,0 +1,39 @@
+from datetime import datetime
+from bson import ObjectId
+from app.core.responses import dumps
+
+H = {"X-User-Id": "u1"}
+
+
+def _seed(client):
+    return client.post("/transactions", headers=H, json={
+        "date": "2026-02-03", "description": "kopi", "amount": 25000, "merchant": "Kopi Kenangan"})
+
+
+def test_default_row_shape_hides_internal_fields(run_api):
+    async def scenario(db, client):
+        created = (await _seed(client)).json()
+        return created, (await client.get("/transactions", headers=H)).json()["items"][0]
+
+    created, row = run_api(scenario)
+    assert row["id"] == created["id"] and row["revision_id"] == created["revision_id"]
+    assert row["date"] == "2026-02-03" and row["amount"] == 25000
+    assert "_id" not in row and "merchant_lc" not in row and "dedupe_key" not in row
+
+
+def test_fields_selects_a_subset(run_api):
+    async def scenario(db, client):
+        await _seed(client)
+        only = (await client.get("/transactions", headers=H, params={"fields": "amount, id", "sort": "-date"})).json()
+        bad = await client.get("/transactions", headers=H, params={"fields": "amount,merchant_lc"})
+        return only, bad.status_code
+
+    only, bad = run_api(scenario)
+    # kolom sort diambil untuk next_cursor tapi tidak ikut dikirim kalau tidak diminta
+    assert list(only["items"][0]) == ["id", "amount"]
+    assert bad == 400
+
+
+def test_dumps_handles_bson_and_dates():
+    oid = ObjectId()
+    assert dumps({"id": oid, "at": datetime(2026, 1, 2, 3, 4)}) == f'{{"id":"{oid}","at":"2026-01-02T03:04:00"}}'.encode()
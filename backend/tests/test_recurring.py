@@ -0,0 +1,31 @@
+from datetime import datetime
+from bson import ObjectId
+from app.core import recurring
+
+
+def _tx(day, month=1, desc="NETFLIX.COM 8812", amount=186000.0):
+    return {"_id": ObjectId(), "date": datetime(2026, month, day), "description": desc,
+            "merchant": "Netflix", "amount": amount}
+
+
+def test_monthly_series_detected_incrementally(run_api):
+    async def scenario(db, client):
+        # dua batch terpisah: batch kedua hanya dicocokkan ke dokumen signature, tanpa scan riwayat
+        await recurring.observe("u1", [_tx(5, 1), _tx(5, 2)])
+        await recurring.observe("u1", [_tx(6, 3), _tx(4, 4)])
+        r = await client.get("/recurring", headers={"X-User-Id": "u1"}, params={"include_inactive": True})
+        return r.json()["items"]
+
+    [series] = run_api(scenario)
+    assert (series["period"], series["count"], series["next_expected"]) == ("monthly", 4, "2026-05-04")
+    assert "n" not in series
+
+
+def test_same_day_repeat_flagged_as_possible_duplicate(run_db):
+    async def scenario(db):
+        first, again, other = _tx(5), _tx(5, desc="netflix.com 9921"), _tx(5, desc="NETFLIX KELUARGA")
+        dupes = await recurring.observe("u1", [first])
+        dupes.update(await recurring.observe("u1", [again, other]))
+        return dupes == {again["_id"]: first["_id"]}, await db["duplicate_flags"].count_documents({})
+
+    assert run_db(scenario) == (True, 1)
@@ -0,0 +1,28 @@
+from app.core.config import settings
+from app.ml import model_store
+from app.ml.registry import ModelRegistry
+
+
+def test_artifact_loaded_once_and_hot_reloaded(model_dir, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_RELOAD_CHECK_SECONDS", 3600.0)
+    reg = ModelRegistry(4)
+    v1 = model_store.save_model({"vec": 1}, {"clf": 1}, ["a"], "u1")
+    first = reg.get("u1")
+    again = reg.get("u1")
+    assert first[1] is again[1] and reg.version("u1") == v1
+    assert (reg.stats["loads"], reg.stats["hits"]) == (1, 1)
+
+    # retrain di worker lain: versi baru terlihat setelah interval cek (di sini dipaksa lewat refresh)
+    v2 = model_store.save_model({"vec": 2}, {"clf": 2}, ["a", "b"], "u1")
+    assert reg.get("u1")[1] == {"clf": 1}
+    reg.refresh("u1")
+    assert reg.get("u1")[1] == {"clf": 2} and reg.version("u1") == v2
+
+
+def test_least_recently_used_model_is_evicted(model_dir):
+    reg = ModelRegistry(1)
+    for user in ("u1", "u2"):
+        model_store.save_model({}, {"user": user}, ["a"], user)
+        reg.get(user)
+    assert reg.loaded_users() == 1 and reg.stats["evictions"] == 1
+    assert reg.version("u1") is None
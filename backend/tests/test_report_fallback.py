@@ -0,0 +1,41 @@
+from datetime import date, datetime
+from app.core import rollup
+from app.models.rollup import DailyCategoryRollup
+from app.routers import report
+
+ROWS = [(datetime(2026, 1, 5), "food", 25.0), (datetime(2026, 1, 5), "food", 15.0),
+        (datetime(2026, 1, 6), None, 45.0), (datetime(2026, 2, 1), "fun", 99.0)]
+
+
+async def _seed(db):
+    await db["transactions"].insert_many([
+        {"user_id": "u1", "date": d, "category_id": cid, "amount": a} for d, cid, a in ROWS
+    ] + [{"user_id": "u2", "date": datetime(2026, 1, 5), "category_id": "food", "amount": 1000.0}])
+    await rollup.add("u1", ROWS)
+
+
+def test_fallback_scan_matches_rollup(run_db, monkeypatch):
+    start, end = date(2026, 1, 1), date(2026, 1, 31)
+
+    async def reports():
+        return await report._summary("u1", start, end), await report._daily("u1", start, end)
+
+    async def scenario(db):
+        await _seed(db)
+        fast = await reports()
+        get_collection = report.get_collection
+
+        class Broken:
+            def aggregate(self, *args, **kwargs):
+                raise RuntimeError("aggregation gagal")
+
+        monkeypatch.setattr(report, "get_collection",
+                            lambda model: Broken() if model is DailyCategoryRollup else get_collection(model))
+        before = report.report_fallbacks.get("summary")
+        slow = await reports()
+        return fast, slow, report.report_fallbacks.get("summary") - before
+
+    fast, slow, fallbacks = run_db(scenario)
+    assert fast == slow and fallbacks == 1
+    assert fast[0]["totals"] == {"grand_total": 85.0, "tx_count": 3}
+    assert [(i["date"], i["total"]) for i in fast[1]["items"]] == [(date(2026, 1, 5), 40.0), (date(2026, 1, 6), 45.0)]
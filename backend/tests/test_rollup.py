@@ -0,0 +1,82 @@
+from datetime import datetime
+from app.core import rollup
+
+DAY = datetime(2026, 1, 5)
+
+
+async def _seed(db, amounts, category_id="food"):
+    docs = [{"user_id": "u1", "date": DAY, "category_id": category_id, "amount": a, "description": "x"}
+            for a in amounts]
+    await db["transactions"].insert_many(docs)
+    await rollup.add("u1", [(DAY, category_id, a) for a in amounts])
+    return [d["_id"] for d in docs]
+
+
+async def _bucket(db, category_id="food"):
+    return await db["rollup_daily_category"].find_one(
+        {"user_id": "u1", "date": DAY, "category_id": category_id}, {"_id": 0, "user_id": 0, "date": 0})
+
+
+def _edit(db, tx_id, old, new):
+    # urutan yang sama dengan PATCH: tulis transaksinya dulu, baru rollup.move
+    async def go():
+        await db["transactions"].update_one({"_id": tx_id}, {"$set": {"amount": new[2], "category_id": new[1]}})
+        await rollup.move("u1", old, new)
+    return go()
+
+
+def test_edit_max_in_same_bucket_is_not_double_counted(run_db):
+    async def scenario(db):
+        _, big = await _seed(db, [50.0, 100.0])
+        await _edit(db, big, (DAY, "food", 100.0), (DAY, "food", 120.0))
+        return await _bucket(db)
+
+    assert run_db(scenario) == {"category_id": "food", "total": 170.0, "n": 2, "min_amount": 50.0, "max_amount": 120.0}
+
+
+def test_edit_min_in_same_bucket_is_not_double_counted(run_db):
+    async def scenario(db):
+        small, _ = await _seed(db, [50.0, 100.0])
+        await _edit(db, small, (DAY, "food", 50.0), (DAY, "food", 70.0))
+        return await _bucket(db)
+
+    assert run_db(scenario) == {"category_id": "food", "total": 170.0, "n": 2, "min_amount": 70.0, "max_amount": 100.0}
+
+
+def test_move_to_other_category_recomputes_old_bounds(run_db):
+    async def scenario(db):
+        _, big = await _seed(db, [50.0, 100.0])
+        await _edit(db, big, (DAY, "food", 100.0), (DAY, "fun", 100.0))
+        return await _bucket(db, "food"), await _bucket(db, "fun")
+
+    food, fun = run_db(scenario)
+    assert food == {"category_id": "food", "total": 50.0, "n": 1, "min_amount": 50.0, "max_amount": 50.0}
+    assert fun == {"category_id": "fun", "total": 100.0, "n": 1, "min_amount": 100.0, "max_amount": 100.0}
+
+
+def test_rollup_matches_raw_after_edits(run_db):
+    async def scenario(db):
+        ids = await _seed(db, [10.0, 20.0, 30.0])
+        await _edit(db, ids[2], (DAY, "food", 30.0), (DAY, "food", 5.0))
+        await _edit(db, ids[0], (DAY, "food", 10.0), (DAY, "food", 40.0))
+        return await rollup.check({"user_id": "u1"})
+
+    assert run_db(scenario)["ok"]
+
+
+def test_rebuild_is_scoped_to_the_caller(run_api):
+    async def scenario(db, client):
+        await _seed(db, [10.0, 20.0])
+        await db["rollup_daily_category"].insert_one(
+            {"user_id": "u2", "date": DAY, "category_id": "food", "total": 99.0, "n": 1})
+        # bucket u1 basi: ditimpa dari transaksi mentah; bucket tanpa transaksi dihapus
+        await db["rollup_daily_category"].update_one({"user_id": "u1"}, {"$set": {"total": 1.0, "n": 7}})
+        await db["rollup_daily_category"].insert_one(
+            {"user_id": "u1", "date": DAY, "category_id": "gone", "total": 5.0, "n": 1})
+        r = await client.post("/reports/rollup/rebuild", headers={"X-User-Id": "u1"})
+        other = await db["rollup_daily_category"].find_one({"user_id": "u2"})
+        return r.json()["buckets"], await _bucket(db), await _bucket(db, "gone"), other["total"]
+
+    buckets, food, gone, other = run_api(scenario)
+    assert buckets == 1 and gone is None and other == 99.0
+    assert food == {"category_id": "food", "total": 30.0, "n": 2, "min_amount": 10.0, "max_amount": 20.0}
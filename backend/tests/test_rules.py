@@ -0,0 +1,51 @@
+import pytest
+from pydantic import ValidationError
+from app.ml.rules import RuleEngine
+from app.routers.rules import RuleIn
+
+
+def _kw(pattern, name, priority, **extra):
+    return {"kind": "keyword", "pattern": pattern, "category_name": name, "priority": priority, **extra}
+
+
+def test_shorter_keyword_at_same_position_still_matches():
+    engine = RuleEngine([_kw("grab", "Transport", 30), _kw("grabfood", "Food", 10)])
+    # "grabfood" keyword terpanjang di posisi itu, tapi "grab" berprioritas lebih tinggi
+    assert [h.category_name for h in engine.match(["GRABFOOD JKT", "GRAB CAR"])] == ["Transport", "Transport"]
+
+
+def test_prefix_keyword_respects_amount_filter():
+    engine = RuleEngine([_kw("grab", "Transport", 30, min_amount=100.0), _kw("grabfood", "Food", 10)])
+    hits = engine.match(["GRABFOOD", "GRABFOOD"], amounts=[50.0, 150.0])
+    assert [h.category_name for h in hits] == ["Food", "Transport"]
+
+
+@pytest.mark.parametrize("pattern", [r"(a+)+$", r"(x|xx)*y", r"(\w)\1", r"(?=a)b", r"a.*b.*c.*d"])
+def test_unsafe_regex_rejected(pattern):
+    with pytest.raises(ValidationError):
+        RuleIn(kind="regex", pattern=pattern, category_id="c1")
+
+
+def test_unsafe_stored_regex_is_skipped():
+    engine = RuleEngine([
+        {"kind": "regex", "pattern": r"(a+)+$", "category_name": "Bad"},
+        {"kind": "regex", "pattern": r"^indomaret\s+\d+", "category_name": "Groceries"},
+    ])
+    assert [h and h.category_name for h in engine.match(["a" * 40 + "!", "INDOMARET 123"])] == [None, "Groceries"]
+
+
+def test_patch_rule_revalidates_and_recompiles(run_api):
+    from app.ml.rules import rule_cache
+    h = {"X-User-Id": "u1"}
+
+    async def scenario(db, client):
+        cat = (await client.post("/categories", headers=h, json={"name": "Transport"})).json()["id"]
+        rule = (await client.post("/rules", headers=h, json={"pattern": "ojek", "category_id": cat})).json()["id"]
+        before = (await rule_cache.get("u1")).match(["OJEK ONLINE"])[0]
+        unsafe = await client.patch(f"/rules/{rule}", headers=h, json={"kind": "regex", "pattern": "(a+)+$"})
+        disabled = await client.patch(f"/rules/{rule}", headers=h, json={"enabled": False})
+        after = (await rule_cache.get("u1")).match(["OJEK ONLINE"])[0]
+        missing = await client.patch("/rules/" + "0" * 24, headers=h, json={"enabled": True})
+        return before.category_id == cat, unsafe.status_code, disabled.json()["enabled"], after, missing.status_code
+
+    assert run_api(scenario) == (True, 422, False, None, 404)
@@ -0,0 +1,58 @@
+from app.core.search import normalize_merchant, search_criteria
+
+H = {"X-User-Id": "u1"}
+ROWS = [
+    ("KOPI (A+B) 1", "Kopi Kenangan"),
+    ("kopi a+b 2", "Kopiko"),
+    ("STARBUCKS", "Starbucks Coffee"),
+    ("bayar", "Toko Kopi Tuku"),
+]
+
+
+def _seed(db):
+    return db["transactions"].insert_many(
+        [{"user_id": "u1", "description": d, "merchant": m, "merchant_lc": normalize_merchant(m)} for d, m in ROWS]
+        + [{"user_id": "u2", "description": "KOPI (A+B)", "merchant": "Kopi", "merchant_lc": "kopi"}]
+    )
+
+
+def _search(client, q, mode):
+    return client.get("/transactions", headers=H, params={"q": q, "search": mode, "limit": 50})
+
+
+def test_contains_escapes_user_input(run_api):
+    async def scenario(db, client):
+        await _seed(db)
+        literal = (await _search(client, "(a+b)", "contains")).json()
+        substring = (await _search(client, "kopi", "contains")).json()
+        pathological = await _search(client, "(a+)+$[", "contains")
+        return literal, substring, pathological.status_code
+
+    literal, substring, status = run_api(scenario)
+    # "(a+b)" dicocokkan apa adanya, bukan sebagai grup regex yang juga cocok dengan "a+b"
+    assert [it["description"] for it in literal["items"]] == ["KOPI (A+B) 1"]
+    assert substring["total"] == 3
+    assert status == 200
+
+
+def test_prefix_matches_merchant_start_only(run_api):
+    async def scenario(db, client):
+        await _seed(db)
+        return (await _search(client, " KOPI", "prefix")).json()
+
+    merchants = sorted(it["merchant"] for it in run_api(scenario)["items"])
+    assert merchants == ["Kopi Kenangan", "Kopiko"]
+
+
+def test_text_mode_uses_text_index():
+    criteria, ranked = search_criteria(" kopi ", "text")
+    assert criteria == {"$text": {"$search": "kopi"}} and ranked
+    assert search_criteria("Ko.pi", "prefix") == ({"merchant_lc": {"$regex": r"^ko\.pi"}}, False)
+
+
+def test_text_mode_rejects_cursor(run_api):
+    async def scenario(db, client):
+        return (await client.get("/transactions", headers=H,
+                                 params={"q": "kopi", "search": "text", "cursor": "x"})).status_code
+
+    assert run_api(scenario) == 400
@@ -0,0 +1,56 @@
+import asyncio, os, subprocess, sys
+import pytest
+import app.main as main
+from app.core.readiness import Readiness, STEPS
+
+
+@pytest.fixture
+def fresh_readiness(monkeypatch):
+    r = Readiness()
+    monkeypatch.setattr(main, "readiness", r)
+    monkeypatch.setattr("app.routers.health.readiness", r)
+    return r
+
+
+def test_ready_is_503_until_every_step_is_done(run_api, fresh_readiness):
+    async def scenario(db, client):
+        codes = []
+        for step in STEPS:
+            codes.append((await client.get("/ready")).status_code)
+            fresh_readiness.mark(step)
+        codes.append((await client.get("/ready")).status_code)
+        return codes, (await client.get("/health")).status_code
+
+    codes, health = run_api(scenario)
+    assert codes == [503] * len(STEPS) + [200] and health == 200
+
+
+def test_failed_startup_step_is_reported_not_fatal(fresh_readiness, monkeypatch):
+    async def broken(db):
+        raise RuntimeError("index gagal")
+
+    async def built():
+        return {"users": 2}
+
+    async def nothing():
+        return None
+
+    monkeypatch.setattr(main, "ensure_indexes", broken)
+    monkeypatch.setattr(main, "backfill_merchant_lc", nothing)
+    monkeypatch.setattr(main.rollup, "ensure_built", built)
+    monkeypatch.setattr(main.settings, "WARM_MODEL_ON_STARTUP", False)
+    fresh_readiness.mark("db")
+    asyncio.run(main._background_startup(None))
+
+    steps = fresh_readiness.report()["steps"]
+    assert fresh_readiness.ready
+    assert steps["indexes"]["error"] == "index gagal"
+    assert steps["rollup"]["users"] == 2 and steps["rollup"]["error"] is None
+    assert steps["model"]["skipped"] is True
+
+
+def test_importing_app_does_not_load_sklearn():
+    code = "import sys, app.main; print(any(m == 'sklearn' or m.startswith('sklearn.') for m in sys.modules))"
+    out = subprocess.run([sys.executable, "-W", "ignore", "-c", code], capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.dirname(__file__)), env=os.environ.copy(), check=True)
+    assert out.stdout.strip() == "False"
@@ -0,0 +1,36 @@
+from app.core.db import _drop_legacy_indexes
+
+U1, U2 = {"X-User-Id": "u1"}, {"X-User-Id": "u2"}
+
+
+def test_transaction_of_other_tenant_is_not_found(run_api):
+    async def scenario(db, client):
+        r = await client.post("/transactions", headers=U1,
+                              json={"date": "2026-01-05", "description": "kopi", "amount": 20.0})
+        tx_id = r.json()["id"]
+        own = await client.get(f"/transactions/{tx_id}", headers=U1)
+        other = await client.get(f"/transactions/{tx_id}", headers=U2)
+        listed = await client.get("/transactions", headers=U2)
+        return own.status_code, other.status_code, listed.json()["items"]
+
+    assert run_api(scenario) == (200, 404, [])
+
+
+def test_invalid_user_header_rejected(run_api):
+    async def scenario(db, client):
+        return (await client.get("/transactions", headers={"X-User-Id": "../etc"})).status_code
+
+    assert run_api(scenario) == 400
+
+
+def test_baseline_single_field_indexes_are_dropped(run_db):
+    async def scenario(db):
+        coll = db["transactions"]
+        await coll.create_index([("date", 1)])
+        await coll.create_index([("created_at", -1)])
+        await coll.create_index([("category_id", 1)])
+        await coll.create_index([("user_id", 1), ("date", 1), ("_id", 1)])
+        await _drop_legacy_indexes(db)
+        return sorted(await coll.index_information())
+
+    assert run_db(scenario) == ["_id_", "user_id_1_date_1__id_1"]
@@ -0,0 +1,67 @@
+from datetime import datetime
+from bson import ObjectId
+from app.core import rollup
+from app.core.db import new_revision, revision_str
+from app.routers import transactions
+from app.routers.transactions import TxPatchBulkIn, update_transactions_bulk
+
+DAY = datetime(2026, 1, 5)
+
+
+async def _seed(db, amounts):
+    docs = [{"user_id": "u1", "date": DAY, "category_id": "food", "amount": a, "description": "x",
+             "revision_id": new_revision()} for a in amounts]
+    await db["transactions"].insert_many(docs)
+    await rollup.add("u1", [(DAY, "food", a) for a in amounts])
+    return [d["_id"] for d in docs]
+
+
+def test_bulk_patch_keeps_rollup_consistent(run_db):
+    async def scenario(db):
+        a, b = await _seed(db, [50.0, 100.0])
+        out = await update_transactions_bulk(TxPatchBulkIn(items=[
+            {"id": str(a), "amount": 70.0}, {"id": str(b), "amount": 120.0},
+        ]), user_id="u1")
+        return out["updated"], await rollup.check({"user_id": "u1"})
+
+    updated, check = run_db(scenario)
+    assert updated == 2 and check["ok"]
+
+
+def test_bulk_write_overwritten_later_still_counts_as_updated(run_db, around_bulk_write):
+    async def scenario(db):
+        a, b = await _seed(db, [50.0, 100.0])
+
+        async def overwrite(coll):
+            # writer berikutnya sudah membaca nilai dari request ini (100 -> 120) lalu menimpanya
+            await coll.update_one({"_id": b}, {"$set": {"amount": 90.0, "revision_id": new_revision()}})
+            await rollup.move("u1", (DAY, "food", 120.0), (DAY, "food", 90.0))
+
+        async def stale(coll):
+            await coll.update_one({"_id": a}, {"$set": {"revision_id": new_revision()}})
+
+        around_bulk_write(transactions, before=stale, after=overwrite)
+        out = await update_transactions_bulk(TxPatchBulkIn(items=[
+            {"id": str(a), "amount": 70.0}, {"id": str(b), "amount": 120.0},
+        ]), user_id="u1")
+        return [r["status"] for r in out["items"]], await rollup.check({"user_id": "u1"})
+
+    statuses, check = run_db(scenario)
+    assert statuses == ["conflict", "updated"]
+    assert check["ok"]
+
+
+def test_every_write_path_sets_revision_and_log(run_api):
+    h = {"X-User-Id": "u1"}
+
+    async def scenario(db, client):
+        created = (await client.post("/transactions/bulk", headers=h, json={"items": [
+            {"date": "2026-01-05", "description": "kopi", "amount": 20.0}]})).json()["ids"][0]
+        await client.post("/transactions/import", headers=h, files={
+            "file": ("bank.csv", b"date,amount,description\n2026-01-06,15000,roti\n", "text/csv")})
+        missing = await db["transactions"].count_documents({"revision_id": None})
+        patched = (await client.patch(f"/transactions/{created}", headers=h, json={"amount": 25.0})).json()
+        doc = await db["transactions"].find_one({"_id": ObjectId(created)})
+        return missing, [revision_str(r) for r in doc["revision_log"]] == [patched["revision_id"]]
+
+    assert run_api(scenario) == (0, True)